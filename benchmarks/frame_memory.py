@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+from sqlalchemy import select
+import sql
+
+
+def _contacts():
+    return select(sql.Contacts.contact_name, sql.Contacts.email, sql.Contacts.phone, sql.Contacts.birthday,
+                  sql.Contacts.hobbies, sql.Contacts.additional, sql.Contacts.last_interaction,
+                  sql.Circles.circle_name) \
+        .join(sql.Circles, sql.Contacts.circle_id == sql.Circles.circle_id)
+
+
+def _interactions():
+    return sql.Interaction._select_interactions()[0]
+
+
+def _tasks():
+    return sql.Task._select_tasks()
+
+
+QUERIES = {
+    "contacts": _contacts,
+    "interactions": _interactions,
+    "tasks": _tasks,
+}
+
+
+# Прежний путь: все строки ORM-кортежами в памяти, затем DataFrame с object-колонками и копия индекса
+def legacy_frame(statement):
+    with sql.session_scope() as session:
+        rows = session.execute(statement).all()
+    df = pd.DataFrame(rows)
+    df.index += 1
+    return df
+
+
+VARIANTS = {
+    "legacy": legacy_frame,
+    "arrow": sql.read_frame,
+}
+
+
+def _peak_rss_kb():
+    # ru_maxrss в Linux - в килобайтах, в macOS - в байтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if sys.platform == "darwin" else peak
+
+
+def measure_child(variant, query):
+    statement = QUERIES[query]()
+    # Прогрев полным запросом: соединение, кэш компиляции и ленивая загрузка модулей pandas/pyarrow
+    # не должны попасть в замер - страница в работе перерисовывается много раз
+    VARIANTS[variant](statement)
+    baseline = _peak_rss_kb()
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = VARIANTS[variant](statement)
+    elapsed = time.perf_counter() - start
+    python_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "rows": len(df),
+        "seconds": elapsed,
+        "peak_rss_growth_kb": _peak_rss_kb() - baseline,
+        "python_heap_peak_kb": python_peak / 1024,
+        "frame_kb": df.memory_usage(deep=True).sum() / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пиковая память построения датафреймов: прежний путь против Arrow")
+    parser.add_argument("url", help="адрес базы, заполненной benchmarks/generate.py")
+    parser.add_argument("--queries", nargs="*", default=list(QUERIES))
+    parser.add_argument("--out", help="сохранить результаты в JSON")
+    parser.add_argument("--child", nargs=2, metavar=("VARIANT", "QUERY"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sql.configure(args.url)
+    if args.child:
+        print(json.dumps(measure_child(*args.child)))
+        return
+
+    # Каждый замер - в отдельном процессе: пиковый RSS за время жизни процесса не сбрасывается
+    results = {}
+    for query in args.queries:
+        for variant in VARIANTS:
+            output = subprocess.run([sys.executable, __file__, args.url, "--child", variant, query],
+                                    check=True, capture_output=True, text=True).stdout
+            result = results.setdefault(query, {})[variant] = json.loads(output.strip().splitlines()[-1])
+            print(f"{query:14} {variant:7} строк {result['rows']:8}  {result['seconds'] * 1000:9.1f} мс  "
+                  f"пик RSS +{result['peak_rss_growth_kb']:9.0f} КБ  "
+                  f"пик Python {result['python_heap_peak_kb']:9.0f} КБ  датафрейм {result['frame_kb']:9.0f} КБ")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+from sqlalchemy import func, insert, select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations
+import passwords
+import sql
+from bulk_import import chunked
+
+SCALES = {
+    "small": {"users": 10, "circles": 8, "contacts": 200, "connections": 600, "tasks": 500,
+              "interactions": 1000, "important_dates": 200},
+    "medium": {"users": 25, "circles": 12, "contacts": 5000, "connections": 15000, "tasks": 10000,
+               "interactions": 50000, "important_dates": 5000},
+    "large": {"users": 50, "circles": 20, "contacts": 50000, "connections": 150000, "tasks": 100000,
+              "interactions": 1000000, "important_dates": 50000},
+}
+
+CHUNK_SIZE = 5000
+PASSWORD = "bench"
+
+FIRST_NAMES = ["Александр", "Мария", "Дмитрий", "Анна", "Сергей", "Елена", "Андрей", "Ольга", "Алексей", "Наталья",
+               "Иван", "Татьяна", "Михаил", "Екатерина", "Никита", "Юлия", "Павел", "Светлана", "Артем", "Ирина"]
+LAST_NAMES = ["Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов", "Новиков",
+              "Федоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семенов", "Егоров", "Павлов", "Козлов"]
+HOBBIES = ["шахматы", "бег", "фотография", "велосипед", "рыбалка", "театр", "кино", "путешествия", "йога",
+           "книги", "готовка", "футбол", "теннис", "музыка", "горы", "настольные игры"]
+INTERACTION_TYPES = ["Звонок", "Встреча", "Сообщение", "Письмо", "Видеозвонок"]
+WORDS = ["обсудили", "проект", "планы", "отпуск", "работу", "детей", "встречу", "подарок", "переезд", "книгу",
+         "договорились", "созвониться", "позже", "поздравил", "с", "днем", "рождения", "новую", "должность"]
+DATE_DESCRIPTIONS = ["Годовщина свадьбы", "День знакомства", "Именины", "Годовщина переезда", "Выпускной"]
+
+
+def _random_date(rng, start, end):
+    return start + datetime.timedelta(days=rng.randrange((end - start).days + 1))
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def generate_rows(counts, seed=0, today=None):
+    # Идентификаторы задаются явно: таблицы заполняются с нуля, и ссылки можно строить без запросов к базе
+    rng = random.Random(seed)
+    today = today or datetime.date.today()
+    password = passwords.hash_password(PASSWORD)
+
+    yield sql.User, ({"user_id": i, "user_name": f"user{i:03d}", "password": password}
+                     for i in range(1, counts["users"] + 1))
+    yield sql.Circles, ({"circle_id": i, "circle_name": f"Круг {i}",
+                         "interaction_frequency": rng.choice([7, 14, 30, 90, 365])}
+                        for i in range(1, counts["circles"] + 1))
+    yield sql.Contacts, ({"contact_id": i,
+                          "contact_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}",
+                          "circle_id": rng.randint(1, counts["circles"]),
+                          "email": f"contact{i}@example.com",
+                          "phone": f"+7900{i:07d}",
+                          "hobbies": ", ".join(rng.sample(HOBBIES, 3)),
+                          "additional": _sentence(rng, 8),
+                          "birthday": _random_date(rng, datetime.date(1960, 1, 1), datetime.date(2005, 12, 31))}
+                         for i in range(1, counts["contacts"] + 1))
+    yield sql.Connections, ({"connection_id": i,
+                             "cont1_id": rng.randint(1, counts["contacts"]),
+                             "cont2_id": rng.randint(1, counts["contacts"]),
+                             "description": rng.choice(["коллеги", "друзья", "родственники", "соседи"])}
+                            for i in range(1, counts["connections"] + 1))
+    yield sql.Task, ({"task_id": i,
+                      "task_name": f"Задача {i}",
+                      "description": _sentence(rng, 6),
+                      "creator_id": rng.randint(1, counts["users"]),
+                      "executor_id": rng.randint(1, counts["users"]),
+                      "contact_id": rng.randint(1, counts["contacts"]),
+                      "created_at": today,
+                      "due_date": today + datetime.timedelta(days=rng.randint(-60, 60)),
+                      "done": rng.random() < 0.5}
+                     for i in range(1, counts["tasks"] + 1))
+    yield sql.Interaction, ({"id": i,
+                             "user_id": rng.randint(1, counts["users"]),
+                             "contact_id": rng.randint(1, counts["contacts"]),
+                             "interaction_date": today - datetime.timedelta(days=rng.randrange(3 * 365)),
+                             "interaction_type": rng.choice(INTERACTION_TYPES),
+                             "notes": _sentence(rng, 10)}
+                            for i in range(1, counts["interactions"] + 1))
+    yield sql.ImportantDates, ({"date_id": i,
+                                "contact_id": rng.randint(1, counts["contacts"]),
+                                "date": _random_date(rng, datetime.date(1990, 1, 1), today),
+                                "description": rng.choice(DATE_DESCRIPTIONS)}
+                               for i in range(1, counts["important_dates"] + 1))
+
+
+def generate(counts, seed=0, chunk_size=CHUNK_SIZE):
+    engine = sql.get_engine(check_schema=False)
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(sql.Contacts.__table__)).scalar():
+            raise RuntimeError("База уже заполнена, генератор работает только с пустой базой")
+
+    timings = {}
+    for model, rows in generate_rows(counts, seed):
+        start = time.perf_counter()
+        for chunk in chunked(rows, chunk_size):
+            with engine.begin() as conn:
+                conn.execute(insert(model.__table__), chunk)
+        timings[model.__tablename__] = time.perf_counter() - start
+
+    # Производные данные считаются так же, как после массового импорта
+    start = time.perf_counter()
+    sql.Contacts.refresh_last_interaction()
+    sql.CircleStats.rebuild()
+    timings["derived"] = time.perf_counter() - start
+    sql.query_cache.clear()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заполнение локальной базы синтетическими данными для бенчмарков")
+    parser.add_argument("url", help="адрес базы SQLAlchemy, например mysql+pymysql://root@localhost/bench")
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--interactions", type=int, help="переопределить число взаимодействий")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    counts = dict(SCALES[args.scale])
+    if args.interactions is not None:
+        counts["interactions"] = args.interactions
+    sql.configure(args.url)
+    for table, seconds in generate(counts, args.seed, args.chunk_size).items():
+        print(f"{table}: {counts.get(table, '')} {seconds:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
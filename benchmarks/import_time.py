@@ -0,0 +1,36 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Импорт должен быть чистым: без движка, без чтения secrets и без запросов к базе
+IMPORT_SQL = "import sql; assert sql._engine is None, 'engine created at import'"
+
+
+def measure(code, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время холодного импорта модуля sql")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    interpreter = measure("pass", args.runs)
+    timings = measure(IMPORT_SQL, args.runs)
+    print(f"интерпретатор: медиана {statistics.median(interpreter) * 1000:.1f} мс")
+    print(f"import sql:    медиана {statistics.median(timings) * 1000:.1f} мс, "
+          f"минимум {min(timings) * 1000:.1f} мс за {args.runs} запусков")
+
+
+if __name__ == "__main__":
+    main()
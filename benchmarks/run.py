@@ -0,0 +1,440 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from sqlalchemy import func, select, update
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import graph
+import name_index
+import sql
+
+BENCH_NAME = "Бенчмарк"
+FIXTURE_SAMPLE = 50
+
+# Методы, которые сознательно не замеряются: их вызывают только служебные скрипты
+NOT_BENCHMARKED = {
+    "User.hash_plaintext_passwords",
+    "Tombstone.prune",
+}
+
+
+# warm=True - случай замеряет сам кэш (например, дельта-синхронизацию после правки) и сбрасывать его нельзя
+class Case:
+    def __init__(self, name, run, setup=None, teardown=None, warm=False):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.teardown = teardown
+        self.warm = warm
+
+
+# Данные для аргументов: небольшая выборка существующих записей, по которой итерации ходят по кругу
+class Fixtures:
+    def __init__(self, seed):
+        rng = random.Random(seed)
+        names = sql.Contacts.get_contact_names()
+        self.contact_ids = rng.sample(sorted(names), min(FIXTURE_SAMPLE, len(names)))
+        self.contacts = [names[contact_id] for contact_id in self.contact_ids]
+        self.users = sql.User.get_user_list()
+        self.circles = sql.Circles.get_circles_list()
+        self.today = datetime.date.today()
+
+    @staticmethod
+    def pick(values, i):
+        return values[i % len(values)]
+
+    def contact(self, i):
+        return self.pick(self.contacts, i)
+
+    def user(self, i):
+        return self.pick(self.users, i)
+
+
+def _latest_id(column):
+    with sql.session_scope() as session:
+        return session.execute(select(func.max(column))).scalar()
+
+
+def _last_interaction(contact_name):
+    with sql.session_scope() as session:
+        return session.execute(select(sql.Contacts.last_interaction)
+                               .where(sql.Contacts.contact_name == contact_name)).scalar()
+
+
+def _restore_last_interaction(contact_name, value):
+    with sql.session_scope() as session:
+        session.execute(update(sql.Contacts).where(sql.Contacts.contact_name == contact_name)
+                        .values(last_interaction=value))
+    sql.query_cache.invalidate("contacts")
+
+
+def _delete_important_date(date_id):
+    with sql.session_scope() as session:
+        session.execute(sql.ImportantDates.__table__.delete().where(sql.ImportantDates.date_id == date_id))
+    sql.query_cache.invalidate("important_dates")
+
+
+def _add_bench_circle(fx, i):
+    sql.Circles.add_circle(circle_name=f"{BENCH_NAME} {i}", interaction_frequency=30)
+
+
+def _add_bench_contact(fx, i):
+    sql.Contacts.add_contact(fx.circles[0], contact_name=f"{BENCH_NAME} {i}")
+
+
+def _add_bench_task(fx, i):
+    sql.Task.add_task(fx.user(i), fx.user(i + 1), fx.contact(i), BENCH_NAME, None, fx.today)
+
+
+def _add_bench_connection(fx, i):
+    sql.Connections.add_connection(fx.contact(i), fx.contact(i + 1), BENCH_NAME)
+
+
+def _add_bench_interaction(fx, i):
+    sql.Interaction.add_interaction(fx.user(i), fx.contact(i), BENCH_NAME, BENCH_NAME, fx.today)
+
+
+def _edit_bench_contact(fx, i):
+    sql.Contacts.get_contacts_as_dataframe()
+    sql.Contacts.edit_contact(f"{BENCH_NAME} {i}", fx.circles[0], phone=f"+7{i:010d}")
+
+
+def _add_interaction_after_load(fx, i):
+    sql.Interaction.get_as_dataframe()
+    last_interaction = _last_interaction(fx.contact(i))
+    _add_bench_interaction(fx, i)
+    return last_interaction, _latest_id(sql.Interaction.id)
+
+
+def method_cases():
+    return [
+        Case("User.get_user_list", lambda fx, i, state: sql.User.get_user_list()),
+        Case("User.get_user_id_by_name", lambda fx, i, state: sql.User.get_user_id_by_name(fx.user(i))),
+        # Кэш входов сбрасывается, чтобы замерялся медленный хеш, а не попадание в кэш
+        Case("User.authenticate", lambda fx, i, state: sql.User.authenticate(fx.user(i), "bench"),
+             setup=lambda fx, i: sql.login_cache.discard(fx.user(i))),
+
+        Case("Circles.get_circles_list", lambda fx, i, state: sql.Circles.get_circles_list()),
+        Case("Circles.get_circles_as_dataframe_simple",
+             lambda fx, i, state: sql.Circles.get_circles_as_dataframe_simple()),
+        Case("Circles.get_circles_as_dataframe", lambda fx, i, state: sql.Circles.get_circles_as_dataframe()),
+        Case("Circles.get_overdue_circles", lambda fx, i, state: sql.Circles.get_overdue_circles(fx.today)),
+        Case("Circles.get_circle_stats", lambda fx, i, state: sql.Circles.get_circle_stats()),
+        Case("Circles.add_circle", lambda fx, i, state: _add_bench_circle(fx, i),
+             teardown=lambda fx, i, state: sql.Circles.delete_circle(f"{BENCH_NAME} {i}")),
+        Case("Circles.edit_circle",
+             lambda fx, i, state: sql.Circles.edit_circle(f"{BENCH_NAME} {i}", circle_name=f"{BENCH_NAME} {i}*"),
+             setup=_add_bench_circle,
+             teardown=lambda fx, i, state: sql.Circles.delete_circle(f"{BENCH_NAME} {i}*")),
+        Case("Circles.delete_circle", lambda fx, i, state: sql.Circles.delete_circle(f"{BENCH_NAME} {i}"),
+             setup=_add_bench_circle),
+        Case("CircleStats.rebuild", lambda fx, i, state: sql.CircleStats.rebuild()),
+
+        Case("Contacts.get_contacts_list", lambda fx, i, state: sql.Contacts.get_contacts_list()),
+        Case("Contacts.get_contacts_as_dataframe", lambda fx, i, state: sql.Contacts.get_contacts_as_dataframe()),
+        Case("Contacts.get_contact_by_name", lambda fx, i, state: sql.Contacts.get_contact_by_name(fx.contact(i))),
+        Case("Contacts.get_contact_names", lambda fx, i, state: sql.Contacts.get_contact_names()),
+        Case("Contacts.get_profile", lambda fx, i, state: sql.Contacts.get_profile(fx.pick(fx.contact_ids, i))),
+        Case("Contacts.refresh_last_interaction", lambda fx, i, state: sql.Contacts.refresh_last_interaction()),
+        Case("Contacts.add_contact", lambda fx, i, state: _add_bench_contact(fx, i),
+             teardown=lambda fx, i, state: sql.Contacts.delete_contact(f"{BENCH_NAME} {i}")),
+        Case("Contacts.edit_contact",
+             lambda fx, i, state: sql.Contacts.edit_contact(f"{BENCH_NAME} {i}", fx.circles[-1], phone="+70000000000"),
+             setup=_add_bench_contact,
+             teardown=lambda fx, i, state: sql.Contacts.delete_contact(f"{BENCH_NAME} {i}")),
+        Case("Contacts.delete_contact", lambda fx, i, state: sql.Contacts.delete_contact(f"{BENCH_NAME} {i}"),
+             setup=_add_bench_contact),
+        # Обновление датафрейма после одной правки: дочитываются только изменившиеся строки
+        Case("Contacts.get_contacts_as_dataframe[after edit]",
+             lambda fx, i, state: sql.Contacts.get_contacts_as_dataframe(),
+             setup=lambda fx, i: _add_bench_contact(fx, i) or _edit_bench_contact(fx, i),
+             teardown=lambda fx, i, state: sql.Contacts.delete_contact(f"{BENCH_NAME} {i}"), warm=True),
+
+        Case("Task.get_tasks_as_dataframe", lambda fx, i, state: sql.Task.get_tasks_as_dataframe()),
+        Case("Task.get_tasks_due_between",
+             lambda fx, i, state: sql.Task.get_tasks_due_between(fx.today, fx.today + datetime.timedelta(days=7))),
+        Case("Task.get_incomplete_tasks_by_executor",
+             lambda fx, i, state: sql.Task.get_incomplete_tasks_by_executor(fx.user(i))),
+        Case("Task.get_incomplete_tasks_by_creator",
+             lambda fx, i, state: sql.Task.get_incomplete_tasks_by_creator(fx.user(i))),
+        Case("Task.add_task", lambda fx, i, state: _add_bench_task(fx, i),
+             teardown=lambda fx, i, state: sql.Task.delete_task(_latest_id(sql.Task.task_id))),
+        Case("Task.edit_task", lambda fx, i, state: sql.Task.edit_task(state, description=f"{BENCH_NAME} {i}"),
+             setup=lambda fx, i: _add_bench_task(fx, i) or _latest_id(sql.Task.task_id),
+             teardown=lambda fx, i, state: sql.Task.delete_task(state)),
+        Case("Task.set_done_bulk",
+             lambda fx, i, state: sql.Task.set_done_bulk({task_id: False for task_id in state}),
+             setup=lambda fx, i: [_add_bench_task(fx, i) or _latest_id(sql.Task.task_id) for _ in range(10)],
+             teardown=lambda fx, i, state: [sql.Task.delete_task(task_id) for task_id in state]),
+        Case("Task.delete_task", lambda fx, i, state: sql.Task.delete_task(state),
+             setup=lambda fx, i: _add_bench_task(fx, i) or _latest_id(sql.Task.task_id)),
+
+        Case("Connections.get_connections_as_dataframe",
+             lambda fx, i, state: sql.Connections.get_connections_as_dataframe()),
+        Case("Connections.get_neighbours",
+             lambda fx, i, state: sql.Connections.get_neighbours(fx.contact_ids[:10])),
+        Case("Connections.get_connections_for_contact",
+             lambda fx, i, state: sql.Connections.get_connections_for_contact(fx.contact(i))),
+        Case("Connections.add_connection", lambda fx, i, state: _add_bench_connection(fx, i),
+             teardown=lambda fx, i, state: sql.Connections.delete_connection(
+                 _latest_id(sql.Connections.connection_id))),
+        Case("Connections.delete_connection", lambda fx, i, state: sql.Connections.delete_connection(state),
+             setup=lambda fx, i: _add_bench_connection(fx, i) or _latest_id(sql.Connections.connection_id)),
+
+        Case("Interaction.get_as_dataframe", lambda fx, i, state: sql.Interaction.get_as_dataframe()),
+        Case("Interaction.page", lambda fx, i, state: sql.Interaction.page(None, 50)),
+        Case("Interaction.page[contact]", lambda fx, i, state: sql.Interaction.page(None, 50, contact=fx.contact(i))),
+        # add_interaction переставляет last_interaction контакта, после замера он возвращается на место
+        Case("Interaction.add_interaction", lambda fx, i, state: _add_bench_interaction(fx, i),
+             setup=lambda fx, i: _last_interaction(fx.contact(i)),
+             teardown=lambda fx, i, state: (sql.Interaction.delete_interaction(_latest_id(sql.Interaction.id)),
+                                            _restore_last_interaction(fx.contact(i), state))),
+        Case("Interaction.edit_interaction",
+             lambda fx, i, state: sql.Interaction.edit_interaction(state[1], fx.contact(i), notes=f"{BENCH_NAME} {i}"),
+             setup=lambda fx, i: (_last_interaction(fx.contact(i)),
+                                  _add_bench_interaction(fx, i) or _latest_id(sql.Interaction.id)),
+             teardown=lambda fx, i, state: (sql.Interaction.delete_interaction(state[1]),
+                                            _restore_last_interaction(fx.contact(i), state[0]))),
+        Case("Interaction.delete_interaction", lambda fx, i, state: sql.Interaction.delete_interaction(state[1]),
+             setup=lambda fx, i: (_last_interaction(fx.contact(i)),
+                                  _add_bench_interaction(fx, i) or _latest_id(sql.Interaction.id)),
+             teardown=lambda fx, i, state: _restore_last_interaction(fx.contact(i), state[0])),
+        Case("Interaction.get_as_dataframe[after add]", lambda fx, i, state: sql.Interaction.get_as_dataframe(),
+             setup=_add_interaction_after_load,
+             teardown=lambda fx, i, state: (sql.Interaction.delete_interaction(state[1]),
+                                            _restore_last_interaction(fx.contact(i), state[0])), warm=True),
+
+        Case("ImportantDates.get_important_dates_dataframe",
+             lambda fx, i, state: sql.ImportantDates.get_important_dates_dataframe()),
+        Case("ImportantDates.get_upcoming", lambda fx, i, state: sql.ImportantDates.get_upcoming(fx.today, 14)),
+        Case("ImportantDates.add_date_for_contact",
+             lambda fx, i, state: sql.ImportantDates.add_date_for_contact(contact_name=fx.contact(i), date=fx.today,
+                                                                          description=BENCH_NAME),
+             teardown=lambda fx, i, state: _delete_important_date(_latest_id(sql.ImportantDates.date_id))),
+
+        Case("search", lambda fx, i, state: sql.search(fx.contact(i).split()[0])),
+    ]
+
+
+def _main_page(fx):
+    today = fx.today
+    return sql.fetch_concurrently({
+        "today_tasks": lambda: sql.Task.get_tasks_due_between(today, today, include_done=True),
+        "upcoming_tasks": lambda: sql.Task.get_tasks_due_between(today + datetime.timedelta(days=1), None,
+                                                                 include_done=True),
+        "upcoming_dates": lambda: sql.ImportantDates.get_upcoming(today, days=14),
+        "circle_stats": sql.Circles.get_circle_stats,
+        "contacts": sql.Contacts.get_contacts_as_dataframe,
+        "overdue_circles": lambda: sql.Circles.get_overdue_circles(today),
+    })
+
+
+def _graph_page(fx):
+    sql.Contacts.get_contact_names()
+    contact_graph = graph.reload_graph()
+    contact_graph.shortest_path(fx.contact_ids[0], fx.contact_ids[-1])
+    contact_graph.k_hop(fx.contact_ids[0], 2)
+    contact_graph.degree_ranking()
+    contact_graph.betweenness_ranking()
+
+
+# Данные, которые запрашивает каждая страница при открытии, без отрисовки
+def page_cases():
+    return [
+        Case("page:main", lambda fx, i, state: _main_page(fx)),
+        Case("page:circles", lambda fx, i, state: (sql.Circles.get_circles_as_dataframe(),
+                                                   sql.Circles.get_circles_as_dataframe_simple(),
+                                                   sql.Circles.get_circles_list())),
+        Case("page:contacts", lambda fx, i, state: (sql.Contacts.get_contacts_as_dataframe(),
+                                                    sql.Contacts.get_contacts_list(),
+                                                    sql.Circles.get_circles_list())),
+        Case("page:profile", lambda fx, i, state: (name_index.contact_matches(fx.contact(i)[:3]),
+                                                   sql.Contacts.get_profile(sql.Contacts.get_contact_by_name(
+                                                       fx.contact(i))))),
+        Case("page:tasks", lambda fx, i, state: (sql.Task.get_incomplete_tasks_by_executor(fx.user(i)),
+                                                 sql.Task.get_incomplete_tasks_by_creator(fx.user(i)))),
+        Case("page:connections", lambda fx, i, state: (name_index.contact_matches(fx.contact(i)[:3]),
+                                                       sql.Connections.get_connections_for_contact(fx.contact(i)))),
+        Case("page:graph", lambda fx, i, state: _graph_page(fx)),
+        Case("page:interactions", lambda fx, i, state: (name_index.user_matches(fx.user(i)[:3]),
+                                                        name_index.contact_matches(fx.contact(i)[:3]),
+                                                        sql.Interaction.page(None, 50))),
+        Case("page:dates", lambda fx, i, state: sql.ImportantDates.get_important_dates_dataframe()),
+        Case("page:search", lambda fx, i, state: sql.search(fx.contact(i).split()[0])),
+    ]
+
+
+def public_classmethods():
+    names = set()
+    for mapper in sql.Base.registry.mappers:
+        model = mapper.class_
+        for attr, value in vars(model).items():
+            if isinstance(value, classmethod) and not attr.startswith("_"):
+                names.add(f"{model.__name__}.{attr}")
+    return names
+
+
+def _summary(latencies):
+    latencies = np.array(latencies)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "iterations": len(latencies),
+        "mean_ms": latencies.mean() * 1000,
+        "min_ms": latencies.min() * 1000,
+        "p50_ms": p50 * 1000,
+        "p95_ms": p95 * 1000,
+        "p99_ms": p99 * 1000,
+        "max_ms": latencies.max() * 1000,
+        "throughput_per_s": len(latencies) / latencies.sum() if latencies.sum() else None,
+    }
+
+
+def _run_once(case, fx, i, cold):
+    state = case.setup(fx, i) if case.setup else None
+    if cold and not case.warm:
+        sql.query_cache.clear()
+    start = time.perf_counter()
+    try:
+        case.run(fx, i, state)
+        return time.perf_counter() - start
+    finally:
+        if case.teardown:
+            case.teardown(fx, i, state)
+
+
+def measure(case, fx, iterations, warmup, cold):
+    latencies = []
+    for i in range(warmup + iterations):
+        elapsed = _run_once(case, fx, i, cold)
+        if i >= warmup:
+            latencies.append(elapsed)
+    result = _summary(latencies)
+
+    # Память - отдельным прогоном: под tracemalloc код работает в разы медленнее и исказил бы задержки
+    state = case.setup(fx, 0) if case.setup else None
+    if cold and not case.warm:
+        sql.query_cache.clear()
+    tracemalloc.start()
+    try:
+        case.run(fx, 0, state)
+        result["peak_memory_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+        if case.teardown:
+            case.teardown(fx, 0, state)
+    return result
+
+
+def _row_counts():
+    counts = {}
+    with sql.get_engine().connect() as conn:
+        for model in (sql.User, sql.Circles, sql.Contacts, sql.Connections, sql.Task, sql.Interaction,
+                      sql.ImportantDates):
+            counts[model.__tablename__] = conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+    return counts
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(cases, iterations, warmup, cold, seed):
+    fx = Fixtures(seed)
+    results = {}
+    for case in cases:
+        try:
+            results[case.name] = measure(case, fx, iterations, warmup, cold)
+        except Exception as e:
+            results[case.name] = {"error": f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"}
+        print(_format_line(case.name, results[case.name]), flush=True)
+    return results
+
+
+def _format_line(name, result):
+    if "error" in result:
+        return f"{name:50} ошибка: {result['error'][:80]}"
+    return (f"{name:50} p50 {result['p50_ms']:9.2f} мс  p95 {result['p95_ms']:9.2f} мс  "
+            f"p99 {result['p99_ms']:9.2f} мс  память {result['peak_memory_kb']:9.0f} КБ")
+
+
+def compare(baseline, current, threshold):
+    regressions = []
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old or "error" in old or "error" in result:
+            continue
+        ratio = result["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("inf")
+        mark = "  <- регрессия" if ratio > threshold else ""
+        print(f"{name:50} {old['p50_ms']:9.2f} -> {result['p50_ms']:9.2f} мс  x{ratio:.2f}{mark}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры методов sql и данных страниц на локальной базе")
+    parser.add_argument("url", help="адрес базы, заполненной benchmarks/generate.py")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--warm", action="store_true", help="не сбрасывать кэш запросов перед каждым вызовом")
+    parser.add_argument("--filter", help="замерять только случаи, в имени которых есть эта подстрока")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="сохранить результаты в JSON")
+    parser.add_argument("--compare", help="JSON с результатами прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=1.2, help="во сколько раз рост p50 считается регрессией")
+    args = parser.parse_args()
+
+    sql.configure(args.url)
+    cases = method_cases() + page_cases()
+    if args.filter:
+        cases = [case for case in cases if args.filter in case.name]
+    covered = {case.name for case in method_cases()}
+    missing = sorted(public_classmethods() - covered - NOT_BENCHMARKED)
+    if missing:
+        print(f"Без замеров: {', '.join(missing)}")
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "dialect": sql.get_engine().dialect.name,
+            "rows": _row_counts(),
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "cache": "warm" if args.warm else "cold",
+        },
+        "results": run(cases, args.iterations, args.warmup, not args.warm, args.seed),
+        "not_covered": missing,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(json.load(file), report, args.threshold)
+    # Упавший случай - такой же провал прогона, как регрессия: иначе сломанный метод молча выпадает из сравнения
+    failed = [name for name, result in report["results"].items() if "error" in result]
+    if failed:
+        print(f"С ошибкой: {', '.join(failed)}")
+    if regressions or failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import os
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError
+import sql
+
+CHUNK_SIZE = 1000
+
+
+class RowError:
+    def __init__(self, line, message):
+        self.line = line
+        self.message = message
+
+    def __repr__(self):
+        return f"RowError(line={self.line}, message={self.message!r})"
+
+
+class ImportReport:
+    def __init__(self, kind, dry_run):
+        self.kind = kind
+        self.dry_run = dry_run
+        self.read = 0
+        self.inserted = 0
+        self.errors = []
+        self.last_interaction_updated = 0
+
+    def __repr__(self):
+        return (f"ImportReport(kind={self.kind!r}, dry_run={self.dry_run}, read={self.read}, "
+                f"inserted={self.inserted}, errors={len(self.errors)})")
+
+
+def read_rows(path, fmt=None):
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    with open(path, encoding="utf-8", newline="") as file:
+        if fmt == "csv":
+            # Первая строка - заголовок, поэтому данные начинаются со второй
+            for line, row in enumerate(csv.DictReader(file), start=2):
+                yield line, row
+        elif fmt in ("jsonl", "ndjson"):
+            for line, text in enumerate(file, start=1):
+                if text.strip():
+                    yield line, json.loads(text)
+        else:
+            raise ValueError(f"Неизвестный формат файла: {fmt}")
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _text(row, field, required=False):
+    value = row.get(field)
+    if value is None or str(value).strip() == "":
+        if required:
+            raise ValueError(f"Не заполнено поле {field}")
+        return None
+    return str(value).strip()
+
+
+def _date(row, field, required=False):
+    value = _text(row, field, required)
+    if value is None:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Поле {field}: ожидается дата в формате ГГГГ-ММ-ДД, получено {value!r}")
+
+
+def _ids_by_name(session, name_column, id_column, names):
+    if not names:
+        return {}
+    result = session.execute(select(name_column, id_column).where(name_column.in_(names))).all()
+    ids = {}
+    for name, row_id in result:
+        ids.setdefault(name, row_id)
+    return ids
+
+
+# Общая часть импортеров. Каждый подкласс задает table, tables и prepare(session, chunk), который
+# возвращает пары (строка файла, значения) для вставки и ошибки проверки
+class _Importer:
+    table = None
+    tables = ()
+
+    def __init__(self):
+        self.touched_contacts = set()
+
+    def inserted(self, rows):
+        self.touched_contacts.update(values["contact_id"] for values in rows)
+
+    def finish(self, report):
+        pass
+
+
+class ContactsImporter(_Importer):
+    table = sql.Contacts.__table__
+    tables = ("contacts", "contact_names", "circle_stats")
+
+    def __init__(self):
+        super().__init__()
+        self.seen_names = set()
+        self.touched_circles = set()
+
+    def prepare(self, session, chunk):
+        circle_ids = _ids_by_name(session, sql.Circles.circle_name, sql.Circles.circle_id,
+                                  {_text(row, "circle_name") for _, row in chunk} - {None})
+        existing = _ids_by_name(session, sql.Contacts.contact_name, sql.Contacts.contact_id,
+                                {_text(row, "contact_name") for _, row in chunk} - {None})
+        prepared, errors = [], []
+        for line, row in chunk:
+            try:
+                name = _text(row, "contact_name", required=True)
+                circle_name = _text(row, "circle_name", required=True)
+                if circle_name not in circle_ids:
+                    raise ValueError(f"Круг {circle_name!r} не найден")
+                if name in existing or name in self.seen_names:
+                    raise ValueError(f"Контакт {name!r} уже существует")
+                values = {
+                    "contact_name": name,
+                    "circle_id": circle_ids[circle_name],
+                    "email": _text(row, "email"),
+                    "phone": _text(row, "phone"),
+                    "hobbies": _text(row, "hobbies"),
+                    "additional": _text(row, "additional"),
+                    "birthday": _date(row, "birthday"),
+                    "last_interaction": _date(row, "last_interaction"),
+                }
+            except ValueError as e:
+                errors.append(RowError(line, str(e)))
+                continue
+            self.seen_names.add(name)
+            prepared.append((line, values))
+        return prepared, errors
+
+    def inserted(self, rows):
+        self.touched_circles.update(values["circle_id"] for values in rows)
+
+    def finish(self, report):
+        if not report.dry_run and self.touched_circles:
+            sql.CircleStats.rebuild(self.touched_circles)
+
+
+class InteractionsImporter(_Importer):
+    table = sql.Interaction.__table__
+    tables = ("interactions", "contacts", "circle_stats")
+
+    def prepare(self, session, chunk):
+        user_ids = _ids_by_name(session, sql.User.user_name, sql.User.user_id,
+                                {_text(row, "user_name") for _, row in chunk} - {None})
+        contact_ids = _ids_by_name(session, sql.Contacts.contact_name, sql.Contacts.contact_id,
+                                   {_text(row, "contact_name") for _, row in chunk} - {None})
+        prepared, errors = [], []
+        for line, row in chunk:
+            try:
+                user_name = _text(row, "user_name", required=True)
+                contact_name = _text(row, "contact_name", required=True)
+                if user_name not in user_ids:
+                    raise ValueError(f"Пользователь {user_name!r} не найден")
+                if contact_name not in contact_ids:
+                    raise ValueError(f"Контакт {contact_name!r} не найден")
+                values = {
+                    "user_id": user_ids[user_name],
+                    "contact_id": contact_ids[contact_name],
+                    "interaction_date": _date(row, "interaction_date") or datetime.date.today(),
+                    "interaction_type": _text(row, "interaction_type", required=True),
+                    "notes": _text(row, "notes"),
+                }
+            except ValueError as e:
+                errors.append(RowError(line, str(e)))
+                continue
+            prepared.append((line, values))
+        return prepared, errors
+
+    def finish(self, report):
+        # last_interaction пересчитывается один раз в конце, а не на каждую строку
+        if report.dry_run or not self.touched_contacts:
+            return
+        for ids in chunked(sorted(self.touched_contacts), CHUNK_SIZE):
+            report.last_interaction_updated += sql.Contacts.refresh_last_interaction(ids)
+
+
+class ImportantDatesImporter(_Importer):
+    table = sql.ImportantDates.__table__
+    tables = ("important_dates",)
+
+    def prepare(self, session, chunk):
+        contact_ids = _ids_by_name(session, sql.Contacts.contact_name, sql.Contacts.contact_id,
+                                   {_text(row, "contact_name") for _, row in chunk} - {None})
+        prepared, errors = [], []
+        for line, row in chunk:
+            try:
+                contact_name = _text(row, "contact_name", required=True)
+                if contact_name not in contact_ids:
+                    raise ValueError(f"Контакт {contact_name!r} не найден")
+                values = {
+                    "contact_id": contact_ids[contact_name],
+                    "date": _date(row, "date", required=True),
+                    "description": _text(row, "description", required=True),
+                }
+            except ValueError as e:
+                errors.append(RowError(line, str(e)))
+                continue
+            prepared.append((line, values))
+        return prepared, errors
+
+
+IMPORTERS = {
+    "contacts": ContactsImporter,
+    "interactions": InteractionsImporter,
+    "important_dates": ImportantDatesImporter,
+}
+
+
+def _insert_chunk(session, importer, prepared, report):
+    try:
+        with session.begin_nested():
+            session.execute(insert(importer.table), [values for _, values in prepared])
+        return [values for _, values in prepared]
+    except DBAPIError:
+        pass
+
+    # Пакет целиком не вставился - повторяем построчно, чтобы указать виновные строки
+    inserted = []
+    for line, values in prepared:
+        try:
+            with session.begin_nested():
+                session.execute(insert(importer.table), [values])
+            inserted.append(values)
+        except DBAPIError as e:
+            report.errors.append(RowError(line, str(e.orig)))
+    return inserted
+
+
+def import_rows(kind, rows, dry_run=False, chunk_size=CHUNK_SIZE):
+    importer = IMPORTERS[kind]()
+    report = ImportReport(kind, dry_run)
+    try:
+        for chunk in chunked(rows, chunk_size):
+            report.read += len(chunk)
+            with sql.session_scope() as session:
+                prepared, errors = importer.prepare(session, chunk)
+                report.errors.extend(errors)
+                if dry_run or not prepared:
+                    continue
+                inserted = _insert_chunk(session, importer, prepared, report)
+            report.inserted += len(inserted)
+            importer.inserted(inserted)
+        importer.finish(report)
+    finally:
+        if not dry_run:
+            # Запущенное приложение увидит импорт через опубликованные версии таблиц, без перезапуска.
+            # Публикуется после finish: иначе приложение успело бы закэшировать сводки до пересчета
+            sql.publish_invalidation(*importer.tables)
+    report.errors.sort(key=lambda error: error.line)
+    return report
+
+
+def import_file(kind, path, fmt=None, dry_run=False, chunk_size=CHUNK_SIZE):
+    return import_rows(kind, read_rows(path, fmt), dry_run=dry_run, chunk_size=chunk_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Массовый импорт из CSV/JSONL")
+    parser.add_argument("kind", choices=sorted(IMPORTERS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="только проверить файл, ничего не записывая")
+    parser.add_argument("--errors", help="сохранить отчет об ошибках в CSV")
+    args = parser.parse_args()
+
+    report = import_file(args.kind, args.path, args.format, args.dry_run, args.chunk_size)
+    print(f"Прочитано строк: {report.read}")
+    print(f"{'Прошло бы проверку' if args.dry_run else 'Вставлено'}: "
+          f"{report.read - len(report.errors) if args.dry_run else report.inserted}")
+    print(f"Ошибок: {len(report.errors)}")
+    if report.last_interaction_updated:
+        print(f"Обновлено last_interaction: {report.last_interaction_updated}")
+
+    if args.errors:
+        with open(args.errors, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["line", "error"])
+            for error in report.errors:
+                writer.writerow([error.line, error.message])
+    else:
+        for error in report.errors[:20]:
+            print(f"  строка {error.line}: {error.message}")
+
+
+if __name__ == "__main__":
+    main()
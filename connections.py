@@ -1,8 +1,36 @@
-import streamlit as st
-
-sql_connection_string = ("mysql+pymysql://{}:{}@{}:{}/{}".format
-                         (st.secrets["database_connection"]["user"],
-                          st.secrets["database_connection"]["password"],
-                          st.secrets["database_connection"]["host"],
-                          st.secrets["database_connection"]["port"],
-                          st.secrets["database_connection"]["database_name"]))
\ No newline at end of file
+def get_connection_string():
+    # streamlit импортируется здесь, чтобы import sql не тянул его и не читал secrets до первого запроса
+    import streamlit as st
+
+    settings = st.secrets["database_connection"]
+    # Установка на одном компьютере может работать на встроенном файле SQLite без сервера MySQL
+    if settings.get("backend", "mysql") == "sqlite":
+        return f"sqlite:///{settings['path']}"
+    return "mysql+pymysql://{}:{}@{}:{}/{}".format(settings["user"],
+                                                   settings["password"],
+                                                   settings["host"],
+                                                   settings["port"],
+                                                   settings["database_name"])
+
+
+POOL_DEFAULTS = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_recycle": 3600,
+    "pool_pre_ping": True,
+    "pool_timeout": 30,
+}
+
+
+def get_pool_settings():
+    import streamlit as st
+
+    settings = dict(POOL_DEFAULTS)
+    settings.update(st.secrets.get("database_pool", {}))
+    return settings
+
+
+def get_admins():
+    import streamlit as st
+
+    return set(st.secrets.get("admins", []))
@@ -0,0 +1,90 @@
+import argparse
+import csv
+import os
+from sqlalchemy import select
+import sql
+
+CHUNK_SIZE = 5000
+
+MODELS = {
+    "circles": sql.Circles,
+    "contacts": sql.Contacts,
+    "interactions": sql.Interaction,
+    "tasks": sql.Task,
+    "connections": sql.Connections,
+    "important_dates": sql.ImportantDates,
+}
+
+
+def stream_table(model, chunk_size=CHUNK_SIZE):
+    table = model.__table__
+    statement = select(table).order_by(*table.primary_key.columns)
+    with sql.get_engine().connect() as conn:
+        # stream_results включает серверный курсор, yield_per ограничивает размер пачки в памяти
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(statement)
+        for partition in result.partitions():
+            yield partition
+
+
+def write_csv(model, path, chunk_size=CHUNK_SIZE):
+    columns = [column.name for column in model.__table__.columns]
+    rows = 0
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for partition in stream_table(model, chunk_size):
+            writer.writerows(partition)
+            rows += len(partition)
+    return rows
+
+
+def write_parquet(model, path, chunk_size=CHUNK_SIZE):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = list(model.__table__.columns)
+    schema = pa.schema([pa.field(column.name, sql.arrow_type(column.type) or pa.string(), nullable=column.nullable)
+                        for column in columns])
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        # Каждая пачка из курсора становится отдельной row group, вся таблица в память не попадает
+        for partition in stream_table(model, chunk_size):
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*partition), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(partition)
+    return rows
+
+
+WRITERS = {
+    "csv": write_csv,
+    "parquet": write_parquet,
+}
+
+
+def export_tables(names, out_dir, fmt="csv", chunk_size=CHUNK_SIZE):
+    os.makedirs(out_dir, exist_ok=True)
+    exported = {}
+    for name in names:
+        path = os.path.join(out_dir, f"{name}.{fmt}")
+        exported[name] = (path, WRITERS[fmt](MODELS[name], path, chunk_size))
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Потоковая выгрузка таблиц в CSV или Parquet")
+    parser.add_argument("tables", nargs="*", help=f"таблицы для выгрузки, по умолчанию все: {', '.join(MODELS)}")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    parser.add_argument("--out", default="export")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    unknown = set(args.tables) - set(MODELS)
+    if unknown:
+        parser.error(f"неизвестные таблицы: {', '.join(sorted(unknown))}")
+
+    exported = export_tables(args.tables or list(MODELS), args.out, args.format, args.chunk_size)
+    for name, (path, rows) in exported.items():
+        print(f"{name}: {rows} строк -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import threading
+from collections import Counter, defaultdict
+import numpy as np
+from sqlalchemy import select
+import sql
+
+# Доля изменений поверх CSR, после которой массивы пересобираются целиком
+COMPACT_RATIO = 0.1
+BETWEENNESS_SAMPLES = 64
+# Доля изменившихся ребер, после которой посредничество считается заново; до этого рейтинг отдается
+# по прошлому расчету, а пересчет можно запросить явно
+BETWEENNESS_STALE_RATIO = 0.05
+
+
+def _pair(a, b):
+    return (a, b) if a < b else (b, a)
+
+
+# Граф связей контактов. Основа - CSR-массивы (indptr/indices) по плотным номерам вершин,
+# поверх них лежит небольшой слой добавленных и удаленных ребер, который периодически вливается в CSR.
+# Ребра приходят тройками (connection_id, контакт, контакт): по номерам связей изменение, которое уже
+# попало в загрузку, не применяется второй раз
+class ContactGraph:
+    def __init__(self, edges=()):
+        self._lock = threading.RLock()
+        self._betweenness_lock = threading.Lock()
+        self._edge_count = Counter()
+        connection_ids = []
+        for connection_id, a, b in edges:
+            connection_ids.append(connection_id)
+            if a != b:
+                self._edge_count[_pair(a, b)] += 1
+        self._connection_ids = np.unique(np.array(connection_ids, dtype=np.int64))
+        self._added_connections = set()
+        self._removed_connections = set()
+        self.version = 0
+        self._betweenness = None
+        self._build()
+
+    def _build(self):
+        if self._added_connections or self._removed_connections:
+            removed = np.array(sorted(self._removed_connections), dtype=np.int64)
+            added = np.array(sorted(self._added_connections), dtype=np.int64)
+            self._connection_ids = np.union1d(np.setdiff1d(self._connection_ids, removed), added)
+            self._added_connections = set()
+            self._removed_connections = set()
+        pairs = np.array(list(self._edge_count), dtype=np.int64).reshape(-1, 2)
+        ids = np.unique(pairs)
+        dense = np.searchsorted(ids, pairs)
+        src = np.concatenate([dense[:, 0], dense[:, 1]])
+        dst = np.concatenate([dense[:, 1], dense[:, 0]])
+        order = np.lexsort((dst, src))
+
+        self._ids = ids
+        self._index = {int(contact_id): i for i, contact_id in enumerate(ids)}
+        self._indices = dst[order].astype(np.int32)
+        self._indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(ids)), out=self._indptr[1:])
+        self._added = defaultdict(set)
+        self._removed = defaultdict(set)
+        self._overlay_size = 0
+
+    def _compact_if_needed(self, force=False):
+        if self._overlay_size and (force or self._overlay_size > COMPACT_RATIO * max(len(self._edge_count), 1)):
+            self._build()
+
+    def _base_neighbours(self, contact_id):
+        i = self._index.get(contact_id)
+        if i is None:
+            return np.empty(0, dtype=np.int64)
+        return self._ids[self._indices[self._indptr[i]:self._indptr[i + 1]]]
+
+    def _in_base(self, a, b):
+        i = self._index.get(a)
+        j = self._index.get(b)
+        if i is None or j is None:
+            return False
+        row = self._indices[self._indptr[i]:self._indptr[i + 1]]
+        k = np.searchsorted(row, j)
+        return k < len(row) and row[k] == j
+
+    def _has_connection(self, connection_id):
+        if connection_id in self._added_connections:
+            return True
+        if connection_id in self._removed_connections:
+            return False
+        k = np.searchsorted(self._connection_ids, connection_id)
+        return k < len(self._connection_ids) and self._connection_ids[k] == connection_id
+
+    def add_edge(self, connection_id, a, b):
+        with self._lock:
+            if self._has_connection(connection_id):
+                return
+            if connection_id in self._removed_connections:
+                self._removed_connections.discard(connection_id)
+            else:
+                self._added_connections.add(connection_id)
+            if a == b:
+                return
+            pair = _pair(a, b)
+            self._edge_count[pair] += 1
+            if self._edge_count[pair] > 1:
+                return
+            if b in self._removed[a]:
+                self._removed[a].discard(b)
+                self._removed[b].discard(a)
+            else:
+                self._added[a].add(b)
+                self._added[b].add(a)
+            self._overlay_size += 1
+            self._changed()
+
+    def remove_edge(self, connection_id, a, b):
+        with self._lock:
+            if not self._has_connection(connection_id):
+                return
+            if connection_id in self._added_connections:
+                self._added_connections.discard(connection_id)
+            else:
+                self._removed_connections.add(connection_id)
+            if a == b:
+                return
+            pair = _pair(a, b)
+            if not self._edge_count[pair]:
+                return
+            self._edge_count[pair] -= 1
+            if self._edge_count[pair]:
+                return
+            del self._edge_count[pair]
+            if b in self._added[a]:
+                self._added[a].discard(b)
+                self._added[b].discard(a)
+            elif self._in_base(a, b):
+                self._removed[a].add(b)
+                self._removed[b].add(a)
+            self._overlay_size += 1
+            self._changed()
+
+    def _changed(self):
+        self.version += 1
+        self._compact_if_needed()
+
+    def neighbours(self, contact_id):
+        with self._lock:
+            result = set(self._base_neighbours(contact_id).tolist())
+            result -= self._removed.get(contact_id, set())
+            result |= self._added.get(contact_id, set())
+            return result
+
+    def edge_count(self):
+        return len(self._edge_count)
+
+    def mutual(self, a, b):
+        return self.neighbours(a) & self.neighbours(b)
+
+    def k_hop(self, contact_id, k):
+        distances = {contact_id: 0}
+        frontier = [contact_id]
+        for depth in range(1, k + 1):
+            next_frontier = []
+            for node in frontier:
+                for neighbour in self.neighbours(node):
+                    if neighbour not in distances:
+                        distances[neighbour] = depth
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        del distances[contact_id]
+        return distances
+
+    def shortest_path(self, a, b):
+        if a == b:
+            return [a]
+        # Двунаправленный BFS: каждый раз расширяем меньший фронт
+        parents = {a: None}
+        children = {b: None}
+        front, back = [a], [b]
+        while front and back:
+            if len(front) > len(back):
+                front, back, parents, children = back, front, children, parents
+            next_front = []
+            for node in front:
+                for neighbour in self.neighbours(node):
+                    if neighbour in parents:
+                        continue
+                    parents[neighbour] = node
+                    if neighbour in children:
+                        return self._join_path(neighbour, parents, children, a)
+                    next_front.append(neighbour)
+            front = next_front
+        return None
+
+    @staticmethod
+    def _join_path(meeting, parents, children, start):
+        head = []
+        node = meeting
+        while node is not None:
+            head.append(node)
+            node = parents[node]
+        head.reverse()
+        node = children[meeting]
+        while node is not None:
+            head.append(node)
+            node = children[node]
+        return head if head[0] == start else head[::-1]
+
+    def degree_ranking(self, top=20):
+        with self._lock:
+            # Степени из CSR с поправкой на слой изменений, без пересборки массивов
+            degrees = np.diff(self._indptr)
+            ids = self._ids
+            changed = self._added.keys() | self._removed.keys()
+            if changed:
+                degrees = degrees.copy()
+                new_ids, new_degrees = [], []
+                for contact_id in changed:
+                    delta = len(self._added.get(contact_id, ())) - len(self._removed.get(contact_id, ()))
+                    i = self._index.get(contact_id)
+                    if i is not None:
+                        degrees[i] += delta
+                    elif delta:
+                        new_ids.append(contact_id)
+                        new_degrees.append(delta)
+                ids = np.concatenate([ids, np.array(new_ids, dtype=ids.dtype)])
+                degrees = np.concatenate([degrees, np.array(new_degrees, dtype=degrees.dtype)])
+            order = np.lexsort((ids, -degrees))[:top]
+            return [(int(ids[i]), int(degrees[i])) for i in order if degrees[i] > 0]
+
+    def betweenness_ranking(self, top=20, samples=BETWEENNESS_SAMPLES, seed=0, refresh=False):
+        # Расчет идет по снимку CSR-массивов вне блокировки графа: _build заменяет массивы, а не меняет их,
+        # поэтому чтение и запись графа не ждут прохода Брандеса. Одновременно считает только один поток
+        with self._betweenness_lock:
+            with self._lock:
+                stale = self._betweenness is None or self._betweenness[0] != samples or \
+                    self.version - self._betweenness[1] > BETWEENNESS_STALE_RATIO * max(len(self._edge_count), 1)
+                snapshot = None
+                if refresh or stale:
+                    self._compact_if_needed(force=True)
+                    snapshot = (self.version, self._ids, self._indptr, self._indices)
+            if snapshot is not None:
+                version, ids, indptr, indices = snapshot
+                scores = _compute_betweenness(indptr, indices, samples, seed)
+                with self._lock:
+                    self._betweenness = (samples, version, ids, scores)
+
+        with self._lock:
+            _, _, ids, scores = self._betweenness
+            order = np.argsort(-scores, kind="stable")
+            # Прошлый расчет может содержать контакты, у которых с тех пор не осталось связей
+            ranking = []
+            for i in order:
+                if len(ranking) == top:
+                    break
+                if self.neighbours(int(ids[i])):
+                    ranking.append((int(ids[i]), float(scores[i])))
+            return ranking
+
+    def betweenness_age(self):
+        with self._lock:
+            return None if self._betweenness is None else self.version - self._betweenness[1]
+
+
+def _expand(indptr, indices, frontier):
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    src = np.repeat(frontier, counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+    return src, indices[offsets].astype(np.int64)
+
+
+def _compute_betweenness(indptr, indices, samples, seed):
+    # Алгоритм Брандеса с векторизованным BFS по уровням; на больших графах - по выборке источников
+    n = len(indptr) - 1
+    scores = np.zeros(n)
+    if n < 3:
+        return scores
+    sources = np.arange(n)
+    if samples and samples < n:
+        sources = np.random.default_rng(seed).choice(n, samples, replace=False)
+
+    for source in sources:
+        distance = np.full(n, -1, dtype=np.int64)
+        sigma = np.zeros(n)
+        distance[source] = 0
+        sigma[source] = 1
+        frontier = np.array([source], dtype=np.int64)
+        levels = []
+        depth = 0
+        while frontier.size:
+            src, dst = _expand(indptr, indices, frontier)
+            fresh = np.unique(dst[distance[dst] == -1])
+            distance[fresh] = depth + 1
+            forward = distance[dst] == depth + 1
+            src, dst = src[forward], dst[forward]
+            np.add.at(sigma, dst, sigma[src])
+            levels.append((src, dst))
+            frontier = fresh
+            depth += 1
+
+        delta = np.zeros(n)
+        for src, dst in reversed(levels):
+            np.add.at(delta, src, sigma[src] / sigma[dst] * (1 + delta[dst]))
+        delta[source] = 0
+        scores += delta
+
+    # Граф неориентированный - каждый путь посчитан с обоих концов
+    scores /= 2
+    if len(sources) < n:
+        scores *= n / len(sources)
+    return scores
+
+
+def load_edges(chunk_size=10000):
+    statement = select(sql.Connections.connection_id, sql.Connections.cont1_id, sql.Connections.cont2_id)
+    with sql.get_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(statement)
+        for partition in result.partitions():
+            yield from partition
+
+
+_graph = None
+_graph_state = None
+_graph_lock = threading.Lock()
+
+
+def _apply_change(kind, connection_id, a, b):
+    if _graph is None:
+        return
+    if kind == "insert":
+        _graph.add_edge(connection_id, a, b)
+    elif kind == "delete":
+        _graph.remove_edge(connection_id, a, b)
+
+
+sql.on_change("connections", _apply_change)
+
+
+# Свои записи вливаются в граф через on_change. Граф перечитывается целиком после полной очистки кэша
+# (в том числе смены базы) и когда другой процесс опубликовал изменение connections через publish_invalidation
+def _state():
+    return sql.query_cache.generation, sql.query_cache.shared_version("connections")
+
+
+def get_graph():
+    global _graph, _graph_state
+    state = _state()
+    if _graph is None or _graph_state != state:
+        with _graph_lock:
+            if _graph is None or _graph_state != state:
+                _graph = ContactGraph(load_edges())
+                _graph_state = state
+    return _graph
+
+
+def reload_graph():
+    global _graph, _graph_state
+    state = _state()
+    with _graph_lock:
+        _graph = ContactGraph(load_edges())
+        _graph_state = state
+    return _graph
@@ -1,5 +1,8 @@
+import time
 import streamlit as st
 import sql
+from connections import get_admins
+from metrics import metrics
 
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
@@ -13,13 +16,16 @@ def login():
         submit = st.form_submit_button("Войти")
 
         if submit:
-            if user_input in sql.User.get_user_list():
-                if password_input == sql.User.check_user_password(user_input):
-                    st.session_state.logged_in = True
-                    st.session_state.user = user_input
-                    st.rerun()
-                else:
-                    st.error("Неверный логин или пароль")
+            try:
+                user_id = sql.User.authenticate(user_input, password_input)
+            except sql.LoginThrottledError as e:
+                st.error(str(e))
+                return
+            if user_id is not None:
+                st.session_state.logged_in = True
+                st.session_state.user = user_input
+                st.session_state.user_id = user_id
+                st.rerun()
             else:
                 st.error("Неверный логин или пароль")
 
@@ -37,19 +43,32 @@ logout_page = st.Page(logout, title="Выйти", icon=":material/logout:")
 main_page = st.Page("pages/main_page.py", title="Главная", icon=":material/home:", default=True)
 circles_page = st.Page("pages/circles_page.py", title="Круги", icon=":material/settings_accessibility:")
 contacts_page = st.Page("pages/contacts_page.py", title="Контакты", icon=":material/contacts:")
+profile_page = st.Page("pages/profile_page.py", title="Профиль контакта", icon=":material/person:")
 tasks_page = st.Page("pages/tasks.py", title="Задачи", icon=":material/add_task:")
 connections_page = st.Page("pages/connections.py", title="Связи", icon=":material/share:")
+graph_page = st.Page("pages/graph_page.py", title="Граф связей", icon=":material/hub:")
 interactions_page = st.Page("pages/interactions_page.py", title="Взаимодействия", icon=":material/handshake:")
 dates = st.Page("pages/dates_page.py", title="Даты", icon=":material/event:")
+search_page = st.Page("pages/search_page.py", title="Поиск", icon=":material/search:")
+diagnostics_page = st.Page("pages/diagnostics_page.py", title="Диагностика", icon=":material/monitoring:")
 
 if st.session_state.logged_in:
-    pg = st.navigation(
-        {
-            "Логин": [logout_page],
-            "Страницы": [main_page, circles_page, contacts_page, tasks_page, connections_page, interactions_page, dates]
-        }
-    )
+    pages = {
+        "Логин": [logout_page],
+        "Страницы": [main_page, circles_page, contacts_page, profile_page, tasks_page, connections_page,
+                     graph_page, interactions_page, dates, search_page]
+    }
+    if st.session_state.user in get_admins():
+        pages["Администрирование"] = [diagnostics_page]
+    pg = st.navigation(pages)
 else:
     pg = st.navigation([login_page])
 
-pg.run()
+start = time.perf_counter()
+try:
+    pg.run()
+except sql.SchemaOutdatedError as e:
+    st.error(str(e))
+finally:
+    # st.rerun и st.stop прерывают страницу исключением - такой прогон тоже засчитывается
+    metrics.observe("page", pg.title, time.perf_counter() - start)
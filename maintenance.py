@@ -0,0 +1,46 @@
+import argparse
+import sql
+
+
+def rebuild_circle_stats():
+    sql.CircleStats.rebuild()
+    sql.publish_invalidation("circle_stats")
+    print("Сводка по кругам пересчитана")
+
+
+def refresh_last_interaction():
+    count = sql.Contacts.refresh_last_interaction()
+    sql.publish_invalidation("contacts", "circle_stats")
+    print(f"Обновлено last_interaction: {count}")
+
+
+def hash_passwords():
+    count = sql.User.hash_plaintext_passwords()
+    sql.publish_invalidation("users")
+    print(f"Захешировано паролей: {count}")
+
+
+def prune_tombstones():
+    count = sql.Tombstone.prune()
+    # Вместе с надгробиями пропадают и сведения об удалениях: датафреймы приложения перечитываются целиком
+    sql.publish_invalidation("tombstones")
+    print(f"Удалено надгробий старше {sql.TOMBSTONE_RETENTION.days} дн.: {count}")
+
+
+COMMANDS = {
+    "rebuild-circle-stats": rebuild_circle_stats,
+    "refresh-last-interaction": refresh_last_interaction,
+    "hash-passwords": hash_passwords,
+    "prune-tombstones": prune_tombstones,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Служебные операции с базой данных")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    main()
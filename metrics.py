@@ -0,0 +1,116 @@
+import bisect
+import heapq
+import itertools
+import threading
+
+# Границы корзин гистограммы растут в геометрической прогрессии от 0.1 мс до ~100 с:
+# память постоянна, а ошибка перцентиля не больше шага корзины (20%)
+BUCKET_BOUNDS = [0.0001 * 1.2 ** i for i in range(77)]
+SLOWEST_KEPT = 20
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def observe(self, value, rows=None):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        if rows is not None and rows > 0:
+            self.rows += rows
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+            "total": self.total,
+            "rows": self.rows,
+        }
+
+
+class SlowStatement:
+    def __init__(self, duration, statement, parameters, caller, rows):
+        self.duration = duration
+        self.statement = statement
+        self.parameters = parameters
+        self.caller = caller
+        self.rows = rows
+
+
+# Общие для процесса замеры: гистограмма длительностей на каждую пару (вид, имя)
+# и несколько самых медленных запросов с параметрами, чтобы по ним можно было получить EXPLAIN
+class Metrics:
+
+    def __init__(self, slowest_kept=SLOWEST_KEPT):
+        self.slowest_kept = slowest_kept
+        self._histograms = {}
+        self._slowest = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def observe(self, kind, name, seconds, rows=None):
+        with self._lock:
+            histogram = self._histograms.get((kind, name))
+            if histogram is None:
+                histogram = self._histograms[(kind, name)] = Histogram()
+            histogram.observe(seconds, rows)
+
+    def observe_statement(self, statement, parameters, caller, seconds, rows=None):
+        self.observe("query", caller, seconds, rows)
+        slow = SlowStatement(seconds, statement, parameters, caller, rows)
+        with self._lock:
+            # Куча по длительности: в корне самый быстрый из сохраненных, его и вытесняем
+            entry = (seconds, next(self._order), slow)
+            if len(self._slowest) < self.slowest_kept:
+                heapq.heappush(self._slowest, entry)
+            elif seconds > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+        return slow
+
+    # Строки SELECT известны только после чтения результата - их досчитывает тот, кто результат читает
+    def add_rows(self, statement, rows):
+        with self._lock:
+            statement.rows = (statement.rows or 0) + rows
+            histogram = self._histograms.get(("query", statement.caller))
+            if histogram is not None:
+                histogram.rows += rows
+
+    def summary(self, kind):
+        with self._lock:
+            items = [(name, histogram.summary()) for (entry_kind, name), histogram in self._histograms.items()
+                     if entry_kind == kind]
+        return sorted(items, key=lambda item: item[1]["total"], reverse=True)
+
+    def slowest(self):
+        with self._lock:
+            return [entry[2] for entry in sorted(self._slowest, reverse=True)]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._slowest.clear()
+
+
+metrics = Metrics()
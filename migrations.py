@@ -0,0 +1,523 @@
+import argparse
+import datetime
+from sqlalchemy import Column, Integer, SmallInteger, String, Date, DateTime, Boolean, ForeignKey, MetaData, Table, Index, func, \
+    inspect, select, update, extract, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateTable, DropTable
+from sqlalchemy.sql.functions import FunctionElement
+import sql
+
+# Версии схемы фиксируются здесь, а не берутся из моделей sql.py: модели описывают последнюю версию схемы,
+# а каждая миграция должна видеть таблицы такими, какими они были на момент ее написания
+migrations_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations", migrations_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+baseline_metadata = MetaData()
+
+users = Table(
+    "users", baseline_metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("user_name", String(100), nullable=False),
+    Column("password", String(100), nullable=False),
+)
+
+circles = Table(
+    "circles", baseline_metadata,
+    Column("circle_id", Integer, primary_key=True),
+    Column("circle_name", String(100), nullable=False),
+    Column("interaction_frequency", Integer, nullable=False),
+)
+
+contacts = Table(
+    "contacts", baseline_metadata,
+    Column("contact_id", Integer, primary_key=True),
+    Column("contact_name", String(100), nullable=False),
+    Column("email", String(100)),
+    Column("phone", String(50)),
+    Column("hobbies", String(200)),
+    Column("additional", String(500)),
+    Column("birthday", Date),
+    Column("last_interaction", Date),
+    Column("circle_id", Integer, ForeignKey("circles.circle_id"), nullable=False),
+)
+
+tasks = Table(
+    "tasks", baseline_metadata,
+    Column("task_id", Integer, primary_key=True),
+    Column("task_name", String(100), nullable=False),
+    Column("description", String(255)),
+    Column("creator_id", Integer, ForeignKey("users.user_id"), nullable=False),
+    Column("executor_id", Integer, ForeignKey("users.user_id"), nullable=False),
+    Column("contact_id", Integer, ForeignKey("contacts.contact_id"), nullable=False),
+    Column("created_at", Date, default=func.current_date()),
+    Column("due_date", Date),
+    Column("done", Boolean),
+)
+
+connections = Table(
+    "connections", baseline_metadata,
+    Column("connection_id", Integer, primary_key=True),
+    Column("cont1_id", Integer, ForeignKey("contacts.contact_id"), nullable=False),
+    Column("cont2_id", Integer, ForeignKey("contacts.contact_id"), nullable=False),
+    Column("description", String(255), nullable=False),
+)
+
+interactions = Table(
+    "interactions", baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.user_id"), nullable=False),
+    Column("contact_id", Integer, ForeignKey("contacts.contact_id"), nullable=False),
+    Column("interaction_date", Date, default=func.current_date()),
+    Column("interaction_type", String(50), nullable=False),
+    Column("notes", String(255)),
+)
+
+important_dates = Table(
+    "important_dates", baseline_metadata,
+    Column("date_id", Integer, primary_key=True),
+    Column("contact_id", Integer, ForeignKey("contacts.contact_id"), nullable=False),
+    Column("date", Date, nullable=False),
+    Column("description", String(200), nullable=False),
+)
+
+
+class Migration:
+    def __init__(self, version, name, upgrade, downgrade):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+        self.downgrade = downgrade
+
+
+def _index_names(conn, table_name):
+    return {index["name"] for index in inspect(conn).get_indexes(table_name)}
+
+
+def _create_indexes(conn, *indexes):
+    for index in indexes:
+        if index.name not in _index_names(conn, index.table.name):
+            index.create(conn)
+
+
+def _drop_indexes(conn, *indexes):
+    for index in indexes:
+        table = index.table
+        if index.name not in _index_names(conn, table.name):
+            continue
+        # InnoDB не дает удалить последний индекс, на который опирается внешний ключ
+        first_column = list(index.columns)[0]
+        if conn.dialect.name == "mysql" and first_column.foreign_keys:
+            others = [existing for existing in inspect(conn).get_indexes(table.name)
+                      if existing["name"] != index.name and existing["column_names"][0] == first_column.name]
+            if not others:
+                Index(f"{table.name}_{first_column.name}_fk", first_column).create(conn)
+        index.drop(conn)
+
+
+def _column_names(conn, table_name):
+    return {column["name"] for column in inspect(conn).get_columns(table_name)}
+
+
+def _add_column(conn, column):
+    table = column.table
+    if column.name in _column_names(conn, table.name):
+        return
+    preparer = conn.dialect.identifier_preparer
+    conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} "
+                      f"{column.type.compile(dialect=conn.dialect)}"))
+
+
+def _modify_column(conn, column):
+    # В SQLite длина VARCHAR не проверяется, менять тип незачем
+    if conn.dialect.name != "mysql":
+        return
+    preparer = conn.dialect.identifier_preparer
+    conn.execute(text(f"ALTER TABLE {preparer.format_table(column.table)} MODIFY COLUMN {preparer.format_column(column)} "
+                      f"{column.type.compile(dialect=conn.dialect)}{'' if column.nullable else ' NOT NULL'}"))
+
+
+def _drop_column(conn, column):
+    table = column.table
+    if column.name not in _column_names(conn, table.name):
+        return
+    preparer = conn.dialect.identifier_preparer
+    conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} DROP COLUMN {preparer.format_column(column)}"))
+
+
+# Индексы привязаны к зафиксированным таблицам, но создаются своими миграциями, поэтому миграции создают
+# только сами таблицы: create_all и Table.create создали бы заодно и индексы всех следующих миграций
+def _create_table(conn, table):
+    if not inspect(conn).has_table(table.name):
+        conn.execute(CreateTable(table))
+
+
+def _drop_table(conn, table):
+    conn.execute(DropTable(table, if_exists=True))
+
+
+def _baseline_upgrade(conn):
+    for table in baseline_metadata.sorted_tables:
+        _create_table(conn, table)
+
+
+def _baseline_downgrade(conn):
+    for table in reversed(baseline_metadata.sorted_tables):
+        _drop_table(conn, table)
+
+
+lookup_indexes = (
+    Index("ix_users_user_name", users.c.user_name),
+    Index("ix_circles_circle_name", circles.c.circle_name),
+    Index("ix_contacts_contact_name", contacts.c.contact_name),
+)
+
+hot_path_indexes = (
+    Index("ix_contacts_circle_id_last_interaction", contacts.c.circle_id, contacts.c.last_interaction),
+    Index("ix_tasks_done_due_date", tasks.c.done, tasks.c.due_date),
+    Index("ix_tasks_executor_id_done", tasks.c.executor_id, tasks.c.done),
+    Index("ix_tasks_creator_id_done", tasks.c.creator_id, tasks.c.done),
+    Index("ix_interactions_contact_id_interaction_date", interactions.c.contact_id,
+          interactions.c.interaction_date),
+    Index("ix_interactions_user_id_id", interactions.c.user_id, interactions.c.id),
+    Index("ix_connections_cont1_id_cont2_id", connections.c.cont1_id, connections.c.cont2_id),
+    Index("ix_connections_cont2_id_cont1_id", connections.c.cont2_id, connections.c.cont1_id),
+)
+
+circle_stats = Table(
+    "circle_stats", MetaData(),
+    Column("circle_id", Integer, primary_key=True),
+    Column("contact_count", Integer, nullable=False, default=0),
+    Column("last_interaction_date", Date),
+    Column("last_interaction_contacts", String(1000)),
+)
+
+
+class _names_list(FunctionElement):
+    type = String()
+    inherit_cache = True
+
+
+@compiles(_names_list)
+def _names_list_default(element, compiler, **kw):
+    return f"group_concat({compiler.process(element.clauses, **kw)}, ', ')"
+
+
+@compiles(_names_list, "mysql")
+def _names_list_mysql(element, compiler, **kw):
+    name = compiler.process(element.clauses, **kw)
+    return f"GROUP_CONCAT({name} ORDER BY {name} SEPARATOR ', ')"
+
+
+# Начальная сводка считается одним INSERT ... SELECT по зафиксированным таблицам, в том же виде, в каком ее
+# потом поддерживает sql.refresh_circle_stats: имена контактов с последним взаимодействием - по алфавиту через запятую
+def _create_circle_stats(conn):
+    _create_table(conn, circle_stats)
+    totals = select(
+        circles.c.circle_id,
+        func.count(contacts.c.contact_id).label("contact_count"),
+        func.max(contacts.c.last_interaction).label("last_interaction_date"),
+    ).select_from(circles.outerjoin(contacts, contacts.c.circle_id == circles.c.circle_id)) \
+        .group_by(circles.c.circle_id).subquery()
+    latest = select(contacts.c.contact_name).where(contacts.c.circle_id == totals.c.circle_id,
+                                                  contacts.c.last_interaction == totals.c.last_interaction_date) \
+        .correlate(totals)
+    if conn.dialect.name == "mysql":
+        names = select(_names_list(contacts.c.contact_name)).where(*latest.whereclause.clauses)
+    else:
+        # group_concat в SQLite не принимает ORDER BY, имена склеиваются в порядке подзапроса
+        ordered = latest.order_by(contacts.c.contact_name).subquery()
+        names = select(_names_list(ordered.c.contact_name))
+    names = names.correlate(totals).scalar_subquery()
+    conn.execute(circle_stats.insert().from_select(
+        ["circle_id", "contact_count", "last_interaction_date", "last_interaction_contacts"],
+        select(totals.c.circle_id, totals.c.contact_count, totals.c.last_interaction_date,
+               func.coalesce(func.substr(names, 1, 1000), ""))
+    ))
+
+
+fulltext_indexes = (
+    Index("ft_contacts_search", contacts.c.contact_name, contacts.c.hobbies, contacts.c.additional,
+          mysql_prefix="FULLTEXT"),
+    Index("ft_interactions_search", interactions.c.notes, mysql_prefix="FULLTEXT"),
+    Index("ft_tasks_search", tasks.c.task_name, tasks.c.description, mysql_prefix="FULLTEXT"),
+)
+
+
+def _mysql_only(step):
+    def run(conn):
+        if conn.dialect.name == "mysql":
+            step(conn)
+
+    return run
+
+
+def _sqlite_only(step):
+    def run(conn):
+        if conn.dialect.name == "sqlite":
+            step(conn)
+
+    return run
+
+
+day_keys_metadata = MetaData()
+
+contacts_day_key = Table(
+    "contacts", day_keys_metadata,
+    Column("contact_id", Integer, primary_key=True),
+    Column("birthday", Date),
+    Column("birthday_key", SmallInteger),
+)
+
+important_dates_day_key = Table(
+    "important_dates", day_keys_metadata,
+    Column("date_id", Integer, primary_key=True),
+    Column("date", Date),
+    Column("date_key", SmallInteger),
+)
+
+day_key_indexes = (
+    Index("ix_contacts_birthday_key", contacts_day_key.c.birthday_key),
+    Index("ix_important_dates_date_key", important_dates_day_key.c.date_key),
+)
+
+
+def _add_day_keys(conn):
+    for table, date_column, key_column in ((contacts_day_key, "birthday", "birthday_key"),
+                                           (important_dates_day_key, "date", "date_key")):
+        _add_column(conn, table.c[key_column])
+        date = table.c[date_column]
+        conn.execute(update(table)
+                     .where(date.isnot(None))
+                     .values({key_column: extract("month", date) * 100 + extract("day", date)}))
+    _create_indexes(conn, *day_key_indexes)
+
+
+def _drop_day_keys(conn):
+    _drop_indexes(conn, *day_key_indexes)
+    _drop_column(conn, contacts_day_key.c.birthday_key)
+    _drop_column(conn, important_dates_day_key.c.date_key)
+
+
+# Хеш пароля длиннее прежних 100 символов с запасом под смену алгоритма
+users_password_hash = Table(
+    "users", MetaData(),
+    Column("user_id", Integer, primary_key=True),
+    Column("password", String(255), nullable=False),
+)
+
+
+def _narrow_password(conn):
+    # Обрезать хеши нельзя - после этого никто не войдет. Откат возможен, только пока все пароли
+    # помещаются в прежнюю длину столбца
+    limit = users.c.password.type.length
+    too_long = conn.execute(select(func.count()).select_from(users_password_hash)
+                            .where(func.length(users_password_hash.c.password) > limit)).scalar()
+    if too_long:
+        raise RuntimeError(f"Откат миграции 7 невозможен: у {too_long} пользователей пароль длиннее "
+                           f"{limit} символов и был бы обрезан")
+    _modify_column(conn, users.c.password)
+
+
+change_tracking_metadata = MetaData()
+
+contacts_updated_at = Table(
+    "contacts", change_tracking_metadata,
+    Column("contact_id", Integer, primary_key=True),
+    Column("updated_at", sql.UPDATED_AT),
+)
+
+tasks_updated_at = Table(
+    "tasks", change_tracking_metadata,
+    Column("task_id", Integer, primary_key=True),
+    Column("contact_id", Integer, ForeignKey("contacts.contact_id"), nullable=False),
+    Column("updated_at", sql.UPDATED_AT),
+)
+
+interactions_updated_at = Table(
+    "interactions", change_tracking_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("updated_at", sql.UPDATED_AT),
+)
+
+tombstones = Table(
+    "tombstones", change_tracking_metadata,
+    Column("tombstone_id", Integer, primary_key=True),
+    Column("table_name", String(50), nullable=False),
+    Column("row_id", Integer, nullable=False),
+    Column("deleted_at", sql.UPDATED_AT, nullable=False),
+)
+
+change_tracking_indexes = (
+    Index("ix_contacts_updated_at", contacts_updated_at.c.updated_at),
+    Index("ix_tasks_updated_at", tasks_updated_at.c.updated_at),
+    Index("ix_interactions_updated_at", interactions_updated_at.c.updated_at),
+    # Изменившийся контакт находит свои задачи по индексу, а не перебором таблицы
+    Index("ix_tasks_contact_id", tasks_updated_at.c.contact_id),
+    Index("ix_tombstones_table_name_deleted_at", tombstones.c.table_name, tombstones.c.deleted_at),
+)
+
+
+def _add_change_tracking(conn):
+    # Существующие строки считаются измененными в момент миграции
+    now = sql.utcnow()
+    for table in (contacts_updated_at, tasks_updated_at, interactions_updated_at):
+        _add_column(conn, table.c.updated_at)
+        conn.execute(update(table).where(table.c.updated_at.is_(None)).values(updated_at=now))
+    _create_table(conn, tombstones)
+    _create_indexes(conn, *change_tracking_indexes)
+
+
+def _drop_change_tracking(conn):
+    _drop_indexes(conn, *change_tracking_indexes)
+    _drop_table(conn, tombstones)
+    for table in (contacts_updated_at, tasks_updated_at, interactions_updated_at):
+        _drop_column(conn, table.c.updated_at)
+
+
+cache_versions = Table(
+    "cache_versions", MetaData(),
+    Column("table_name", String(50), primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+)
+
+
+# В SQLite нет FULLTEXT-индексов. Их заменяют бесконтентные таблицы FTS5 (хранят только индекс, rowid - ключ
+# строки), которые поддерживают триггеры. Регистр приводит токенизатор unicode61, а ё заменяется на е
+# в триггерах - так же, как запрос нормализует функция sql._casefold
+sqlite_fulltext = (
+    (contacts, contacts.c.contact_id, (contacts.c.contact_name, contacts.c.hobbies, contacts.c.additional)),
+    (interactions, interactions.c.id, (interactions.c.notes,)),
+    (tasks, tasks.c.task_id, (tasks.c.task_name, tasks.c.description)),
+)
+
+
+def _folded(row, columns):
+    return ", ".join(f"replace(replace({row}{column.name}, 'ё', 'е'), 'Ё', 'Е')" for column in columns)
+
+
+def _create_sqlite_fulltext(conn):
+    for table, key, columns in sqlite_fulltext:
+        fts = f"{table.name}_fts"
+        names = ", ".join(column.name for column in columns)
+        insert_new = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.{key.name}, {_folded('new.', columns)});"
+        delete_old = (f"INSERT INTO {fts}({fts}, rowid, {names}) "
+                      f"VALUES ('delete', old.{key.name}, {_folded('old.', columns)});")
+        conn.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='', "
+                          f"tokenize='unicode61 remove_diacritics 2')"))
+        conn.execute(text(f"INSERT INTO {fts}(rowid, {names}) "
+                          f"SELECT {key.name}, {_folded('', columns)} FROM {table.name}"))
+        conn.execute(text(f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table.name} BEGIN {insert_new} END"))
+        conn.execute(text(f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table.name} BEGIN {delete_old} END"))
+        # Частые обновления других колонок (last_interaction, updated_at) индекс не трогают
+        conn.execute(text(f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {names} ON {table.name} "
+                          f"BEGIN {delete_old} {insert_new} END"))
+
+
+def _drop_sqlite_fulltext(conn):
+    for table, _, _ in sqlite_fulltext:
+        fts = f"{table.name}_fts"
+        for trigger in ("insert", "delete", "update"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}_{trigger}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {fts}"))
+
+
+MIGRATIONS = [
+    Migration(1, "baseline schema", _baseline_upgrade, _baseline_downgrade),
+    Migration(2, "name lookup indexes",
+              lambda conn: _create_indexes(conn, *lookup_indexes),
+              lambda conn: _drop_indexes(conn, *lookup_indexes)),
+    Migration(3, "covering indexes for hot query paths",
+              lambda conn: _create_indexes(conn, *hot_path_indexes),
+              lambda conn: _drop_indexes(conn, *hot_path_indexes)),
+    Migration(4, "circle_stats summary table", _create_circle_stats,
+              lambda conn: _drop_table(conn, circle_stats)),
+    Migration(5, "fulltext search indexes",
+              _mysql_only(lambda conn: _create_indexes(conn, *fulltext_indexes)),
+              _mysql_only(lambda conn: _drop_indexes(conn, *fulltext_indexes))),
+    Migration(6, "day-of-year keys for recurring dates", _add_day_keys, _drop_day_keys),
+    Migration(7, "wider password column for hashes",
+              lambda conn: _modify_column(conn, users_password_hash.c.password), _narrow_password),
+    Migration(8, "row change timestamps and tombstones for delta sync", _add_change_tracking,
+              _drop_change_tracking),
+    Migration(9, "shared cache versions for cross-process invalidation",
+              lambda conn: _create_table(conn, cache_versions),
+              lambda conn: _drop_table(conn, cache_versions)),
+    Migration(10, "fts5 search tables for sqlite",
+              _sqlite_only(_create_sqlite_fulltext), _sqlite_only(_drop_sqlite_fulltext)),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(conn):
+    if not inspect(conn).has_table(schema_migrations.name):
+        return 0
+    return conn.execute(select(func.max(schema_migrations.c.version))).scalar() or 0
+
+
+def upgrade(engine, target=None):
+    target = LATEST_VERSION if target is None else target
+    applied = []
+    with engine.begin() as conn:
+        _create_table(conn, schema_migrations)
+    for migration in MIGRATIONS:
+        with engine.begin() as conn:
+            if migration.version <= current_version(conn) or migration.version > target:
+                continue
+            migration.upgrade(conn)
+            conn.execute(schema_migrations.insert().values(version=migration.version,
+                                                           name=migration.name,
+                                                           applied_at=datetime.datetime.now()))
+        applied.append(migration)
+    sql.query_cache.clear()
+    return applied
+
+
+def downgrade(engine, target):
+    reverted = []
+    for migration in reversed(MIGRATIONS):
+        with engine.begin() as conn:
+            if migration.version > current_version(conn) or migration.version <= target:
+                continue
+            migration.downgrade(conn)
+            conn.execute(schema_migrations.delete().where(schema_migrations.c.version == migration.version))
+        reverted.append(migration)
+    sql.query_cache.clear()
+    return reverted
+
+
+def is_up_to_date(engine):
+    with engine.connect() as conn:
+        return current_version(conn) >= LATEST_VERSION
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Миграции схемы базы данных")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = commands.add_parser("upgrade", help="применить миграции")
+    upgrade_parser.add_argument("target", type=int, nargs="?", default=None)
+    downgrade_parser = commands.add_parser("downgrade", help="откатить миграции до указанной версии")
+    downgrade_parser.add_argument("target", type=int)
+    commands.add_parser("status", help="показать текущую версию схемы")
+    args = parser.parse_args()
+    engine = sql.get_engine(check_schema=False)
+
+    if args.command == "upgrade":
+        for migration in upgrade(engine, args.target):
+            print(f"Применена миграция {migration.version}: {migration.name}")
+    elif args.command == "downgrade":
+        for migration in downgrade(engine, args.target):
+            print(f"Откачена миграция {migration.version}: {migration.name}")
+
+    with engine.connect() as conn:
+        print(f"Версия схемы: {current_version(conn)} из {LATEST_VERSION}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import heapq
+import threading
+from collections import Counter, defaultdict
+import sql
+
+TOP_K = 10
+
+
+def normalize(text):
+    return " ".join(text.casefold().replace("ё", "е").split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Триграммный индекс по именам: кандидаты набираются по общим триграммам, ранжируются по сходству Жаккара,
+# а совпадение с началом имени или слова поднимает кандидата выше
+class TrigramIndex:
+    def __init__(self, names):
+        self._names = list(names)
+        self._normalized = [normalize(name) for name in self._names]
+        self._trigram_counts = []
+        self._postings = defaultdict(list)
+        for i, name in enumerate(self._normalized):
+            grams = trigrams(name)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(i)
+
+    def __len__(self):
+        return len(self._names)
+
+    def search(self, query, k=TOP_K):
+        query = normalize(query)
+        if not query:
+            return []
+        query_grams = trigrams(query)
+        overlaps = Counter()
+        for gram in query_grams:
+            overlaps.update(self._postings.get(gram, ()))
+
+        def score(i):
+            overlap = overlaps[i]
+            similarity = overlap / (len(query_grams) + self._trigram_counts[i] - overlap)
+            name = self._normalized[i]
+            if name.startswith(query):
+                similarity += 1
+            elif f" {query}" in f" {name}":
+                similarity += 0.5
+            return similarity
+
+        best = heapq.nlargest(k, overlaps, key=lambda i: (score(i), -len(self._normalized[i])))
+        return [self._names[i] for i in best]
+
+
+class _VersionedIndex:
+    def __init__(self, tables, load):
+        self._tables = tables
+        self._load = load
+        self._index = None
+        self._versions = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        # Индекс пересобирается, только когда пишущие методы повысили версию таблицы или кэш очищен целиком
+        versions = (sql.query_cache.generation, sql.query_cache.versions(self._tables))
+        if self._index is None or self._versions != versions:
+            with self._lock:
+                if self._index is None or self._versions != versions:
+                    self._index = TrigramIndex(self._load())
+                    self._versions = versions
+        return self._index
+
+
+# Версия "contact_names" растет только при добавлении, переименовании и удалении контактов, а не при
+# каждой записи взаимодействия, которая обновляет last_interaction в таблице contacts
+_contacts = _VersionedIndex(("contact_names",), lambda: sql.Contacts.get_contact_names().values())
+_users = _VersionedIndex(("users",), sql.User.get_user_list)
+
+
+def contact_matches(query, k=TOP_K):
+    return _contacts.get().search(query, k)
+
+
+def user_matches(query, k=TOP_K):
+    return _users.get().search(query, k)
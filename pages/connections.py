@@ -1,20 +1,22 @@
 import streamlit as st
 import sql
+import widgets
 
 
 @st.dialog("Добавление связи")
 def add_connection():
     cont1 = st.session_state.contact_1
-    c_list = sql.Contacts.get_contacts_list()
-    c_list.remove(cont1)
-    cont2 = st.selectbox("Контакт", c_list, key="c2", index=None)
+    cont2 = widgets.contact_picker("Контакт", key="c2", exclude=(cont1,))
     desc = st.text_input("Связь")
     if st.button("Добавить связь"):
-        sql.Connections.add_connection(cont1, cont2, desc)
-        st.rerun()
+        if not cont2:
+            st.error("Выберите контакт")
+        else:
+            sql.Connections.add_connection(cont1, cont2, desc)
+            st.rerun()
 
 
-contact = st.selectbox("Контакт", sql.Contacts.get_contacts_list(), index=None)
+contact = widgets.contact_picker("Контакт", key="connections_contact")
 if contact:
     connections = sql.Connections.get_connections_for_contact(contact)
     if not connections.empty:
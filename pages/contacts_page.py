@@ -1,5 +1,6 @@
 import streamlit as st
 import sql
+import widgets
 
 data = sql.Contacts.get_contacts_as_dataframe()
 if not data.empty:
@@ -43,15 +44,15 @@ def edit_contact():
     c_list = contacts["contact_name"].tolist()
     contact_name = st.selectbox("Контакт", c_list, index=None)
     if contact_name:
-        contact_data = contacts[contacts["contact_name"] == contact_name].reset_index()
-        name = contact_data["contact_name"][0]
-        email = contact_data["email"][0]
-        phone = contact_data["phone"][0]
-        birthday = contact_data["birthday"][0]
-        hobbies = contact_data["hobbies"][0]
-        additional = contact_data["additional"][0]
-        last_interaction = contact_data["last_interaction"][0]
-        circle_name = contact_data["circle_name"][0]
+        contact_data = sql.first_row(contacts[contacts["contact_name"] == contact_name])
+        name = contact_data["contact_name"]
+        email = contact_data["email"]
+        phone = contact_data["phone"]
+        birthday = contact_data["birthday"]
+        hobbies = contact_data["hobbies"]
+        additional = contact_data["additional"]
+        last_interaction = contact_data["last_interaction"]
+        circle_name = contact_data["circle_name"]
 
         new_name = st.text_input("Имя", name)
         new_email = st.text_input("email", email)
@@ -88,7 +89,7 @@ def edit_contact():
 
 @st.dialog("Удаление контакта")
 def delete_contact():
-    name = st.selectbox("Контакт", sql.Contacts.get_contacts_list(), index=None)
+    name = widgets.contact_picker("Контакт", key="delete_contact")
     if name:
         if st.button("Удалить контакт"):
             sql.Contacts.delete_contact(name)
@@ -1,5 +1,6 @@
 import streamlit as st
 import sql
+import widgets
 
 data = sql.ImportantDates.get_important_dates_dataframe()
 st.write(data)
@@ -7,11 +8,14 @@ st.write(data)
 
 @st.dialog("Добавить дату")
 def add_date():
-    contact_selector = st.selectbox("Контакт", sql.Contacts.get_contacts_list())
+    contact_selector = widgets.contact_picker("Контакт", key="add_date_contact")
     date = st.date_input("Дата")
     desc = st.text_input("Расшифровка")
 
     if st.button("Добавить", key="add_date_accept"):
+        if not contact_selector:
+            st.error("Выберите контакт")
+            return
         sql.ImportantDates.add_date_for_contact(contact_name=contact_selector,
                                                 date=date,
                                                 description=desc)
@@ -0,0 +1,68 @@
+import pandas as pd
+import streamlit as st
+import sql
+from connections import get_admins
+from metrics import metrics
+
+if st.session_state.get("user") not in get_admins():
+    st.error("Страница доступна только администраторам")
+    st.stop()
+
+TIME_COLUMNS = ["mean", "p50", "p95", "p99", "max", "total"]
+
+
+def histogram_frame(kind, name_column):
+    rows = [{"name": name, **summary} for name, summary in metrics.summary(kind)]
+    df = pd.DataFrame(rows, columns=["name", "count"] + TIME_COLUMNS + ["rows"])
+    df[TIME_COLUMNS] = (df[TIME_COLUMNS].astype(float) * 1000).round(2)
+    df.columns = [name_column, "Вызовов", "Среднее, мс", "p50, мс", "p95, мс", "p99, мс", "Максимум, мс",
+                  "Всего, мс", "Строк"]
+    return df
+
+
+if st.button("Сбросить замеры"):
+    metrics.reset()
+
+st.header("Страницы")
+pages = histogram_frame("page", "Страница")
+if not pages.empty:
+    st.write(pages)
+else:
+    st.write("Замеров пока нет.")
+
+st.header("Запросы")
+queries = histogram_frame("query", "Метод")
+if not queries.empty:
+    st.write(queries)
+else:
+    st.write("Замеров пока нет.")
+
+st.header("Самые медленные запросы")
+slowest = metrics.slowest()
+if not slowest:
+    st.write("Замеров пока нет.")
+for i, statement in enumerate(slowest):
+    with st.expander(f"{statement.duration * 1000:.1f} мс — {statement.caller}"):
+        st.code(statement.statement, language="sql")
+        if statement.rows is not None:
+            st.write(f"Строк: {statement.rows}")
+        if statement.parameters is None:
+            st.caption("План доступен только для SELECT")
+        elif st.button("EXPLAIN", key=f"explain_{i}"):
+            try:
+                st.write(sql.explain(statement.statement, statement.parameters))
+            except Exception as e:
+                st.error(f"Не удалось получить план: {e}")
+
+st.header("Пул соединений")
+pool_metrics = sql.get_pool_metrics()
+if pool_metrics:
+    st.write(pd.DataFrame([pool_metrics]))
+else:
+    st.write("Соединения с базой еще не открывались.")
+
+st.header("Кэш запросов")
+st.write(pd.DataFrame([sql.query_cache.stats()]))
+
+st.header("Синхронизируемые таблицы")
+st.write(pd.DataFrame([frame.stats() for frame in sql.synced_frames.values()]))
@@ -0,0 +1,63 @@
+import streamlit as st
+import pandas as pd
+import graph
+import sql
+import widgets
+
+contact_names = sql.Contacts.get_contact_names()
+contact_ids = {name: contact_id for contact_id, name in contact_names.items()}
+contact_graph = graph.get_graph()
+
+
+def names(ids):
+    return [contact_names.get(contact_id, str(contact_id)) for contact_id in ids]
+
+
+def ranking_frame(ranking, value_column):
+    df = pd.DataFrame([(contact_names.get(contact_id, str(contact_id)), value) for contact_id, value in ranking],
+                      columns=["Контакт", value_column])
+    df.index += 1
+    return df
+
+
+col1, col2 = st.columns(2)
+with col1:
+    contact_a = widgets.contact_picker("Контакт A", key="graph_contact_a")
+with col2:
+    contact_b = widgets.contact_picker("Контакт B", key="graph_contact_b")
+
+if contact_a and contact_b:
+    st.header("Путь знакомства")
+    path = contact_graph.shortest_path(contact_ids[contact_a], contact_ids[contact_b])
+    if path:
+        st.write(" → ".join(names(path)))
+    else:
+        st.write("Контакты не связаны.")
+
+    st.header("Общие знакомые")
+    mutual = names(contact_graph.mutual(contact_ids[contact_a], contact_ids[contact_b]))
+    st.write(", ".join(sorted(mutual)) if mutual else "Общих знакомых нет.")
+
+if contact_a:
+    st.header("Окружение")
+    depth = st.slider("Глубина", min_value=1, max_value=4, value=2)
+    neighbourhood = contact_graph.k_hop(contact_ids[contact_a], depth)
+    if neighbourhood:
+        df = pd.DataFrame(sorted((distance, contact_names.get(contact_id, str(contact_id)))
+                                 for contact_id, distance in neighbourhood.items()),
+                          columns=["Рукопожатий", "Контакт"])
+        df.index += 1
+        st.write(df)
+    else:
+        st.write("Связей нет.")
+
+st.header("Самые связанные контакты")
+col1, col2 = st.columns(2)
+with col1:
+    st.write(ranking_frame(contact_graph.degree_ranking(), "Связей"))
+with col2:
+    refresh = st.button("Пересчитать посредничество")
+    st.write(ranking_frame(contact_graph.betweenness_ranking(refresh=refresh), "Посредничество"))
+    age = contact_graph.betweenness_age()
+    if age:
+        st.caption(f"Изменений связей после расчета: {age}")
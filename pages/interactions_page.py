@@ -1,18 +1,66 @@
 import streamlit as st
 import sql
+import widgets
 
-data = sql.Interaction.get_as_dataframe()
-data.columns = ["ID", "Пользователь", "Контакт", "Дата", "Тип контакта", "Описание"]
-st.write(data)
+PAGE_SIZE = 50
+
+if "interaction_cursors" not in st.session_state:
+    st.session_state.interaction_cursors = [None]
+
+
+def get_current_page():
+    filters = st.session_state.interaction_filters
+    return sql.Interaction.page(st.session_state.interaction_cursors[-1], PAGE_SIZE, **filters)
+
+
+col_user, col_contact, col_from, col_to = st.columns(4)
+with col_user:
+    user_filter = widgets.user_picker("Пользователь", key="user_filter")
+with col_contact:
+    contact_filter = widgets.contact_picker("Контакт", key="contact_filter")
+with col_from:
+    date_from = st.date_input("С", value=None)
+with col_to:
+    date_to = st.date_input("По", value=None)
+
+filters = {"user": user_filter, "contact": contact_filter, "date_from": date_from, "date_to": date_to}
+if st.session_state.get("interaction_filters") != filters:
+    st.session_state.interaction_filters = filters
+    st.session_state.interaction_cursors = [None]
+
+data = get_current_page()
+has_next = len(data) == PAGE_SIZE
+if not data.empty:
+    next_cursor = int(data["id"].iloc[-1])
+    data.index += (len(st.session_state.interaction_cursors) - 1) * PAGE_SIZE
+    data.columns = ["ID", "Пользователь", "Контакт", "Дата", "Тип контакта", "Описание"]
+    st.write(data)
+else:
+    st.write("Нет взаимодействий.")
+
+col_prev, col_page, col_next = st.columns([1, 2, 1])
+with col_prev:
+    if st.button("Назад", disabled=len(st.session_state.interaction_cursors) == 1, use_container_width=True):
+        st.session_state.interaction_cursors.pop()
+        st.rerun()
+with col_page:
+    st.write(f"Страница {len(st.session_state.interaction_cursors)}")
+with col_next:
+    if st.button("Вперед", disabled=not has_next, use_container_width=True):
+        st.session_state.interaction_cursors.append(next_cursor)
+        st.rerun()
 
 
 @st.dialog("Добавить взаимодействие")
 def add_interaction():
     username = st.session_state.user
-    contact = st.selectbox("Контакт", sql.Contacts.get_contacts_list())
+    contact = widgets.contact_picker("Контакт", key="add_interaction_contact")
     interaction_type = st.text_input("Взаимодействие")
     text = st.text_area("Описание")
     if st.button("Добавить", key="add"):
+        if not contact:
+            st.error("Выберите контакт")
+            return
         sql.Interaction.add_interaction(
             user_name=username,
             contact_name=contact,
@@ -25,19 +73,19 @@ def add_interaction():
 @st.dialog("Редактировать взаимодействие")
 def edit_interaction():
     username = st.session_state.user
-    int_data = sql.Interaction.get_as_dataframe()
+    int_data = get_current_page()
     int_data = int_data[int_data["user_name"] == username]
     int_list = int_data["id"].tolist()
     int_id = st.selectbox("ID", int_list)
     if int_id:
-        int_data = int_data[int_data["id"] == int_id].reset_index()
-        contact_name = int_data["contact_name"][0]
-        interaction_date = int_data["interaction_date"][0]
-        interaction_type = int_data["interaction_type"][0]
-        notes = int_data["notes"][0]
-
-        c_list = sql.Contacts.get_contacts_list()
-        new_contact_name = st.selectbox("Контакт", c_list, index=c_list.index(contact_name))
+        int_data = sql.first_row(int_data[int_data["id"] == int_id])
+        contact_name = int_data["contact_name"]
+        interaction_date = int_data["interaction_date"]
+        interaction_type = int_data["interaction_type"]
+        notes = int_data["notes"]
+
+        new_contact_name = widgets.contact_picker("Контакт", key=f"edit_interaction_contact_{int_id}",
+                                                  default=contact_name)
         new_date = st.date_input("Дата выполнения", value=interaction_date)
         new_interaction_type = st.text_input("Взаимодействие", interaction_type)
         new_notes = st.text_area("Описание", notes)
@@ -61,16 +109,16 @@ def edit_interaction():
 @st.dialog("Удалить взаимодействие")
 def delete_interaction():
     username = st.session_state.user
-    int_data = sql.Interaction.get_as_dataframe()
+    int_data = get_current_page()
     int_data = int_data[int_data["user_name"] == username]
     int_list = int_data["id"].tolist()
     int_id = st.selectbox("ID", int_list)
     if int_id:
-        int_data = int_data[int_data["id"] == int_id].reset_index()
-        contact_name = int_data["contact_name"][0]
-        interaction_date = int_data["interaction_date"][0]
-        interaction_type = int_data["interaction_type"][0]
-        notes = int_data["notes"][0]
+        int_data = sql.first_row(int_data[int_data["id"] == int_id])
+        contact_name = int_data["contact_name"]
+        interaction_date = int_data["interaction_date"]
+        interaction_type = int_data["interaction_type"]
+        notes = int_data["notes"]
 
         st.write(contact_name)
         st.write(interaction_date)
@@ -6,15 +6,17 @@ import sql
 
 def get_today_tasks():
     today = datetime.today().date()
-    tasks_df = sql.Task.get_tasks_as_dataframe()
-    return tasks_df[tasks_df['due_date'] == today]
+    return sql.Task.get_tasks_due_between(today, today, include_done=True)
 
 
 def get_upcoming_tasks():
     today = datetime.today().date()
-    upcoming_tasks_df = sql.Task.get_tasks_as_dataframe()
-    upcoming_tasks_df = upcoming_tasks_df[upcoming_tasks_df['due_date'] > today]
-    return upcoming_tasks_df
+    return sql.Task.get_tasks_due_between(today + timedelta(days=1), None, include_done=True)
+
+
+def get_upcoming_dates():
+    today = datetime.today().date()
+    return sql.ImportantDates.get_upcoming(today, days=14)
 
 
 def get_circle_stats():
@@ -29,36 +31,22 @@ def get_contacts_to_follow_up():
 
 
 def get_circles_to_follow_up():
-    circles_df = sql.Circles.get_circles_as_dataframe()
     today = pd.to_datetime('today').date()
-    circles_to_follow_up = []
-
-    for index, row in circles_df.iterrows():
-        circle_name = row['circle_name']
-        interaction_frequency = row['interaction_frequency']
-
-        contacts_df = sql.Contacts.get_contacts_as_dataframe()
-        contacts_in_circle = contacts_df[contacts_df['circle_name'] == circle_name]
+    return sql.Circles.get_overdue_circles(today)
 
-        max_last_interaction = contacts_in_circle['last_interaction'].max()
-
-        if pd.isna(max_last_interaction):
-            circles_to_follow_up.append({
-                "circle_name": circle_name,
-                "last_interaction": None
-            })
-        else:
-            if pd.to_datetime(max_last_interaction).date() < (today - timedelta(days=interaction_frequency)):
-                circles_to_follow_up.append({
-                    "circle_name": circle_name,
-                    "last_interaction": max_last_interaction
-                })
-
-    return pd.DataFrame(circles_to_follow_up)
 
+# Секции не зависят друг от друга, поэтому их запросы идут параллельно
+sections = sql.submit_concurrently({
+    "today_tasks": get_today_tasks,
+    "upcoming_tasks": get_upcoming_tasks,
+    "upcoming_dates": get_upcoming_dates,
+    "circle_stats": get_circle_stats,
+    "follow_up_contacts": get_contacts_to_follow_up,
+    "follow_up_circles": get_circles_to_follow_up,
+})
 
 st.header("Задачи на сегодня")
-today_tasks = get_today_tasks()
+today_tasks = sections["today_tasks"].result()
 if not today_tasks.empty:
     today_tasks.columns = ["ID", "Задача", "Описание", "Создатель", "Исполнитель", "Дата создания", "Дата выполнения",
                            "Связаный контакт", "Статус"]
@@ -68,7 +56,7 @@ else:
 
 # Задачи на ближайший месяц
 st.header("Задачи на ближайший месяц")
-upcoming_tasks = get_upcoming_tasks()
+upcoming_tasks = sections["upcoming_tasks"].result()
 if not upcoming_tasks.empty:
     upcoming_tasks.columns = ["ID", "Задача", "Описание", "Создатель", "Исполнитель", "Дата создания",
                               "Дата выполнения",
@@ -77,9 +65,18 @@ if not upcoming_tasks.empty:
 else:
     st.write("Нет задач на ближайший месяц.")
 
+st.header("Ближайшие даты")
+upcoming_dates = sections["upcoming_dates"].result()
+if not upcoming_dates.empty:
+    upcoming_dates = upcoming_dates[["contact_name", "description", "next_date", "days_until", "years"]]
+    upcoming_dates.columns = ["Контакт", "Событие", "Дата", "Через (дн.)", "Лет"]
+    st.write(upcoming_dates)
+else:
+    st.write("В ближайшие две недели дат нет.")
+
 # Статистика по взаимодействиям с кругами
 st.header("Статистика по взаимодействиям с кругами")
-circle_stats = get_circle_stats()
+circle_stats = sections["circle_stats"].result()
 if not circle_stats.empty:
     circle_stats.columns = ["Круг", "Взаимодействий", "Дата последнего взаимодействия", "Контакты"]
     st.write(circle_stats)
@@ -88,7 +85,7 @@ else:
 
 # Контакты для follow-up
 try:
-    follow_up_contacts = get_contacts_to_follow_up()
+    follow_up_contacts = sections["follow_up_contacts"].result()
     st.header("Контакты, с которыми давно не было взаимодействий")
     if not follow_up_contacts.empty:
         info = follow_up_contacts[['contact_name', 'last_interaction']].reset_index(drop=True)
@@ -101,7 +98,7 @@ except:
     pass
 
 try:
-    follow_up_circles = get_circles_to_follow_up()
+    follow_up_circles = sections["follow_up_circles"].result()
     st.header("Круги, с которыми давно не было взаимодействий")
     if not follow_up_circles.empty:
         follow_up_circles.columns = ["Круг", "Дата последнего взаимодействия"]
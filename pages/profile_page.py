@@ -0,0 +1,52 @@
+import streamlit as st
+from datetime import datetime
+import sql
+import widgets
+
+
+def show(df, columns, empty_text):
+    if not df.empty:
+        st.write(df.rename(columns=dict(zip(df.columns, columns))))
+    else:
+        st.write(empty_text)
+
+
+contact_name = widgets.contact_picker("Контакт", key="profile_contact")
+if contact_name:
+    profile = sql.Contacts.get_profile(sql.Contacts.get_contact_by_name(contact_name))
+
+    st.header(profile["contact_name"])
+    st.caption(f"Круг: {profile['circle_name']} · взаимодействие раз в {profile['interaction_frequency']} дн.")
+
+    today = datetime.today().date()
+    last_interaction = profile["last_interaction"]
+    if last_interaction is None:
+        st.warning("Взаимодействий еще не было")
+    elif (today - last_interaction).days > profile["interaction_frequency"]:
+        st.warning(f"Последнее взаимодействие {last_interaction}: {(today - last_interaction).days} дн. назад")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write(f"**email:** {profile['email'] or '—'}")
+        st.write(f"**Телефон:** {profile['phone'] or '—'}")
+        st.write(f"**День рождения:** {profile['birthday'] or '—'}")
+    with col2:
+        st.write(f"**Хобби:** {profile['hobbies'] or '—'}")
+        st.write(f"**Доп. инфо:** {profile['additional'] or '—'}")
+        st.write(f"**Последнее взаимодействие:** {last_interaction or '—'}")
+
+    st.header("Последние взаимодействия")
+    interactions = profile["interactions"]
+    if len(interactions) < profile["interaction_count"]:
+        st.caption(f"Показаны последние {len(interactions)} из {profile['interaction_count']}")
+    show(interactions, ["Дата", "Тип", "Пользователь", "Заметки"], "Взаимодействий нет.")
+
+    st.header("Открытые задачи")
+    show(profile["open_tasks"], ["ID", "Задача", "Описание", "Дата выполнения", "Создатель", "Исполнитель"],
+         "Открытых задач нет.")
+
+    st.header("Связи")
+    show(profile["connections"], ["Контакт", "Связь"], "Связей нет.")
+
+    st.header("Важные даты")
+    show(profile["important_dates"], ["Дата", "Описание"], "Важных дат нет.")
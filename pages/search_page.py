@@ -0,0 +1,13 @@
+import streamlit as st
+import sql
+
+query = st.text_input("Поиск по контактам, взаимодействиям и задачам")
+if query:
+    results = sql.search(query)
+    if not results.empty:
+        results["kind"] = results["kind"].map(sql.SEARCH_KINDS)
+        results = results[["kind", "title", "detail", "score"]]
+        results.columns = ["Где найдено", "Название", "Текст", "Релевантность"]
+        st.write(results)
+    else:
+        st.write("Ничего не найдено.")
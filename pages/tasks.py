@@ -1,5 +1,6 @@
 import streamlit as st
 import sql
+import widgets
 import datetime
 
 username = st.session_state.user
@@ -21,9 +22,9 @@ with tasks_in:
                                                "done": st.column_config.CheckboxColumn("Выполнена")}, key="in")
         if not data.equals(editor):
             changed_rows = editor[editor['done'] != original_done]
-            done = changed_rows[['id', 'done']]
-            for _, task in done.iterrows():
-                sql.Task.edit_task(task["id"], done=int(task["done"]))
+            if not changed_rows.empty:
+                sql.Task.set_done_bulk({int(task_id): bool(done) for task_id, done in
+                                        zip(changed_rows["id"], changed_rows["done"])})
                 st.rerun()
 with tasks_out:
     data = sql.Task.get_incomplete_tasks_by_creator(username)
@@ -40,17 +41,17 @@ with tasks_out:
                                                "done": st.column_config.CheckboxColumn("Выполнена")}, key="out")
         if not data.equals(editor):
             changed_rows = editor[editor['done'] != original_done]
-            done = changed_rows[['id', 'done']]
-            for _, task in done.iterrows():
-                sql.Task.edit_task(task["id"], done=int(task["done"]))
+            if not changed_rows.empty:
+                sql.Task.set_done_bulk({int(task_id): bool(done) for task_id, done in
+                                        zip(changed_rows["id"], changed_rows["done"])})
                 st.rerun()
 
 
 @st.dialog("Создание задачи")
 def add_task():
     creator_name = username
-    executor_name = st.selectbox("Исполнитель", sql.User.get_user_list(), index=None)
-    contact_name = st.selectbox("Связанный контакт", sql.Contacts.get_contacts_list(), index=None)
+    executor_name = widgets.user_picker("Исполнитель", key="add_task_executor")
+    contact_name = widgets.contact_picker("Связанный контакт", key="add_task_contact")
     task_name = st.text_input("Название задачи")
     description = st.text_area("Описание задачи")
     today = datetime.date.today()
@@ -77,21 +78,21 @@ def edit_task():
     ids = tasks["id"].tolist()
     id_selected = st.selectbox("ID задачи", ids, index=None)
     if id_selected:
-        task_data = tasks[tasks["id"] == id_selected].reset_index(drop=True)
+        task_data = sql.first_row(tasks[tasks["id"] == id_selected])
 
-        task_name = task_data["task_name"][0]
-        description = task_data["description"][0]
-        due_date = task_data["due_date"][0]
-        contact_name = task_data["contact_name"][0]
-        executor_name = task_data["executor_name"][0]
+        task_name = task_data["task_name"]
+        description = task_data["description"]
+        due_date = task_data["due_date"]
+        contact_name = task_data["contact_name"]
+        executor_name = task_data["executor_name"]
 
         new_name = st.text_input("Название задачи", task_name)
         new_description = st.text_area("Описание", description)
         new_date = st.date_input("Дата выполнения", value=due_date)
-        c_list = sql.Contacts.get_contacts_list()
-        new_contact_name = st.selectbox("Контакт", c_list, index=c_list.index(contact_name))
-        ex_list = sql.User.get_user_list()
-        new_executor_name = st.selectbox("Исполнитель", ex_list, index=ex_list.index(executor_name))
+        new_contact_name = widgets.contact_picker("Контакт", key=f"edit_task_contact_{id_selected}",
+                                                  default=contact_name)
+        new_executor_name = widgets.user_picker("Исполнитель", key=f"edit_task_executor_{id_selected}",
+                                                default=executor_name)
 
         if new_contact_name:
             idx = sql.Contacts.get_contact_by_name(new_contact_name)
@@ -123,12 +124,12 @@ def delete_task():
     ids = tasks["id"].tolist()
     id_selected = st.selectbox("ID задачи", ids, index=None)
     if id_selected:
-        task_data = tasks[tasks["id"] == id_selected].reset_index(drop=True)
+        task_data = sql.first_row(tasks[tasks["id"] == id_selected])
 
-        task_name = task_data["task_name"][0]
-        description = task_data["description"][0]
-        due_date = task_data["due_date"][0]
-        contact_name = task_data["contact_name"][0]
+        task_name = task_data["task_name"]
+        description = task_data["description"]
+        due_date = task_data["due_date"]
+        contact_name = task_data["contact_name"]
 
         st.write(task_name)
         st.write(description)
@@ -0,0 +1,53 @@
+import base64
+import hashlib
+import hmac
+import os
+
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = 600000
+SALT_BYTES = 16
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+
+
+# Формат хранения: pbkdf2_sha256$<итерации>$<соль>$<хеш>, соль и хеш в base64
+def hash_password(password, iterations=ITERATIONS):
+    salt = os.urandom(SALT_BYTES)
+    return f"{ALGORITHM}${iterations}${_b64encode(salt)}${_b64encode(_pbkdf2(password, salt, iterations))}"
+
+
+def is_hashed(stored):
+    return stored is not None and stored.startswith(f"{ALGORITHM}$")
+
+
+def needs_rehash(stored):
+    # Пароли, сохраненные открытым текстом или с устаревшим числом итераций, перехешируются при входе
+    if not is_hashed(stored):
+        return True
+    return int(stored.split("$")[1]) != ITERATIONS
+
+
+def verify_password(password, stored):
+    if stored is None:
+        # Для несуществующего логина хеш все равно считается: по времени ответа нельзя понять, есть ли такой пользователь
+        _pbkdf2(password, bytes(SALT_BYTES), ITERATIONS)
+        return False
+    if not is_hashed(stored):
+        # Старые строки с паролем открытым текстом
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    try:
+        _, iterations, salt, expected = stored.split("$")
+        actual = _pbkdf2(password, _b64decode(salt), int(iterations))
+        return hmac.compare_digest(actual, _b64decode(expected))
+    except ValueError:
+        return False
@@ -1,13 +1,538 @@
 import pandas as pd
-from sqlalchemy import Column, Integer, String, Date, Float, create_engine, ForeignKey, func, Boolean, case
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship, aliased
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import event, Column, Integer, SmallInteger, String, Date, DateTime, Float, create_engine, ForeignKey, func, Boolean, case, Index, \
+    update, select, union, union_all, insert, delete, exists, and_, or_, literal, literal_column, type_coerce, table
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.orm import declarative_base, sessionmaker, relationship, aliased, validates, joinedload, selectinload
+from sqlalchemy.exc import IntegrityError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.dialects.mysql import DATETIME, match
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from connections import sql_connection_string
+import calendar
+import datetime
+import functools
+import hashlib
+import hmac
+import math
+import os
+import sys
+import sysconfig
+import threading
+import time
+import passwords
+from metrics import metrics
+from connections import POOL_DEFAULTS, get_connection_string, get_pool_settings
 
-engine = create_engine(sql_connection_string)
 Base = declarative_base()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+_engine = None
+_schema_checked = False
+_engine_lock = threading.Lock()
+# Адрес базы и настройки пула, заданные через configure() вместо secrets (бенчмарки, скрипты)
+_configured = None
+
+
+class SchemaOutdatedError(RuntimeError):
+    pass
+
+
+class LoginThrottledError(RuntimeError):
+    def __init__(self, retry_after):
+        super().__init__(f"Слишком много неудачных попыток входа. Повторите через {math.ceil(retry_after)} с")
+        self.retry_after = retry_after
+
+
+# Пул, который замеряет, сколько сессии ждут свободного соединения
+class TimedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self._metrics_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._metrics_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._metrics_lock:
+                self.wait_count += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_count, pool.wait_total, pool.wait_max, pool.timeouts = \
+            self.wait_count, self.wait_total, self.wait_max, self.timeouts
+        return pool
+
+
+def _connection_string():
+    return _configured[0] if _configured else get_connection_string()
+
+
+def _pool_settings():
+    return dict(_configured[1]) if _configured else get_pool_settings()
+
+
+def configure(url, **pool_settings):
+    global _engine, _schema_checked, _configured
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _schema_checked = False
+        _configured = (url, {**POOL_DEFAULTS, **pool_settings})
+    query_cache.clear()
+
+
+# Движок создается при первом запросе, а не при импорте: страница логина рендерится без похода в базу,
+# а модуль можно импортировать без secrets. Версия схемы проверяется один раз на процесс
+def get_engine(check_schema=True):
+    global _engine, _schema_checked
+    if _engine is None or (check_schema and not _schema_checked):
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(_connection_string(), poolclass=TimedQueuePool, **_pool_settings())
+                _instrument(_engine)
+                if _engine.dialect.name == "sqlite":
+                    _configure_sqlite(_engine)
+            if check_schema and not _schema_checked:
+                import migrations
+
+                if not migrations.is_up_to_date(_engine):
+                    raise SchemaOutdatedError("Схема базы данных устарела. Выполните `python migrations.py upgrade`")
+                _schema_checked = True
+    return _engine
+
+
+# Служебные обертки, которые при поиске вызывающего метода пропускаются
+_PASSTHROUGH_FRAMES = {"wrapper", "session_scope", "read_frame", "_count_orm_rows",
+                       "frame", "_load", "_patch", "fetch_changes_since",
+                       "__enter__", "__exit__", "__next__"}
+_LIBRARY_PREFIXES = tuple({sysconfig.get_paths()[name] for name in ("stdlib", "purelib", "platlib")})
+
+
+def _caller():
+    # Ближайший кадр из кода приложения: для методов моделей - Класс.метод, иначе модуль.функция
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        # Имена вида <string> - функции, которые SQLAlchemy генерирует на лету
+        if not code.co_filename.startswith(_LIBRARY_PREFIXES + ("<",)) and code.co_name not in _PASSTHROUGH_FRAMES:
+            owner = frame.f_locals.get("cls")
+            if isinstance(owner, type):
+                return f"{owner.__name__}.{code.co_name}"
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            return f"{module}.{code.co_name}"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+# Последний выполненный в потоке SELECT: строки ему досчитывает код, который читает результат
+_last_select = threading.local()
+
+
+def _instrument(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        is_select = not executemany and statement.lstrip()[:6].upper() == "SELECT"
+        # rowcount у SELECT ничего не значит (в SQLite и при потоковом чтении он -1): строки SELECT считаются
+        # при чтении - в read_frame и в _count_orm_rows
+        rows = None if is_select or cursor.rowcount < 0 else cursor.rowcount
+        # Параметры сохраняются только для одиночных SELECT - их можно повторить через EXPLAIN
+        entry = metrics.observe_statement(statement, parameters if is_select else None, _caller(), elapsed, rows)
+        _last_select.entry = entry if is_select else None
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # Упавший запрос не доходит до after_cursor_execute - иначе его отметка осталась бы на соединении из пула
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+def _take_last_select():
+    entry = getattr(_last_select, "entry", None)
+    _last_select.entry = None
+    return entry
+
+
+# ORM-запросы читаются целиком (кроме yield_per), поэтому результат можно зафиксировать и посчитать его строки
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _count_orm_rows(orm_execute_state):
+    if not orm_execute_state.is_select or orm_execute_state.execution_options.get("yield_per"):
+        return None
+    frozen = orm_execute_state.invoke_statement().freeze()
+    entry = _take_last_select()
+    if entry is not None:
+        metrics.add_rows(entry, len(frozen.data))
+    return frozen()
+
+
+# Встроенная база для установки на одном компьютере: WAL позволяет читать параллельно с записью,
+# а страницы Streamlit в основном читают короткими запросами из нескольких потоков
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "busy_timeout": 5000,
+    "cache_size": -32000,
+    "temp_store": "MEMORY",
+    "mmap_size": 268435456,
+}
+
+
+def _configure_sqlite(engine):
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+# Нормализация поискового запроса; строки в индексе FTS5 нормализуют токенизатор и триггеры миграции 10
+def _casefold(value):
+    return value.casefold().replace("ё", "е") if value else value
+
+
+# Выражения, которые MySQL и SQLite записывают по-разному. По умолчанию компилируются в синтаксис MySQL
+class days_between(FunctionElement):
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(days_between)
+def _days_between(element, compiler, **kw):
+    later, earlier = element.clauses
+    return f"DATEDIFF({compiler.process(later, **kw)}, {compiler.process(earlier, **kw)})"
+
+
+@compiles(days_between, "sqlite")
+def _days_between_sqlite(element, compiler, **kw):
+    later, earlier = element.clauses
+    return f"CAST(julianday({compiler.process(later, **kw)}) - julianday({compiler.process(earlier, **kw)}) AS INTEGER)"
+
+
+class concat_ws(FunctionElement):
+    type = String()
+    inherit_cache = True
+
+
+@compiles(concat_ws)
+def _concat_ws(element, compiler, **kw):
+    return f"CONCAT_WS({', '.join(compiler.process(clause, **kw) for clause in element.clauses)})"
+
+
+@compiles(concat_ws, "sqlite")
+def _concat_ws_sqlite(element, compiler, **kw):
+    # Как и в MySQL, NULL-аргументы пропускаются вместе с разделителем
+    separator, *values = element.clauses
+    result = values[0]
+    for value in values[1:]:
+        result = func.coalesce(result.concat(separator).concat(value), result, value)
+    return compiler.process(result, **kw)
+
+
+def explain(statement, parameters):
+    prefix = "EXPLAIN QUERY PLAN " if get_engine().dialect.name == "sqlite" else "EXPLAIN "
+    with get_engine().connect() as conn:
+        result = conn.exec_driver_sql(prefix + statement, parameters or ())
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+# Общий для процесса LRU-кэш читающих методов. Запись помнит версии таблиц, из которых построена,
+# а пишущие методы повышают версии своих таблиц и тем самым вытесняют только зависимые записи
+class QueryCache:
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Растет при полной очистке: по ней сбрасываются и датафреймы SyncedFrame
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._versions = defaultdict(int)
+        self._lock = threading.Lock()
+        # Версии таблиц, опубликованные в базе другими процессами, и время последней сверки с ними
+        self._shared = None
+        self._shared_checked = 0.0
+        self._shared_lock = threading.Lock()
+
+    def poll_shared(self):
+        if time.monotonic() - self._shared_checked < CACHE_POLL_INTERVAL:
+            return
+        # Сверяется один поток, остальные не ждут его и читают кэш как есть
+        if not self._shared_lock.acquire(blocking=False):
+            return
+        try:
+            self._shared_checked = time.monotonic()
+            shared = read_shared_versions()
+            if self._shared is not None:
+                changed = [table for table, version in shared.items() if self._shared.get(table) != version]
+                if changed:
+                    self.invalidate(*changed)
+            self._shared = shared
+        finally:
+            self._shared_lock.release()
+
+    def shared_version(self, table):
+        self.poll_shared()
+        return (self._shared or {}).get(table, 0)
+
+    def versions(self, tables):
+        self.poll_shared()
+        with self._lock:
+            return tuple(self._versions[table] for table in tables)
+
+    def get(self, key):
+        self.poll_shared()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                tables, versions, value = entry
+                if versions == tuple(self._versions[table] for table in tables):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, tables, versions, value):
+        with self._lock:
+            # Таблицу успели изменить, пока выполнялся запрос - результат уже устарел
+            if versions != tuple(self._versions[table] for table in tables):
+                return
+            self._entries[key] = (tables, versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] += 1
+            stale = [key for key, (entry_tables, _, _) in self._entries.items()
+                     if any(table in entry_tables for table in tables)]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            # После очистки (в том числе смены базы в configure) опубликованные версии читаются заново
+            self._shared = None
+            self._shared_checked = 0.0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+query_cache = QueryCache()
+
+
+def _copy_result(value):
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        # Профиль - словарь с датафреймами, их тоже нельзя отдавать общими с кэшем
+        return {key: _copy_result(item) for key, item in value.items()}
+    return value
+
+
+def cached(*tables):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return func(*args, **kwargs)
+
+            found, value = query_cache.get(key)
+            if not found:
+                versions = query_cache.versions(tables)
+                value = func(*args, **kwargs)
+                query_cache.put(key, tables, versions, value)
+            # Страницы меняют полученные датафреймы на месте, поэтому отдаем копию
+            return _copy_result(value)
+
+        return wrapper
+
+    return decorator
+
+
+def invalidates(*tables):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                query_cache.invalidate(*tables)
+
+        return wrapper
+
+    return decorator
+
+
+# Ключ дня года ММДД: одинаков для любого года, поэтому повторяющиеся даты ищутся по индексу диапазоном ключей
+def day_key(date):
+    return date.month * 100 + date.day if date else None
+
+
+def _day_key_default(column):
+    return lambda context: day_key(context.get_current_parameters().get(column))
+
+
+def _next_occurrence(date, today):
+    year = today.year if (date.month, date.day) >= (today.month, today.day) else today.year + 1
+    # 29 февраля в невисокосный год отмечается 28-го
+    if (date.month, date.day) == (2, 29) and not calendar.isleap(year):
+        return datetime.date(year, 2, 28)
+    return datetime.date(year, date.month, date.day)
+
+
+def _day_key_window(column, today, days):
+    if days >= 365:
+        return column.isnot(None)
+    end = today + datetime.timedelta(days=days)
+    start_key, end_key = day_key(today), day_key(end)
+    if end.year == today.year:
+        window = column.between(start_key, end_key)
+    else:
+        window = (column >= start_key) | (column <= end_key)
+    if end.month == 2 and end.day == 28 and not calendar.isleap(end.year):
+        window = window | (column == 229)
+    return window
+
+
+# Время изменения строки ставит приложение, в UTC и с микросекундами: несколько правок за секунду различимы,
+# а у MySQL без fsp дробная часть отбрасывалась бы
+UPDATED_AT = DateTime().with_variant(DATETIME(fsp=6), "mysql")
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+_change_listeners = defaultdict(list)
+
+
+# Подписка на построчные изменения таблицы - для структур в памяти, которые обновляются инкрементально
+def on_change(table, callback):
+    _change_listeners[table].append(callback)
+
+
+def _notify(table, *change):
+    for callback in _change_listeners[table]:
+        callback(*change)
+
+
+# Размер пачки строк с курсора: Python-объекты живут только в пределах пачки, поэтому пик памяти
+# растет с ней, а на скорость пачки больше тысячи строк почти не влияют (benchmarks/frame_memory.py)
+FRAME_CHUNK_SIZE = 1000
+# Колонки с небольшим числом различных значений: в датафрейме они хранятся как категории
+CATEGORICAL_COLUMNS = {"circle_name", "user_name", "creator_name", "executor_name", "interaction_type", "kind"}
+
+
+def arrow_type(sql_type):
+    import pyarrow as pa
+
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(sql_type, Date):
+        return pa.date32()
+    if isinstance(sql_type, String):
+        return pa.string()
+    # Тип выражения неизвестен - Arrow определит его по данным
+    return None
+
+
+def _chunked_array(chunks, chunk_type):
+    import pyarrow as pa
+
+    if chunk_type is None:
+        inferred = [chunk.type for chunk in chunks if chunk.type != pa.null()]
+        chunk_type = inferred[0] if inferred else pa.null()
+        chunks = [chunk.cast(chunk_type) for chunk in chunks]
+    return pa.chunked_array(chunks, type=chunk_type)
+
+
+# Общий путь от запроса к датафрейму: строки читаются с курсора пачками и сразу раскладываются по колонкам Arrow,
+# так что Python-объекты строк живут только в пределах одной пачки. Строки хранятся в pyarrow-строках,
+# колонки из CATEGORICAL_COLUMNS - категориями, индекс начинается с 1
+def read_frame(statement, columns=None, chunk_size=FRAME_CHUNK_SIZE):
+    import pyarrow as pa
+
+    selected = list(statement.selected_columns)
+    names = columns or [column.name for column in selected]
+    types = [arrow_type(column.type) for column in selected]
+    chunks = [[] for _ in selected]
+    with get_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(statement)
+        entry = _take_last_select()
+        for partition in result.partitions():
+            for i, values in enumerate(zip(*partition)):
+                chunks[i].append(pa.array(values, type=types[i]))
+            if entry is not None:
+                metrics.add_rows(entry, len(partition))
+
+    arrays = []
+    for name, column_chunks, column_type in zip(names, chunks, types):
+        array = _chunked_array(column_chunks, column_type)
+        if name in CATEGORICAL_COLUMNS and pa.types.is_string(array.type):
+            array = array.dictionary_encode()
+        arrays.append(array)
+    table = pa.Table.from_arrays(arrays, names=names).unify_dictionaries()
+    df = table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+    df.index = pd.RangeIndex(1, len(df) + 1)
+    return df
+
+
+# Пропуски в pyarrow-колонках приходят как pd.NA, а виджеты Streamlit и сравнения ждут None
+def first_row(df):
+    if df.empty:
+        return None
+    return {column: None if pd.isna(value) else value for column, value in df.iloc[0].items()}
 
 
 def get_list(cls, field_name):
@@ -18,24 +543,145 @@ def get_list(cls, field_name):
     return result_list
 
 
+# Кэш успешных входов: пара логин-пароль хранится только как HMAC на случайном ключе процесса,
+# поэтому повторный вход в течение ttl не пересчитывает медленный хеш
+class LoginCache:
+
+    def __init__(self, ttl=300, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _digest(self, user_name, password):
+        return hmac.new(self._key, f"{user_name}\0{password}".encode("utf-8"), hashlib.sha256).digest()
+
+    def get(self, user_name, password):
+        digest = self._digest(user_name, password)
+        versions = query_cache.versions(("users",))
+        with self._lock:
+            entry = self._entries.get(user_name)
+            if entry is None:
+                return None
+            user_id, entry_digest, entry_versions, expires = entry
+            if expires < time.monotonic() or entry_versions != versions:
+                del self._entries[user_name]
+                return None
+            return user_id if hmac.compare_digest(digest, entry_digest) else None
+
+    def put(self, user_name, password, user_id):
+        entry = (user_id, self._digest(user_name, password), query_cache.versions(("users",)),
+                 time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[user_name] = entry
+            self._entries.move_to_end(user_name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_name):
+        with self._lock:
+            self._entries.pop(user_name, None)
+
+
+# Ограничение перебора: после max_failures неудач подряд логин блокируется, и каждая следующая неудача
+# удваивает блокировку. Счетчик сбрасывается успешным входом или через reset_after секунд без попыток
+class LoginThrottle:
+
+    def __init__(self, max_failures=5, lockout=30, max_lockout=900, reset_after=3600):
+        self.max_failures = max_failures
+        self.lockout = lockout
+        self.max_lockout = max_lockout
+        self.reset_after = reset_after
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def check(self, user_name):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._failures.get(user_name)
+            if entry is None:
+                return
+            failures, locked_until, last_failure = entry
+            if now - last_failure > self.reset_after:
+                del self._failures[user_name]
+            elif locked_until > now:
+                raise LoginThrottledError(locked_until - now)
+
+    def failed(self, user_name):
+        now = time.monotonic()
+        with self._lock:
+            failures = self._failures.get(user_name, (0, 0, now))[0] + 1
+            locked_until = 0
+            if failures >= self.max_failures:
+                locked_until = now + min(self.lockout * 2 ** (failures - self.max_failures), self.max_lockout)
+            self._failures[user_name] = (failures, locked_until, now)
+            # Логины неизвестных пользователей тоже попадают сюда, старые записи вычищаются
+            if len(self._failures) > 10000:
+                self._failures = {name: entry for name, entry in self._failures.items()
+                                  if now - entry[2] <= self.reset_after}
+
+    def succeeded(self, user_name):
+        with self._lock:
+            self._failures.pop(user_name, None)
+
+
+login_cache = LoginCache()
+login_throttle = LoginThrottle()
+
+
 class User(Base):
     __tablename__ = 'users'
 
     user_id = Column(Integer, primary_key=True)
     user_name = Column(String(100), nullable=False)
-    password = Column(String(100), nullable=False)
+    password = Column(String(255), nullable=False)
+
+    __table_args__ = (
+        Index("ix_users_user_name", "user_name"),
+    )
 
     @classmethod
+    @cached("users")
     def get_user_list(cls):
         return get_list(cls, "user_name")
 
+    # Возвращает user_id или None. Один запрос по индексу имени; пароль открытым текстом
+    # после успешной проверки заменяется хешем
+    @classmethod
+    def authenticate(cls, user_name, password):
+        user_id = login_cache.get(user_name, password)
+        if user_id is not None:
+            return user_id
+        login_throttle.check(user_name)
+        with session_scope() as session:
+            row = session.execute(select(cls.user_id, cls.password).where(cls.user_name == user_name).limit(1)).first()
+        # Медленный хеш считается уже после возврата соединения в пул
+        verified = passwords.verify_password(password, row.password if row else None)
+        if verified and passwords.needs_rehash(row.password):
+            with session_scope() as session:
+                session.execute(update(cls).where(cls.user_id == row.user_id)
+                                .values(password=passwords.hash_password(password)))
+        if not verified:
+            login_throttle.failed(user_name)
+            return None
+        login_throttle.succeeded(user_name)
+        login_cache.put(user_name, password, row.user_id)
+        return row.user_id
+
     @classmethod
-    def check_user_password(cls, username):
+    @invalidates("users")
+    def hash_plaintext_passwords(cls):
         with session_scope() as session:
-            result = session.query(cls.password).filter(cls.user_name == username).first()
-            return result[0] if result else None
+            rows = session.execute(select(cls.user_id, cls.password)
+                                   .where(cls.password.notlike(f"{passwords.ALGORITHM}$%"))).all()
+            for user_id, password in rows:
+                session.execute(update(cls).where(cls.user_id == user_id)
+                                .values(password=passwords.hash_password(password)))
+            return len(rows)
 
     @classmethod
+    @cached("users")
     def get_user_id_by_name(cls, user_name):
         with session_scope() as session:
             user = session.query(cls).filter_by(user_name=user_name).first()
@@ -53,39 +699,50 @@ class Circles(Base):
 
     contacts = relationship("Contacts", back_populates="circle")
 
+    __table_args__ = (
+        Index("ix_circles_circle_name", "circle_name"),
+    )
+
     @classmethod
+    @cached("circles")
     def get_circles_list(cls):
         return get_list(cls, "circle_name")
 
     @classmethod
+    @cached("circles")
     def get_circles_as_dataframe_simple(cls):
-        with session_scope() as session:
-            result = session.query(
-                cls.circle_name,
-                cls.interaction_frequency
-            ).all()
-        df = pd.DataFrame(result)
-        df.index += 1
-        return df
+        return read_frame(select(cls.circle_name, cls.interaction_frequency))
 
     @classmethod
+    @cached("circles", "contacts")
     def get_circles_as_dataframe(cls):
-        with session_scope() as session:
-            result = session.query(
+        return read_frame(
+            select(
                 cls.circle_name,
                 cls.interaction_frequency,
                 func.count(Contacts.contact_id).label("contact_count")
-            ).outerjoin(Contacts, Contacts.circle_id == cls.circle_id).group_by(cls.circle_name,
-                                                                                cls.interaction_frequency)
-
-            result_data = result.all()
-
-            df = pd.DataFrame(result_data, columns=["circle_name", "interaction_frequency", "contact_count"])
-            df.index += 1
+            ).outerjoin(Contacts, Contacts.circle_id == cls.circle_id)
+            .group_by(cls.circle_name, cls.interaction_frequency)
+        )
 
-        return df
+    @classmethod
+    @cached("circles", "contacts")
+    def get_overdue_circles(cls, today):
+        last_interaction = func.max(Contacts.last_interaction)
+        return read_frame(
+            select(
+                cls.circle_name,
+                last_interaction.label("last_interaction")
+            ).outerjoin(Contacts, Contacts.circle_id == cls.circle_id)
+            .group_by(cls.circle_id, cls.circle_name, cls.interaction_frequency)
+            .having(
+                (last_interaction.is_(None)) | (days_between(today, last_interaction) > cls.interaction_frequency)
+            )
+            .order_by(cls.circle_name)
+        )
 
     @classmethod
+    @invalidates("circles")
     def add_circle(cls, **parameters):
         with session_scope() as session:
             add = cls(**parameters)
@@ -93,6 +750,7 @@ class Circles(Base):
             session.commit()
 
     @classmethod
+    @invalidates("circles")
     def edit_circle(cls, old_name, **parameters):
         with session_scope() as session:
             record = session.query(cls).filter_by(circle_name=old_name).first()
@@ -101,46 +759,41 @@ class Circles(Base):
                     setattr(record, field, value)
 
     @classmethod
+    @invalidates("circles", "circle_stats")
     def delete_circle(cls, circle_name):
         with session_scope() as session:
             contact = session.query(cls).filter_by(circle_name=circle_name).first()
+            session.query(CircleStats).filter_by(circle_id=contact.circle_id).delete()
             session.delete(contact)
 
     @classmethod
+    @cached("circles", "circle_stats")
     def get_circle_stats(cls):
-        with session_scope() as session:
-            subquery_max_date = session.query(
-                Contacts.circle_id,
-                func.max(Contacts.last_interaction).label("last_interaction_date")
-            ).group_by(Contacts.circle_id).subquery()
-
-            result = session.query(
-                Circles.circle_name,
-                func.count(Contacts.contact_id).label("interaction_count"),
-                subquery_max_date.c.last_interaction_date,
-                func.group_concat(
-                    case(
-                        (Contacts.last_interaction == subquery_max_date.c.last_interaction_date, Contacts.contact_name),
-                        else_=""
-                    )
-                ).label("last_interaction_contacts")
-            ).join(
-                Contacts, Contacts.circle_id == Circles.circle_id
-            ).join(
-                subquery_max_date, subquery_max_date.c.circle_id == Circles.circle_id
-            ).group_by(
-                Circles.circle_name, subquery_max_date.c.last_interaction_date
-            ).all()
-
-        df = pd.DataFrame(result, columns=["circle_name", "interaction_count", "last_interaction_date",
-                                           "last_interaction_contacts"])
-
-        df['last_interaction_contacts'] = df['last_interaction_contacts'].apply(
-            lambda x: ', '.join([contact.strip() for contact in x.split(',') if contact.strip() != '']) if x else ''
+        return read_frame(
+            select(
+                cls.circle_name,
+                CircleStats.contact_count.label("interaction_count"),
+                CircleStats.last_interaction_date,
+                CircleStats.last_interaction_contacts
+            ).join(CircleStats, CircleStats.circle_id == cls.circle_id)
+            .where(CircleStats.contact_count > 0)
+            .order_by(cls.circle_name)
         )
 
-        df.index += 1
-        return df
+
+# Сводка по кругам, которую поддерживают пишущие методы контактов и взаимодействий
+class CircleStats(Base):
+    __tablename__ = "circle_stats"
+    circle_id = Column(Integer, primary_key=True)
+    contact_count = Column(Integer, nullable=False, default=0)
+    last_interaction_date = Column(Date)
+    last_interaction_contacts = Column(String(1000))
+
+    @classmethod
+    @invalidates("circle_stats")
+    def rebuild(cls, circle_ids=None):
+        with session_scope() as session:
+            refresh_circle_stats(session, circle_ids)
 
 
 class Contacts(Base):
@@ -152,17 +805,38 @@ class Contacts(Base):
     hobbies = Column(String(200))
     additional = Column(String(500))
     birthday = Column(Date)
+    birthday_key = Column(SmallInteger, default=_day_key_default("birthday"))
     last_interaction = Column(Date)
     circle_id = Column(Integer, ForeignKey("circles.circle_id"), nullable=False)
+    updated_at = Column(UPDATED_AT, default=utcnow, onupdate=utcnow)
 
     circle = relationship("Circles", back_populates="contacts")
     important_dates = relationship("ImportantDates", back_populates="contact", cascade="all, delete-orphan")
+    # Коллекции только для чтения профиля: записи меняются через методы своих моделей
+    tasks = relationship("Task", viewonly=True, order_by=lambda: [Task.due_date, Task.task_id])
+    connections_from = relationship("Connections", foreign_keys="Connections.cont1_id", viewonly=True)
+    connections_to = relationship("Connections", foreign_keys="Connections.cont2_id", viewonly=True)
+
+    __table_args__ = (
+        Index("ix_contacts_contact_name", "contact_name"),
+        Index("ix_contacts_circle_id_last_interaction", "circle_id", "last_interaction"),
+        Index("ft_contacts_search", "contact_name", "hobbies", "additional", mysql_prefix="FULLTEXT"),
+        Index("ix_contacts_birthday_key", "birthday_key"),
+        Index("ix_contacts_updated_at", "updated_at"),
+    )
+
+    @validates("birthday")
+    def _set_birthday_key(self, key, value):
+        self.birthday_key = day_key(value)
+        return value
 
     @classmethod
+    @cached("contacts")
     def get_contacts_list(cls):
         return get_list(cls, "contact_name")
 
     @classmethod
+    @invalidates("contacts", "contact_names", "circle_stats")
     def add_contact(cls, circle_name, **parameters):
         with session_scope() as session:
             circle = session.query(Circles).filter(Circles.circle_name == circle_name).first()
@@ -170,44 +844,134 @@ class Contacts(Base):
                 add = cls(circle_id=circle.circle_id, **parameters)
                 session.add(add)
             except:
-                pass
+                return
+            # Ошибка вставки или пересчета сводки откатывает транзакцию целиком и доходит до вызывающего
+            session.flush()
+            refresh_circle_stats(session, [circle.circle_id])
 
     @classmethod
+    @invalidates("contacts", "contact_names", "circle_stats")
     def edit_contact(cls, old_name, circle_name, **parameters):
         with session_scope() as session:
             record = session.query(cls).filter_by(contact_name=old_name).first()
             circle = session.query(Circles).filter(Circles.circle_name == circle_name).first()
+            old_circle_id = record.circle_id
             record.circle_id = circle.circle_id
             for field, value in parameters.items():
                 if hasattr(record, field):
                     setattr(record, field, value)
+            session.flush()
+            refresh_circle_stats(session, [old_circle_id, circle.circle_id])
 
     @classmethod
-    def get_contacts_as_dataframe(cls):
-        with session_scope() as session:
-            contacts = (
-                session.query(cls.contact_name, cls.email, cls.phone, cls.birthday,
-                              cls.hobbies, cls.additional, cls.last_interaction, Circles.circle_name)
-                .join(Circles, cls.circle_id == Circles.circle_id)
-                .all()
-            )
+    def _select_contacts(cls):
+        return select(cls.contact_id, cls.contact_name, cls.email, cls.phone, cls.birthday,
+                      cls.hobbies, cls.additional, cls.last_interaction, Circles.circle_name) \
+            .join(Circles, cls.circle_id == Circles.circle_id)
 
-            df = pd.DataFrame(contacts)
-            df.index += 1
-        return df
+    @classmethod
+    def get_contacts_as_dataframe(cls):
+        return synced_frames["contacts"].frame()
 
     @classmethod
+    @invalidates("contacts", "contact_names", "important_dates", "circle_stats")
     def delete_contact(cls, contact_name):
         with session_scope() as session:
             contact = session.query(cls).filter_by(contact_name=contact_name).first()
+            circle_id = contact.circle_id
             session.delete(contact)
+            session.flush()
+            refresh_circle_stats(session, [circle_id])
 
     @classmethod
+    @cached("contacts")
     def get_contact_by_name(cls, contact_name):
         with session_scope() as session:
             contact = session.query(cls).filter(cls.contact_name == contact_name).first()
             return contact.contact_id
 
+    @classmethod
+    @cached("contacts")
+    def get_contact_names(cls):
+        with session_scope() as session:
+            return dict(session.query(cls.contact_id, cls.contact_name).all())
+
+    PROFILE_INTERACTIONS = 20
+
+    # Все о контакте за фиксированное число запросов: контакт с кругом одним join'ом, каждая коллекция -
+    # отдельным запросом по IN (selectinload), имена пользователей и связанных контактов - join'ом внутри него
+    @classmethod
+    @cached("contacts", "circles", "interactions", "tasks", "connections", "important_dates", "users")
+    def get_profile(cls, contact_id):
+        open_task = (Task.done == False) | Task.done.is_(None)
+        interaction_count = select(func.count()).where(Interaction.contact_id == cls.contact_id).scalar_subquery()
+        with session_scope() as session:
+            row = session.execute(
+                select(cls, interaction_count).where(cls.contact_id == contact_id).options(
+                    joinedload(cls.circle),
+                    selectinload(cls.tasks.and_(open_task)).options(joinedload(Task.creator),
+                                                                    joinedload(Task.executor)),
+                    selectinload(cls.connections_from).joinedload(Connections.contact2),
+                    selectinload(cls.connections_to).joinedload(Connections.contact1),
+                    selectinload(cls.important_dates),
+                )
+            ).one_or_none()
+            if row is None:
+                return None
+            contact, count = row
+
+            # Историю взаимодействий не тянем целиком: последние записи берутся по индексу (contact_id, дата)
+            interactions = pd.DataFrame(
+                session.execute(
+                    select(Interaction.interaction_date, Interaction.interaction_type, User.user_name,
+                           Interaction.notes)
+                    .join(User, Interaction.user_id == User.user_id)
+                    .where(Interaction.contact_id == contact_id)
+                    .order_by(Interaction.interaction_date.desc(), Interaction.id.desc())
+                    .limit(cls.PROFILE_INTERACTIONS)
+                ).all(),
+                columns=["interaction_date", "interaction_type", "user_name", "notes"])
+            tasks = pd.DataFrame(
+                [(t.task_id, t.task_name, t.description, t.due_date, t.creator.user_name, t.executor.user_name)
+                 for t in contact.tasks],
+                columns=["id", "task_name", "description", "due_date", "creator_name", "executor_name"])
+            connections = pd.DataFrame(
+                sorted({(c.contact2.contact_name, c.description) for c in contact.connections_from
+                        if c.cont2_id != contact_id} |
+                       {(c.contact1.contact_name, c.description) for c in contact.connections_to
+                        if c.cont1_id != contact_id}),
+                columns=["contact_name", "description"])
+            dates = pd.DataFrame(
+                sorted(((d.date, d.description) for d in contact.important_dates),
+                       key=lambda row: (row[0].month, row[0].day)),
+                columns=["date", "description"])
+            for df in (interactions, tasks, connections, dates):
+                df.index += 1
+
+            return {
+                "contact_id": contact.contact_id,
+                "contact_name": contact.contact_name,
+                "circle_name": contact.circle.circle_name,
+                "interaction_frequency": contact.circle.interaction_frequency,
+                "email": contact.email,
+                "phone": contact.phone,
+                "birthday": contact.birthday,
+                "hobbies": contact.hobbies,
+                "additional": contact.additional,
+                "last_interaction": contact.last_interaction,
+                "interaction_count": count,
+                "interactions": interactions,
+                "open_tasks": tasks,
+                "connections": connections,
+                "important_dates": dates,
+            }
+
+    @classmethod
+    @invalidates("contacts", "circle_stats")
+    def refresh_last_interaction(cls, contact_ids=None):
+        with session_scope() as session:
+            return refresh_last_interaction(session, contact_ids)
+
 
 class Task(Base):
     __tablename__ = "tasks"
@@ -220,12 +984,23 @@ class Task(Base):
     created_at = Column(Date, default=func.current_date())
     due_date = Column(Date)
     done = Column(Boolean)
+    updated_at = Column(UPDATED_AT, default=utcnow, onupdate=utcnow)
 
     creator = relationship("User", foreign_keys=[creator_id])
     executor = relationship("User", foreign_keys=[executor_id])
     contact = relationship("Contacts")
 
+    __table_args__ = (
+        Index("ix_tasks_done_due_date", "done", "due_date"),
+        Index("ix_tasks_executor_id_done", "executor_id", "done"),
+        Index("ix_tasks_creator_id_done", "creator_id", "done"),
+        Index("ft_tasks_search", "task_name", "description", mysql_prefix="FULLTEXT"),
+        Index("ix_tasks_contact_id", "contact_id"),
+        Index("ix_tasks_updated_at", "updated_at"),
+    )
+
     @classmethod
+    @invalidates("tasks")
     def add_task(cls, creator_name, executor_name, contact_name, task_name, description, due_date, done=False):
         with session_scope() as session:
             creator = session.query(User).filter(User.user_name == creator_name).first()
@@ -246,6 +1021,7 @@ class Task(Base):
             session.add(task)
 
     @classmethod
+    @invalidates("tasks")
     def edit_task(cls, task_id, **parameters):
         with session_scope() as session:
             task = session.query(cls).filter_by(task_id=task_id).first()
@@ -258,43 +1034,65 @@ class Task(Base):
             session.commit()
 
     @classmethod
-    def get_tasks_as_dataframe(cls):
+    @invalidates("tasks")
+    def set_done_bulk(cls, done_by_id):
+        if not done_by_id:
+            return 0
         with session_scope() as session:
-            creator = aliased(User, name="creator")
-            executor = aliased(User, name="executor")
+            result = session.execute(
+                update(cls)
+                .where(cls.task_id.in_(list(done_by_id)))
+                .values(done=case({task_id: bool(done) for task_id, done in done_by_id.items()}, value=cls.task_id))
+                .execution_options(synchronize_session=False)
+            )
+            return result.rowcount
 
-            tasks = session.query(
-                cls.task_id,
-                cls.task_name,
-                cls.description,
-                creator.user_name.label("creator_name"),
-                executor.user_name.label("executor_name"),
-                cls.created_at,
-                cls.due_date,
-                Contacts.contact_name.label("contact_name"),
-                cls.done
-            ).join(creator, cls.creator_id == creator.user_id) \
-                .join(executor, cls.executor_id == executor.user_id) \
-                .join(Contacts, cls.contact_id == Contacts.contact_id) \
-                .distinct() \
-                .all()
-
-            df = pd.DataFrame(tasks,
-                              columns=["id", "task_name", "description", "creator_name", "executor_name", "created_at",
-                                       "due_date", "contact_name", "done"])
-            df.index += 1
-        return df
+    TASK_COLUMNS = ["id", "task_name", "description", "creator_name", "executor_name", "created_at", "due_date",
+                    "contact_name", "done"]
 
     @classmethod
+    def _select_tasks(cls):
+        creator = aliased(User, name="creator")
+        executor = aliased(User, name="executor")
+        return select(
+            cls.task_id,
+            cls.task_name,
+            cls.description,
+            creator.user_name.label("creator_name"),
+            executor.user_name.label("executor_name"),
+            cls.created_at,
+            cls.due_date,
+            Contacts.contact_name.label("contact_name"),
+            cls.done
+        ).join(creator, cls.creator_id == creator.user_id) \
+            .join(executor, cls.executor_id == executor.user_id) \
+            .join(Contacts, cls.contact_id == Contacts.contact_id)
+
+    @classmethod
+    def get_tasks_as_dataframe(cls):
+        return synced_frames["tasks"].frame()
+
+    @classmethod
+    @cached("tasks", "users", "contacts")
+    def get_tasks_due_between(cls, start, end, include_done=False):
+        query = cls._select_tasks().where(cls.due_date >= start)
+        if end is not None:
+            query = query.where(cls.due_date <= end)
+        if not include_done:
+            query = query.where((cls.done == False) | (cls.done.is_(None)))
+        return read_frame(query.order_by(cls.due_date, cls.task_id), columns=cls.TASK_COLUMNS)
+
+    @classmethod
+    @cached("tasks", "users", "contacts")
     def get_incomplete_tasks_by_executor(cls, executor_name):
-        with session_scope() as session:
-            executor = session.query(User).filter(User.user_name == executor_name).first()
-            if not executor:
-                raise ValueError(f"User with name '{executor_name}' not found")
+        executor_id = User.get_user_id_by_name(executor_name)
+        if executor_id is None:
+            raise ValueError(f"User with name '{executor_name}' not found")
 
-            creator = aliased(User, name="creator")  # Создаем алиас для создателя задачи
+        creator = aliased(User, name="creator")  # Создаем алиас для создателя задачи
 
-            tasks = session.query(
+        return read_frame(
+            select(
                 cls.task_id,
                 cls.task_name,
                 cls.description,
@@ -302,28 +1100,24 @@ class Task(Base):
                 Contacts.contact_name.label("contact_name"),
                 creator.user_name.label("creator_name"),  # Имя создателя задачи
                 cls.done  # Статус выполнения задачи
-            ).join(creator, cls.creator_id == creator.user_id) \
-                .join(Contacts, cls.contact_id == Contacts.contact_id) \
-                .filter(cls.executor_id == executor.user_id) \
-                .distinct() \
-                .all()
-
-            df = pd.DataFrame(tasks,
-                              columns=["id", "task_name", "description", "due_date", "contact_name", "creator_name",
-                                       "done"])
-            df.index += 1
-        return df
+            ).join(creator, cls.creator_id == creator.user_id)
+            .join(Contacts, cls.contact_id == Contacts.contact_id)
+            .where(cls.executor_id == executor_id)
+            .distinct(),
+            columns=["id", "task_name", "description", "due_date", "contact_name", "creator_name", "done"]
+        )
 
     @classmethod
+    @cached("tasks", "users", "contacts")
     def get_incomplete_tasks_by_creator(cls, creator_name):
-        with session_scope() as session:
-            creator = session.query(User).filter(User.user_name == creator_name).first()
-            if not creator:
-                raise ValueError(f"User with name '{creator_name}' not found")
+        creator_id = User.get_user_id_by_name(creator_name)
+        if creator_id is None:
+            raise ValueError(f"User with name '{creator_name}' not found")
 
-            executor = aliased(User, name="executor")  # Создаем алиас для исполнителя задачи
+        executor = aliased(User, name="executor")  # Создаем алиас для исполнителя задачи
 
-            tasks = session.query(
+        return read_frame(
+            select(
                 cls.task_id,
                 cls.task_name,
                 cls.description,
@@ -331,19 +1125,15 @@ class Task(Base):
                 Contacts.contact_name.label("contact_name"),
                 executor.user_name.label("executor_name"),  # Имя исполнителя задачи
                 cls.done  # Статус выполнения задачи
-            ).join(executor, cls.executor_id == executor.user_id) \
-                .join(Contacts, cls.contact_id == Contacts.contact_id) \
-                .filter(cls.creator_id == creator.user_id) \
-                .distinct() \
-                .all()
-
-            df = pd.DataFrame(tasks,
-                              columns=["id", "task_name", "description", "due_date", "contact_name", "executor_name",
-                                       "done"])
-            df.index += 1
-        return df
+            ).join(executor, cls.executor_id == executor.user_id)
+            .join(Contacts, cls.contact_id == Contacts.contact_id)
+            .where(cls.creator_id == creator_id)
+            .distinct(),
+            columns=["id", "task_name", "description", "due_date", "contact_name", "executor_name", "done"]
+        )
 
     @classmethod
+    @invalidates("tasks")
     def delete_task(cls, task_id):
         with session_scope() as session:
             task = session.query(cls).filter_by(task_id=task_id).first()
@@ -363,7 +1153,13 @@ class Connections(Base):
     contact1 = relationship("Contacts", foreign_keys=[cont1_id])
     contact2 = relationship("Contacts", foreign_keys=[cont2_id])
 
+    __table_args__ = (
+        Index("ix_connections_cont1_id_cont2_id", "cont1_id", "cont2_id"),
+        Index("ix_connections_cont2_id_cont1_id", "cont2_id", "cont1_id"),
+    )
+
     @classmethod
+    @invalidates("connections")
     def add_connection(cls, contact1_name, contact2_name, description):
         with session_scope() as session:
             contact1 = session.query(Contacts).filter(Contacts.contact_name == contact1_name).first()
@@ -379,71 +1175,85 @@ class Connections(Base):
             )
             session.add(connection)
             session.commit()
+            change = (connection.connection_id, connection.cont1_id, connection.cont2_id)
+        _notify("connections", "insert", *change)
 
     @classmethod
+    @cached("connections", "contacts")
     def get_connections_as_dataframe(cls):
-        with session_scope() as session:
-            contact1_alias = aliased(Contacts)
-            contact2_alias = aliased(Contacts)
+        contact1_alias = aliased(Contacts)
+        contact2_alias = aliased(Contacts)
 
-            connections = session.query(
+        return read_frame(
+            select(
                 cls.connection_id,
                 contact1_alias.contact_name.label("contact1_name"),
                 contact2_alias.contact_name.label("contact2_name"),
                 cls.description
-            ).join(contact1_alias, cls.cont1_id == contact1_alias.contact_id) \
-                .join(contact2_alias, cls.cont2_id == contact2_alias.contact_id).all()
-
-            df = pd.DataFrame(connections,
-                              columns=["connection_id", "contact1_name", "contact2_name", "description"])
-            df.index += 1
-        return df
+            ).join(contact1_alias, cls.cont1_id == contact1_alias.contact_id)
+            .join(contact2_alias, cls.cont2_id == contact2_alias.contact_id)
+        )
 
     @classmethod
+    @invalidates("connections")
     def delete_connection(cls, connection_id):
         with session_scope() as session:
             connection = session.query(cls).filter_by(connection_id=connection_id).first()
-            if connection:
-                session.delete(connection)
-                session.commit()
+            if not connection:
+                return
+            change = (connection.connection_id, connection.cont1_id, connection.cont2_id)
+            session.delete(connection)
+            session.commit()
+        _notify("connections", "delete", *change)
 
     @classmethod
-    def get_connections_for_contact(cls, contact_name):
-        with session_scope() as session:
-            contact = session.query(Contacts).filter(Contacts.contact_name == contact_name).first()
-
-            if not contact:
-                return None
+    def get_neighbours(cls, contact_ids):
+        return cls._get_neighbours(tuple(sorted(set(contact_ids))))
 
-            contact1_alias = aliased(Contacts)
-            contact2_alias = aliased(Contacts)
-
-            connections = session.query(
-                contact1_alias.contact_name.label("Контакт"),
-                cls.description.label("Связь")
-            ).join(contact1_alias, cls.cont1_id == contact1_alias.contact_id) \
-                .join(contact2_alias, cls.cont2_id == contact2_alias.contact_id) \
-                .filter(
-                (cls.cont1_id == contact.contact_id) | (cls.cont2_id == contact.contact_id),
-                cls.cont1_id != cls.cont2_id
-            ) \
-                .union(
-                session.query(
-                    contact2_alias.contact_name.label("Контакт"),
-                    cls.description.label("Связь")
-                ).join(contact1_alias, cls.cont1_id == contact1_alias.contact_id)
-                .join(contact2_alias, cls.cont2_id == contact2_alias.contact_id)
-                .filter(
-                    (cls.cont1_id == contact.contact_id) | (cls.cont2_id == contact.contact_id),
-                    cls.cont1_id != cls.cont2_id
-                )
-            ).all()
-
-            df = pd.DataFrame(connections, columns=["Контакт", "Связь"])
-
-            df = df[df["Контакт"] != contact_name].reset_index(drop=True)
-            df.index += 1
+    @classmethod
+    @cached("connections", "contacts")
+    def _get_neighbours(cls, contact_ids):
+        columns = ["contact_id", "contact_name", "neighbour_id", "neighbour_name", "description"]
+        if not contact_ids:
+            return pd.DataFrame(columns=columns)
+
+        # Каждая половина идет по своему индексу (cont1_id, cont2_id) / (cont2_id, cont1_id)
+        edges = union_all(
+            select(cls.cont1_id.label("contact_id"), cls.cont2_id.label("neighbour_id"), cls.description)
+            .where(cls.cont1_id.in_(contact_ids), cls.cont1_id != cls.cont2_id),
+            select(cls.cont2_id.label("contact_id"), cls.cont1_id.label("neighbour_id"), cls.description)
+            .where(cls.cont2_id.in_(contact_ids), cls.cont1_id != cls.cont2_id)
+        ).subquery()
+
+        contact_alias = aliased(Contacts)
+        neighbour_alias = aliased(Contacts)
+
+        return read_frame(
+            select(
+                edges.c.contact_id,
+                contact_alias.contact_name,
+                edges.c.neighbour_id,
+                neighbour_alias.contact_name,
+                edges.c.description
+            ).join(contact_alias, contact_alias.contact_id == edges.c.contact_id)
+            .join(neighbour_alias, neighbour_alias.contact_id == edges.c.neighbour_id)
+            .order_by(contact_alias.contact_name, neighbour_alias.contact_name),
+            columns=columns
+        )
 
+    @classmethod
+    def get_connections_for_contact(cls, contact_name):
+        # Имена не уникальны: берутся все контакты с этим именем, по индексу ix_contacts_contact_name
+        with session_scope() as session:
+            contact_ids = session.scalars(select(Contacts.contact_id)
+                                          .where(Contacts.contact_name == contact_name)).all()
+        if not contact_ids:
+            return None
+
+        df = cls.get_neighbours(contact_ids)[["neighbour_name", "description"]].drop_duplicates()
+        df.columns = ["Контакт", "Связь"]
+        df = df.reset_index(drop=True)
+        df.index += 1
         return df
 
 
@@ -456,36 +1266,61 @@ class Interaction(Base):
     interaction_date = Column(Date, default=func.current_date())
     interaction_type = Column(String(50), nullable=False)
     notes = Column(String(255))
+    updated_at = Column(UPDATED_AT, default=utcnow, onupdate=utcnow)
 
     user = relationship("User", foreign_keys=[user_id])
     contact = relationship("Contacts", foreign_keys=[contact_id])
 
+    __table_args__ = (
+        Index("ix_interactions_contact_id_interaction_date", "contact_id", "interaction_date"),
+        Index("ix_interactions_user_id_id", "user_id", "id"),
+        Index("ft_interactions_search", "notes", mysql_prefix="FULLTEXT"),
+        Index("ix_interactions_updated_at", "updated_at"),
+    )
+
+    @classmethod
+    def _select_interactions(cls):
+        user_alias = aliased(User)
+        contact_alias = aliased(Contacts)
+        query = select(
+            Interaction.id,
+            user_alias.user_name.label("user_name"),
+            contact_alias.contact_name.label("contact_name"),
+            Interaction.interaction_date,
+            Interaction.interaction_type,
+            Interaction.notes
+        ).join(
+            user_alias, user_alias.user_id == Interaction.user_id
+        ).join(
+            contact_alias, contact_alias.contact_id == Interaction.contact_id
+        )
+        return query, user_alias, contact_alias
+
     @classmethod
     def get_as_dataframe(cls):
-        with session_scope() as session:
-            user_alias = aliased(User)
-            contact_alias = aliased(Contacts)
-
-            result = session.query(
-                Interaction.id,
-                user_alias.user_name.label("user_name"),
-                contact_alias.contact_name.label("contact_name"),
-                Interaction.interaction_date,
-                Interaction.interaction_type,
-                Interaction.notes
-            ).join(
-                user_alias, user_alias.user_id == Interaction.user_id
-            ).join(
-                contact_alias, contact_alias.contact_id == Interaction.contact_id
-            ).all()
-
-        df = pd.DataFrame(result,
-                          columns=["id", "user_name", "contact_name", "interaction_date", "interaction_type", "notes"])
+        return synced_frames["interactions"].frame()
 
-        df.index += 1
-        return df
+    @classmethod
+    @cached("interactions", "users", "contacts")
+    def page(cls, after_id, limit, user=None, contact=None, date_from=None, date_to=None):
+        query, user_alias, contact_alias = cls._select_interactions()
+
+        # Ключевая пагинация: новые записи первыми, следующая страница начинается после последнего id
+        if after_id is not None:
+            query = query.where(Interaction.id < after_id)
+        if user is not None:
+            query = query.where(user_alias.user_name == user)
+        if contact is not None:
+            query = query.where(contact_alias.contact_name == contact)
+        if date_from is not None:
+            query = query.where(Interaction.interaction_date >= date_from)
+        if date_to is not None:
+            query = query.where(Interaction.interaction_date <= date_to)
+
+        return read_frame(query.order_by(Interaction.id.desc()).limit(limit))
 
     @classmethod
+    @invalidates("interactions", "contacts", "circle_stats")
     def add_interaction(cls, user_name, contact_name, interaction_type, notes=None, interaction_date=None):
         with session_scope() as session:
             user = session.query(User).filter(User.user_name == user_name).first()
@@ -506,28 +1341,37 @@ class Interaction(Base):
 
             try:
                 session.add(new_interaction)
-                contact.last_interaction = interaction_date or func.current_date()
+                session.flush()
+                refresh_last_interaction(session, [contact.contact_id])
                 session.commit()
             except IntegrityError as e:
                 session.rollback()
 
     @classmethod
+    @invalidates("interactions", "contacts", "circle_stats")
     def delete_interaction(cls, int_id):
         with session_scope() as session:
             interaction = session.query(cls).filter_by(id=int_id).first()
             if interaction:
+                contact_id = interaction.contact_id
                 session.delete(interaction)
-                session.commit()
+                session.flush()
+                refresh_last_interaction(session, [contact_id])
 
     @classmethod
+    @invalidates("interactions", "contacts", "circle_stats")
     def edit_interaction(cls, int_id, contact, **parameters):
         with session_scope() as session:
             record = session.query(cls).filter_by(id=int_id).first()
             contact_name = session.query(Contacts).filter(Contacts.contact_name == contact).first()
+            old_contact_id = record.contact_id
             record.contact_id = contact_name.contact_id
             for field, value in parameters.items():
                 if hasattr(record, field):
                     setattr(record, field, value)
+            session.flush()
+            # Взаимодействие могло переехать к другому контакту или получить другую дату - пересчитываются оба
+            refresh_last_interaction(session, [old_contact_id, record.contact_id])
 
 
 class ImportantDates(Base):
@@ -536,23 +1380,57 @@ class ImportantDates(Base):
     date_id = Column(Integer, primary_key=True)
     contact_id = Column(Integer, ForeignKey("contacts.contact_id"), nullable=False)
     date = Column(Date, nullable=False)
+    date_key = Column(SmallInteger, default=_day_key_default("date"))
     description = Column(String(200), nullable=False)
 
     contact = relationship("Contacts", back_populates="important_dates")
 
+    __table_args__ = (
+        Index("ix_important_dates_date_key", "date_key"),
+    )
+
+    @validates("date")
+    def _set_date_key(self, key, value):
+        self.date_key = day_key(value)
+        return value
+
     @classmethod
+    @cached("important_dates", "contacts")
     def get_important_dates_dataframe(cls):
+        return read_frame(
+            select(Contacts.contact_name, cls.date, cls.description)
+            .join(Contacts, cls.contact_id == Contacts.contact_id),
+            columns=["Имя контакта", "Дата", "Описание"]
+        )
+
+    @classmethod
+    @cached("important_dates", "contacts")
+    def get_upcoming(cls, today, days=30):
         with session_scope() as session:
-            results = session.query(
-                Contacts.contact_name,
-                cls.date,
-                cls.description
-            ).join(Contacts, cls.contact_id == Contacts.contact_id).all()
+            statement = union_all(
+                select(Contacts.contact_name, literal("birthday").label("kind"),
+                       literal("День рождения").label("description"), Contacts.birthday.label("date"))
+                .where(_day_key_window(Contacts.birthday_key, today, days)),
+                select(Contacts.contact_name, literal("important_date"), cls.description, cls.date)
+                .join(Contacts, cls.contact_id == Contacts.contact_id)
+                .where(_day_key_window(cls.date_key, today, days))
+            )
+            result = session.execute(statement).all()
+
+        rows = []
+        for contact_name, kind, description, date in result:
+            next_date = _next_occurrence(date, today)
+            rows.append((contact_name, kind, description, date, next_date, (next_date - today).days,
+                         next_date.year - date.year))
 
-            df = pd.DataFrame(results, columns=["Имя контакта", "Дата", "Описание"])
-            return df
+        df = pd.DataFrame(rows, columns=["contact_name", "kind", "description", "date", "next_date", "days_until",
+                                         "years"])
+        df = df.sort_values(["days_until", "contact_name"]).reset_index(drop=True)
+        df.index += 1
+        return df
 
     @classmethod
+    @invalidates("important_dates")
     def add_date_for_contact(cls, contact_name, **parameters):
         with session_scope() as session:
             contact = session.query(Contacts).filter(Contacts.contact_name == contact_name).first()
@@ -563,12 +1441,412 @@ class ImportantDates(Base):
                 pass
 
 
-Base.metadata.create_all(bind=engine)
+# Удаленные строки таблиц с дельта-синхронизацией: по ним держатели датафреймов узнают, какие строки убрать
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+
+    tombstone_id = Column(Integer, primary_key=True)
+    table_name = Column(String(50), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    deleted_at = Column(UPDATED_AT, nullable=False, default=utcnow)
+
+    __table_args__ = (
+        Index("ix_tombstones_table_name_deleted_at", "table_name", "deleted_at"),
+    )
+
+    @classmethod
+    def prune(cls, older_than=None):
+        horizon = utcnow() - (TOMBSTONE_RETENTION if older_than is None else older_than)
+        with session_scope() as session:
+            result = session.execute(delete(cls).where(cls.deleted_at < horizon)
+                                     .execution_options(synchronize_session=False))
+            return result.rowcount
+
+
+def _record_tombstone(mapper, connection, target):
+    connection.execute(insert(Tombstone).values(table_name=mapper.local_table.name,
+                                                row_id=mapper.primary_key_from_instance(target)[0]))
+
+
+for _model in (Contacts, Task, Interaction):
+    event.listen(_model, "after_delete", _record_tombstone)
+
+# Версии таблиц, общие для всех процессов. Сторонние пишущие процессы (bulk_import, maintenance) повышают их
+# через publish_invalidation, а query_cache каждого процесса сверяется с ними не чаще раза в CACHE_POLL_INTERVAL
+# секунд и вытесняет записи изменившихся таблиц
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    table_name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+CACHE_POLL_INTERVAL = 5
+
+
+def read_shared_versions():
+    with get_engine().connect() as conn:
+        return dict(conn.execute(select(CacheVersion.table_name, CacheVersion.version)).all())
+
+
+def publish_invalidation(*tables):
+    query_cache.invalidate(*tables)
+    with session_scope() as session:
+        for table in tables:
+            result = session.execute(update(CacheVersion).where(CacheVersion.table_name == table)
+                                     .values(version=CacheVersion.version + 1))
+            if not result.rowcount:
+                session.execute(insert(CacheVersion).values(table_name=table, version=1))
+
+
+# Запрос изменений захватывает строки чуть раньше прошлой отметки: транзакция, которая получила updated_at
+# до прошлой синхронизации, но зафиксировалась после нее, иначе была бы пропущена
+SYNC_OVERLAP = datetime.timedelta(seconds=5)
+# Записи других процессов приложения не публикуются в cache_versions, их изменения подтягиваются
+# не реже чем раз в SYNC_INTERVAL секунд
+SYNC_INTERVAL = 30
+# Надгробия старше этого срока удаляются командой prune-tombstones, отстающий датафрейм перечитывается целиком.
+# Команда публикует версию tombstones, и синхронизируемые датафреймы после нее тоже перечитываются целиком
+TOMBSTONE_RETENTION = datetime.timedelta(days=7)
+
+
+# Датафрейм таблицы для дельта-синхронизации. select_rows - запрос всех строк, первая колонка - ключ строки.
+# changed_keys(since) - ключи строк, изменившихся после отметки, в том числе из-за правки записи другой таблицы,
+# подтянутой join'ом (ее таблица в patch_on). Таблицы без updated_at перечислены в reload_on:
+# их изменение перечитывает датафрейм целиком
+class SyncSource:
+    def __init__(self, select_rows, changed_keys, columns=None, hidden=(), patch_on=(), reload_on=()):
+        self.select_rows = select_rows
+        self.changed_keys = changed_keys
+        self.columns = columns
+        self.hidden = hidden
+        self.patch_on = patch_on
+        self.reload_on = reload_on
+
+
+def _changed_with_contact(model, key):
+    return lambda since: union(
+        select(key).where(model.updated_at > since),
+        select(key).join(Contacts, model.contact_id == Contacts.contact_id).where(Contacts.updated_at > since)
+    )
+
+
+SYNC_SOURCES = {
+    "contacts": SyncSource(
+        Contacts._select_contacts,
+        lambda since: select(Contacts.contact_id).where(Contacts.updated_at > since),
+        hidden=("contact_id",),
+        reload_on=("circles",),
+    ),
+    "tasks": SyncSource(
+        Task._select_tasks,
+        _changed_with_contact(Task, Task.task_id),
+        columns=Task.TASK_COLUMNS,
+        patch_on=("contacts",),
+        reload_on=("users",),
+    ),
+    "interactions": SyncSource(
+        lambda: Interaction._select_interactions()[0],
+        _changed_with_contact(Interaction, Interaction.id),
+        patch_on=("contacts",),
+        reload_on=("users",),
+    ),
+}
+
+
+# Строки таблицы, изменившиеся после watermark, и ключи удаленных. Возвращает и новую отметку - время до запросов,
+# так что изменения, сделанные во время чтения, попадут в следующую выборку
+def fetch_changes_since(table, watermark):
+    source = SYNC_SOURCES[table]
+    checked_at = utcnow()
+    since = watermark - SYNC_OVERLAP
+    statement = source.select_rows()
+    key = statement.selected_columns[0]
+    changed = read_frame(statement.where(key.in_(source.changed_keys(since))).order_by(key), columns=source.columns)
+    with session_scope() as session:
+        deleted = session.scalars(
+            select(Tombstone.row_id).where(Tombstone.table_name == table, Tombstone.deleted_at > since)
+        ).all()
+    return changed, set(deleted), checked_at
+
+
+def _patch_frame(df, changed, deleted):
+    changed = changed.set_index(changed.columns[0], drop=False)
+    kept = df[~(df.index.isin(deleted) | df.index.isin(changed.index))]
+    if changed.empty:
+        return kept
+    patched = pd.concat([kept, changed])
+    # concat категорий с разным набором значений дает object - наборы объединяются явно
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            patched[column] = pd.api.types.union_categoricals(
+                [kept[column].array, changed[column].astype("category").array], ignore_order=True)
+    if not patched.index.is_monotonic_increasing:
+        patched = patched.sort_index()
+    return patched
+
+
+# Общий для процесса датафрейм таблицы: после записи перечитываются только изменившиеся строки,
+# так что обновление после одной правки стоит столько, сколько сама правка, а не вся таблица
+class SyncedFrame:
+
+    def __init__(self, table, interval=SYNC_INTERVAL):
+        self.table = table
+        self.interval = interval
+        self.full_loads = 0
+        self.patches = 0
+        self.patched_rows = 0
+        self._df = None
+        self._watermark = None
+        self._reload_state = None
+        self._patch_state = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, source):
+        watermark = utcnow()
+        statement = source.select_rows()
+        df = read_frame(statement.order_by(statement.selected_columns[0]), columns=source.columns)
+        self._df = df.set_index(df.columns[0], drop=False)
+        self._watermark = watermark
+        self.full_loads += 1
+
+    def _patch(self, source):
+        changed, deleted, watermark = fetch_changes_since(self.table, self._watermark)
+        self._df = _patch_frame(self._df, changed, deleted)
+        self._watermark = watermark
+        self.patches += 1
+        self.patched_rows += len(changed) + len(deleted)
+
+    def frame(self):
+        source = SYNC_SOURCES[self.table]
+        with self._lock:
+            # Версии снимаются до чтения: запись, сделанная во время него, вызовет еще одну синхронизацию
+            reload_state = (query_cache.generation, query_cache.versions(("tombstones",) + source.reload_on))
+            patch_state = query_cache.versions((self.table,) + source.patch_on)
+            now = time.monotonic()
+            if self._df is None or reload_state != self._reload_state \
+                    or utcnow() - self._watermark > TOMBSTONE_RETENTION:
+                self._load(source)
+            elif patch_state != self._patch_state or now - self._checked_at >= self.interval:
+                self._patch(source)
+            self._reload_state, self._patch_state, self._checked_at = reload_state, patch_state, now
+            df = self._df
+
+        # Страницы меняют полученные датафреймы на месте, поэтому отдаем копию
+        df = df[[column for column in df.columns if column not in source.hidden]].reset_index(drop=True)
+        df.index = pd.RangeIndex(1, len(df) + 1)
+        return df
+
+    def stats(self):
+        with self._lock:
+            return {
+                "table": self.table,
+                "rows": None if self._df is None else len(self._df),
+                "watermark": self._watermark,
+                "full_loads": self.full_loads,
+                "patches": self.patches,
+                "patched_rows": self.patched_rows,
+            }
+
+
+synced_frames = {table: SyncedFrame(table) for table in SYNC_SOURCES}
+
+
+SEARCH_KINDS = {
+    "contact": "Контакт",
+    "interaction": "Взаимодействие",
+    "task": "Задача",
+}
+
+
+# Строки, которые FTS5 в SQLite ранжирует по релевантности: bm25 считается для каждой найденной строки, и на
+# частом слове в миллионе заметок это секунды. Поэтому оцениваются только самые свежие совпадения (FTS5 отдает
+# их по убыванию rowid и останавливается на лимите), а лучшие из них идут в выдачу
+SEARCH_CANDIDATES = 1000
+
+
+def _fts_query(query):
+    # Каждое слово - отдельная фраза, слова объединяются через OR. Как и natural language mode в MySQL,
+    # совпадают целые слова, а не префиксы: поиск по префиксу перебирает словарь индекса
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in _casefold(query).split())
+
+
+# Отбор строк, где нашлись слова запроса, и их релевантность: (оценка, функция, добавляющая отбор к запросу)
+def _text_match(query, limit, key, *columns):
+    if get_engine().dialect.name == "mysql":
+        score = type_coerce(match(*columns, against=query).in_natural_language_mode(), Float)
+        return score, lambda statement: statement.where(score)
+    # В SQLite - таблицы FTS5 из миграции 10, rowid в них - ключ строки; bm25 тем меньше, чем лучше совпадение
+    fts = f"{key.table.name}_fts"
+    candidates = select(literal_column("rowid").label("rowid"),
+                        (-func.bm25(literal_column(fts))).label("score")).select_from(table(fts)) \
+        .where(literal_column(fts).op("MATCH")(_fts_query(query))) \
+        .order_by(literal_column("rowid").desc()).limit(SEARCH_CANDIDATES).subquery()
+    # Общий результат не длиннее limit, поэтому из каждой таблицы к join идут только limit лучших
+    matches = select(candidates).order_by(candidates.c.score.desc()).limit(limit).subquery()
+    return matches.c.score, lambda statement: statement.join(matches, matches.c.rowid == key)
+
+
+# Полнотекстовый поиск по FULLTEXT-индексам MySQL или таблицам FTS5 в SQLite: все три таблицы в одном запросе,
+# общий рейтинг по релевантности
+@cached("contacts", "interactions", "tasks")
+def _search(query, limit):
+    contact_score, contact_match = _text_match(query, limit, Contacts.contact_id, Contacts.contact_name,
+                                               Contacts.hobbies, Contacts.additional)
+    interaction_score, interaction_match = _text_match(query, limit, Interaction.id, Interaction.notes)
+    task_score, task_match = _text_match(query, limit, Task.task_id, Task.task_name, Task.description)
+    interaction_contact = aliased(Contacts)
+
+    statement = union_all(
+        contact_match(
+            select(literal("contact").label("kind"), Contacts.contact_id.label("item_id"),
+                   Contacts.contact_name.label("title"),
+                   concat_ws("; ", Contacts.hobbies, Contacts.additional).label("detail"),
+                   contact_score.label("score"))
+        ),
+        interaction_match(
+            select(literal("interaction"), Interaction.id, interaction_contact.contact_name, Interaction.notes,
+                   interaction_score)
+            .join(interaction_contact, interaction_contact.contact_id == Interaction.contact_id)
+        ),
+        task_match(
+            select(literal("task"), Task.task_id, Task.task_name, Task.description, task_score)
+        )
+    ).subquery()
+
+    return read_frame(select(statement).order_by(statement.c.score.desc()).limit(limit))
+
+
+def search(query, limit=50):
+    query = " ".join(query.split())
+    if not query:
+        return pd.DataFrame(columns=["kind", "item_id", "title", "detail", "score"])
+    return _search(query, limit)
+
+
+def refresh_circle_stats(connection, circle_ids=None):
+    contacts = Contacts.__table__
+    circles = Circles.__table__
+    stats = CircleStats.__table__
+
+    if circle_ids is None:
+        circle_ids = [circle_id for circle_id, in connection.execute(select(circles.c.circle_id))]
+    circle_ids = sorted(set(circle_ids))
+    if not circle_ids:
+        return
+
+    in_circles = contacts.c.circle_id.in_(circle_ids)
+    aggregates = connection.execute(
+        select(contacts.c.circle_id, func.count(contacts.c.contact_id), func.max(contacts.c.last_interaction))
+        .where(in_circles)
+        .group_by(contacts.c.circle_id)
+    ).all()
+
+    latest = select(
+        contacts.c.circle_id,
+        func.max(contacts.c.last_interaction).label("last_interaction")
+    ).where(in_circles).group_by(contacts.c.circle_id).subquery()
+    latest_contacts = defaultdict(list)
+    for circle_id, contact_name in connection.execute(
+            select(contacts.c.circle_id, contacts.c.contact_name)
+            .join(latest, and_(latest.c.circle_id == contacts.c.circle_id,
+                               latest.c.last_interaction == contacts.c.last_interaction))
+            .order_by(contacts.c.contact_name)
+    ):
+        latest_contacts[circle_id].append(contact_name)
+
+    rows = {circle_id: {"circle_id": circle_id, "contact_count": 0, "last_interaction_date": None,
+                        "last_interaction_contacts": ""} for circle_id in circle_ids}
+    for circle_id, contact_count, last_interaction in aggregates:
+        rows[circle_id].update(contact_count=contact_count,
+                               last_interaction_date=last_interaction,
+                               last_interaction_contacts=", ".join(latest_contacts[circle_id])[:1000])
+
+    connection.execute(delete(stats).where(stats.c.circle_id.in_(circle_ids)))
+    connection.execute(insert(stats), list(rows.values()))
+
+
+# last_interaction контакта - дата самого позднего взаимодействия с ним. Пересчет - один UPDATE из сгруппированного
+# подзапроса, и трогает он только строки, где значение меняется: иначе каждая правка сдвигала бы updated_at.
+# Контакт из contact_ids, у которого взаимодействий не осталось, получает NULL; полный пересчет контакты
+# без взаимодействий не трогает - их дату могли ввести вручную или импортировать
+def refresh_last_interaction(connection, contact_ids=None):
+    contacts = Contacts.__table__
+    interactions = Interaction.__table__
+
+    latest = select(
+        interactions.c.contact_id,
+        func.max(interactions.c.interaction_date).label("last_interaction")
+    ).group_by(interactions.c.contact_id)
+    if contact_ids is not None:
+        contact_ids = sorted(set(contact_ids))
+        if not contact_ids:
+            return 0
+        latest = latest.where(interactions.c.contact_id.in_(contact_ids))
+    latest = latest.subquery()
+
+    stale = and_(contacts.c.contact_id == latest.c.contact_id,
+                 contacts.c.last_interaction.is_distinct_from(latest.c.last_interaction))
+    circle_ids = set(connection.execute(select(contacts.c.circle_id).where(stale).distinct()).scalars())
+    updated = connection.execute(
+        update(contacts).where(stale).values(last_interaction=latest.c.last_interaction)
+    ).rowcount
+
+    if contact_ids is not None:
+        orphaned = and_(contacts.c.contact_id.in_(contact_ids),
+                        contacts.c.last_interaction.isnot(None),
+                        ~exists().where(interactions.c.contact_id == contacts.c.contact_id))
+        circle_ids.update(connection.execute(select(contacts.c.circle_id).where(orphaned).distinct()).scalars())
+        updated += connection.execute(update(contacts).where(orphaned).values(last_interaction=None)).rowcount
+
+    # В сводке по кругам хранится самое позднее взаимодействие круга
+    if circle_ids:
+        refresh_circle_stats(connection, circle_ids)
+    return updated
+
+
+def get_pool_metrics():
+    if _engine is None:
+        return None
+    pool = _engine.pool
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "wait_count": pool.wait_count,
+        "wait_avg": pool.wait_total / pool.wait_count if pool.wait_count else 0.0,
+        "wait_max": pool.wait_max,
+        "timeouts": pool.timeouts,
+    }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# Независимые читающие запросы выполняются параллельно, каждый в своей сессии и на своем соединении из пула.
+# Потоков не больше, чем постоянных соединений в пуле, чтобы параллельная страница не выбирала весь overflow
+def submit_concurrently(queries):
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_pool_settings()["pool_size"],
+                                               thread_name_prefix="sql-fetch")
+    return {name: _executor.submit(query) for name, query in queries.items()}
+
+
+def fetch_concurrently(queries):
+    futures = submit_concurrently(queries)
+    return {name: future.result() for name, future in futures.items()}
 
 
 @contextmanager
 def session_scope():
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
         db.commit()
@@ -0,0 +1,71 @@
+import datetime
+import os
+import sys
+import pytest
+from sqlalchemy import insert
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import migrations
+import passwords
+import sql
+
+# Те же тесты гоняются на MySQL, если задан адрес пустой тестовой базы, например
+# TEST_MYSQL_URL=mysql+pymysql://root@localhost/crm_test
+MYSQL_URL = os.environ.get("TEST_MYSQL_URL")
+PASSWORD = "secret"
+TODAY = datetime.date(2024, 6, 15)
+
+
+@pytest.fixture(params=["sqlite", "mysql"])
+def db(request, tmp_path, monkeypatch):
+    if request.param == "sqlite":
+        url = f"sqlite:///{tmp_path / 'test.db'}"
+    elif MYSQL_URL:
+        url = MYSQL_URL
+    else:
+        pytest.skip("TEST_MYSQL_URL не задан")
+
+    sql.configure(url)
+    engine = sql.get_engine(check_schema=False)
+    migrations.downgrade(engine, 0)
+    migrations.upgrade(engine)
+    # Состояние процесса от прошлого теста: версии таблиц в кэше и счетчики неудачных входов
+    sql.query_cache.invalidate(*sql.Base.metadata.tables)
+    monkeypatch.setattr(sql, "login_throttle", sql.LoginThrottle())
+    yield engine
+    migrations.downgrade(engine, 0)
+    engine.dispose()
+
+
+@pytest.fixture
+def seeded(db):
+    password = passwords.hash_password(PASSWORD)
+    with db.begin() as conn:
+        conn.execute(insert(sql.User.__table__), [{"user_name": "alice", "password": password},
+                                                  {"user_name": "bob", "password": password}])
+    sql.query_cache.invalidate("users")
+
+    sql.Circles.add_circle(circle_name="Друзья", interaction_frequency=7)
+    sql.Circles.add_circle(circle_name="Коллеги", interaction_frequency=30)
+    sql.Contacts.add_contact("Друзья", contact_name="Анна", hobbies="шахматы, бег",
+                             birthday=datetime.date(1990, 6, 20))
+    sql.Contacts.add_contact("Друзья", contact_name="Борис", hobbies="рыбалка")
+    sql.Contacts.add_contact("Коллеги", contact_name="Вера", additional="любит театр",
+                             birthday=datetime.date(1985, 1, 3))
+
+    sql.Interaction.add_interaction("alice", "Анна", "Звонок", "обсудили отпуск", TODAY - datetime.timedelta(days=3))
+    sql.Interaction.add_interaction("bob", "Анна", "Встреча", "подарок на день рождения",
+                                    TODAY - datetime.timedelta(days=20))
+    sql.Interaction.add_interaction("alice", "Вера", "Письмо", "отчет по проекту", TODAY - datetime.timedelta(days=60))
+
+    sql.Task.add_task("alice", "bob", "Анна", "Купить подарок", "книга про шахматы", TODAY)
+    sql.Task.add_task("bob", "alice", "Вера", "Отправить отчет", None, TODAY + datetime.timedelta(days=5))
+    sql.Task.add_task("alice", "alice", "Борис", "Позвонить", None, TODAY - datetime.timedelta(days=1), done=True)
+
+    sql.Connections.add_connection("Анна", "Борис", "друзья")
+    sql.Connections.add_connection("Вера", "Анна", "коллеги")
+    sql.ImportantDates.add_date_for_contact(contact_name="Борис", date=datetime.date(2015, 6, 17),
+                                            description="Годовщина свадьбы")
+    return db
@@ -0,0 +1,72 @@
+import bulk_import
+import sql
+from conftest import TODAY
+
+
+def test_import_contacts_reports_bad_rows(seeded):
+    report = bulk_import.import_rows("contacts", [
+        (2, {"contact_name": "Дина", "circle_name": "Друзья", "birthday": "1995-02-01"}),
+        (3, {"contact_name": "Анна", "circle_name": "Друзья"}),
+        (4, {"contact_name": "Егор", "circle_name": "Нет такого"}),
+    ])
+    assert report.inserted == 1
+    assert [error.line for error in report.errors] == [3, 4]
+    assert "Дина" in sql.Contacts.get_contacts_list()
+    assert {"contacts", "contact_names", "circle_stats"} <= set(sql.read_shared_versions())
+
+
+def test_import_interactions_refreshes_last_interaction(seeded):
+    report = bulk_import.import_rows("interactions", [
+        (2, {"user_name": "alice", "contact_name": "Борис", "interaction_type": "Звонок",
+             "interaction_date": TODAY.isoformat()}),
+    ])
+    assert report.inserted == 1 and not report.errors
+    frame = sql.Contacts.get_contacts_as_dataframe()
+    assert sql.first_row(frame[frame["contact_name"] == "Борис"])["last_interaction"] == TODAY
+
+
+def test_dry_run_writes_nothing(seeded):
+    report = bulk_import.import_rows("contacts", [(2, {"contact_name": "Дина", "circle_name": "Друзья"})],
+                                     dry_run=True)
+    assert report.inserted == 0
+    assert "Дина" not in sql.Contacts.get_contacts_list()
+
+
+def _import_from_another_process(monkeypatch, kind, rows, read):
+    # Импорт со своим кэшем, как у отдельного процесса; приложение читает свой кэш посреди finish,
+    # то есть до пересчета сводок и last_interaction
+    monkeypatch.setattr(sql, "CACHE_POLL_INTERVAL", 0)
+    app_cache = sql.query_cache
+    app_reads = []
+    importer = bulk_import.IMPORTERS[kind]
+    finish = importer.finish
+
+    def finish_after_app_read(self, report):
+        with monkeypatch.context() as m:
+            m.setattr(sql, "query_cache", app_cache)
+            app_reads.append(read())
+        finish(self, report)
+
+    with monkeypatch.context() as m:
+        m.setattr(importer, "finish", finish_after_app_read)
+        m.setattr(sql, "query_cache", sql.QueryCache())
+        bulk_import.import_rows(kind, rows)
+    assert app_reads
+
+
+def test_running_app_sees_stats_rebuilt_after_contacts_import(seeded, monkeypatch):
+    _import_from_another_process(monkeypatch, "contacts", [
+        (2, {"contact_name": "Дина", "circle_name": "Коллеги"}),
+    ], sql.Circles.get_circle_stats)
+    stats = sql.Circles.get_circle_stats()
+    assert sql.first_row(stats[stats["circle_name"] == "Коллеги"])["interaction_count"] == 2
+
+
+def test_running_app_sees_last_interaction_refreshed_after_interactions_import(seeded, monkeypatch):
+    boris = sql.Contacts.get_contact_by_name("Борис")
+    assert sql.Contacts.get_profile(boris)["last_interaction"] is None
+    _import_from_another_process(monkeypatch, "interactions", [
+        (2, {"user_name": "alice", "contact_name": "Борис", "interaction_type": "Звонок",
+             "interaction_date": TODAY.isoformat()}),
+    ], lambda: sql.Contacts.get_profile(boris))
+    assert sql.Contacts.get_profile(boris)["last_interaction"] == TODAY
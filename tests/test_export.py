@@ -0,0 +1,24 @@
+import csv
+import pyarrow.parquet as pq
+import export
+
+
+def test_csv_export_streams_whole_table_in_chunks(seeded, tmp_path):
+    exported = export.export_tables(["contacts", "tasks"], tmp_path, "csv", chunk_size=2)
+    path, rows = exported["contacts"]
+    assert rows == 3 and exported["tasks"][1] == 3
+    with open(path, encoding="utf-8", newline="") as file:
+        records = list(csv.DictReader(file))
+    assert [record["contact_name"] for record in records] == ["Анна", "Борис", "Вера"]
+    assert records[0]["birthday"] == "1990-06-20"
+
+
+def test_parquet_export_keeps_column_types(seeded, tmp_path):
+    path, rows = export.export_tables(["interactions"], tmp_path, "parquet", chunk_size=2)["interactions"]
+    assert rows == 3
+    parquet = pq.ParquetFile(path)
+    # Каждая пачка курсора - своя row group
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert str(table.schema.field("interaction_date").type) == "date32[day]"
+    assert table.column("notes").to_pylist() == ["обсудили отпуск", "подарок на день рождения", "отчет по проекту"]
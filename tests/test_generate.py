@@ -0,0 +1,21 @@
+import pytest
+from sqlalchemy import func, select
+
+import sql
+from benchmarks import generate
+
+COUNTS = {"users": 3, "circles": 2, "contacts": 20, "connections": 30, "tasks": 15, "interactions": 40,
+          "important_dates": 5}
+
+
+def test_generator_fills_empty_database_with_derived_data(db):
+    generate.generate(COUNTS, seed=1, chunk_size=7)
+    with db.connect() as conn:
+        for model, _ in generate.generate_rows(COUNTS):
+            count = conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+            assert count == COUNTS[model.__tablename__]
+    assert sql.Contacts.refresh_last_interaction() == 0
+    assert sql.User.authenticate("user001", generate.PASSWORD) == 1
+
+    with pytest.raises(RuntimeError):
+        generate.generate(COUNTS)
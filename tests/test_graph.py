@@ -0,0 +1,102 @@
+import random
+import threading
+import graph
+import sql
+
+
+def _random_edges(count, nodes, seed, first_id=1):
+    rng = random.Random(seed)
+    return [(first_id + i, rng.randrange(nodes), rng.randrange(nodes)) for i in range(count)]
+
+
+def _chain(*nodes, first_id=1):
+    return [(first_id + i, a, b) for i, (a, b) in enumerate(zip(nodes, nodes[1:]))]
+
+
+def test_path_mutual_and_k_hop_queries():
+    contact_graph = graph.ContactGraph(_chain(1, 2, 3, 4) + [(10, 1, 5), (11, 5, 3), (12, 6, 7)])
+    assert len(contact_graph.shortest_path(1, 4)) == 4
+    assert contact_graph.shortest_path(4, 1)[0] == 4
+    assert contact_graph.shortest_path(1, 6) is None
+    assert contact_graph.mutual(1, 3) == {2, 5}
+    assert contact_graph.k_hop(1, 2) == {2: 1, 5: 1, 3: 2}
+
+
+def test_degree_ranking_with_overlay_matches_rebuilt_graph(monkeypatch):
+    monkeypatch.setattr(graph, "COMPACT_RATIO", 10)
+    edges = _random_edges(300, 60, seed=1)
+    contact_graph = graph.ContactGraph(edges)
+    for edge in _random_edges(40, 80, seed=2, first_id=1000):
+        contact_graph.add_edge(*edge)
+        edges.append(edge)
+    for edge in edges[:30]:
+        contact_graph.remove_edge(*edge)
+
+    assert contact_graph._overlay_size
+    rebuilt = graph.ContactGraph(edges[30:])
+    assert contact_graph.degree_ranking(top=100) == rebuilt.degree_ranking(top=100)
+
+
+def test_betweenness_is_reused_until_enough_edges_change(monkeypatch):
+    monkeypatch.setattr(graph, "BETWEENNESS_STALE_RATIO", 0.5)
+    contact_graph = graph.ContactGraph(_chain(1, 2, 3, 4, 5))
+    assert contact_graph.betweenness_ranking(top=1) == [(3, 4.0)]
+
+    contact_graph.add_edge(10, 5, 6)
+    assert contact_graph.betweenness_ranking(top=1) == [(3, 4.0)]
+    assert contact_graph.betweenness_age() == 1
+    assert contact_graph.betweenness_ranking(top=1, refresh=True) == [(3, 6.0)]
+    assert contact_graph.betweenness_age() == 0
+
+    for edge in _chain(6, 7, 8, 9, first_id=11):
+        contact_graph.add_edge(*edge)
+    contact_graph.remove_edge(1, 1, 2)
+    assert contact_graph.betweenness_ranking(top=1) == [(5, 12.0)]
+
+
+def test_graph_reloads_after_change_published_by_another_process(seeded, monkeypatch):
+    monkeypatch.setattr(sql, "CACHE_POLL_INTERVAL", 0)
+    contact_graph = graph.get_graph()
+    assert contact_graph.edge_count() == 2
+    assert graph.get_graph() is contact_graph
+
+    boris, vera = sql.Contacts.get_contact_by_name("Борис"), sql.Contacts.get_contact_by_name("Вера")
+    with seeded.begin() as conn:
+        conn.execute(sql.insert(sql.Connections.__table__).values(cont1_id=boris, cont2_id=vera,
+                                                                     description="соседи"))
+        conn.execute(sql.insert(sql.CacheVersion.__table__).values(table_name="connections", version=1))
+    assert graph.get_graph().edge_count() == 3
+
+
+def test_change_already_seen_by_load_is_not_applied_twice():
+    # Связь записана во время load_edges: она есть в загрузке, и то же событие приходит через on_change
+    contact_graph = graph.ContactGraph(_chain(1, 2, 3))
+    contact_graph.add_edge(1, 1, 2)
+    contact_graph.add_edge(3, 1, 2)
+    assert contact_graph.edge_count() == 2
+
+    contact_graph.remove_edge(3, 1, 2)
+    contact_graph.remove_edge(3, 1, 2)
+    assert contact_graph.neighbours(1) == {2}
+    contact_graph.remove_edge(1, 1, 2)
+    contact_graph.remove_edge(4, 2, 3)
+    assert contact_graph.neighbours(2) == {3}
+    assert contact_graph.degree_ranking() == [(2, 1), (3, 1)]
+
+
+def test_betweenness_is_computed_outside_graph_lock(monkeypatch):
+    contact_graph = graph.ContactGraph(_chain(1, 2, 3, 4, 5))
+    compute = graph._compute_betweenness
+    written = []
+
+    def compute_while_graph_is_written(*args):
+        # Запись из другого потока не ждет окончания расчета
+        writer = threading.Thread(target=lambda: written.append(contact_graph.add_edge(10, 5, 6)))
+        writer.start()
+        writer.join(timeout=5)
+        assert written
+        return compute(*args)
+
+    monkeypatch.setattr(graph, "_compute_betweenness", compute_while_graph_is_written)
+    assert contact_graph.betweenness_ranking(top=1) == [(3, 4.0)]
+    assert contact_graph.betweenness_age() == 1
@@ -0,0 +1,29 @@
+import metrics
+import sql
+
+
+def test_histogram_percentiles_stay_within_bucket_error():
+    histogram = metrics.Histogram()
+    for i in range(1, 101):
+        histogram.observe(i / 1000, rows=2)
+    summary = histogram.summary()
+    assert summary["count"] == 100 and summary["rows"] == 200 and summary["max"] == 0.1
+    assert 0.05 / 1.2 <= summary["p50"] <= 0.05 * 1.2
+    assert 0.095 / 1.2 <= summary["p95"] <= 0.1
+
+
+def test_only_slowest_statements_are_kept():
+    recorder = metrics.Metrics(slowest_kept=2)
+    for seconds in (0.3, 0.1, 0.5, 0.2):
+        recorder.observe_statement(f"SELECT {seconds}", (), "test", seconds)
+    assert [statement.duration for statement in recorder.slowest()] == [0.5, 0.3]
+    assert recorder.summary("query")[0][1]["count"] == 4
+
+
+def test_queries_are_attributed_to_model_methods_with_rows(seeded):
+    sql.metrics.reset()
+    sql.Contacts.get_contacts_list()
+    sql.Interaction.page(None, 2)
+    summary = dict(sql.metrics.summary("query"))
+    assert summary["Contacts.get_list"]["rows"] == 3
+    assert summary["Interaction.page"]["rows"] == 2
@@ -0,0 +1,71 @@
+import datetime
+import pytest
+from sqlalchemy import inspect, select, update
+
+import migrations
+import passwords
+import sql
+from conftest import PASSWORD, TODAY
+
+
+def _declared_indexes(conn):
+    # Индексы, созданные СУБД сама (в MySQL - под внешние ключи), не учитываются
+    tables = migrations.baseline_metadata.sorted_tables
+    declared = {index.name for table in tables for index in table.indexes}
+    return {index["name"] for table in tables for index in inspect(conn).get_indexes(table.name)} & declared
+
+
+def test_each_migration_creates_only_its_own_indexes(db):
+    migrations.downgrade(db, 0)
+    migrations.upgrade(db, 1)
+    assert _declared_indexes(db) == set()
+
+    migrations.upgrade(db, 2)
+    assert _declared_indexes(db) == {index.name for index in migrations.lookup_indexes}
+
+
+def test_downgrade_and_upgrade_round_trip(db):
+    for version in reversed(range(migrations.LATEST_VERSION)):
+        migrations.downgrade(db, version)
+        migrations.upgrade(db)
+        assert migrations.is_up_to_date(db)
+
+
+def test_password_column_is_not_narrowed_over_longer_passwords(seeded):
+    long_password = "x" * (migrations.users.c.password.type.length + 1)
+    with seeded.begin() as conn:
+        conn.execute(update(migrations.users).where(migrations.users.c.user_name == "bob")
+                     .values(password=long_password))
+
+    with pytest.raises(RuntimeError):
+        migrations.downgrade(seeded, 6)
+    with seeded.connect() as conn:
+        assert migrations.current_version(conn) == 7
+        assert conn.execute(select(migrations.users.c.password)
+                            .where(migrations.users.c.user_name == "bob")).scalar() == long_password
+
+    # Обычные хеши помещаются в прежнюю длину, и откат проходит
+    with seeded.begin() as conn:
+        conn.execute(update(migrations.users).where(migrations.users.c.user_name == "bob")
+                     .values(password=passwords.hash_password(PASSWORD)))
+    migrations.downgrade(seeded, 6)
+    migrations.upgrade(seeded)
+
+
+def test_circle_stats_migration_matches_maintained_stats(seeded):
+    # Два контакта с одной датой последнего взаимодействия - имена склеиваются по алфавиту
+    sql.Interaction.add_interaction("alice", "Борис", "Звонок", None, TODAY - datetime.timedelta(days=3))
+    sql.Circles.add_circle(circle_name="Пустой", interaction_frequency=10)
+
+    def stats():
+        with seeded.connect() as conn:
+            return conn.execute(select(migrations.circle_stats).order_by(migrations.circle_stats.c.circle_id)).all()
+
+    migrations.downgrade(seeded, 3)
+    migrations.upgrade(seeded)
+    migrated = stats()
+    assert "Анна, Борис" in {row.last_interaction_contacts for row in migrated}
+
+    with seeded.begin() as conn:
+        sql.refresh_circle_stats(conn)
+    assert stats() == migrated
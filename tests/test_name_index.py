@@ -0,0 +1,20 @@
+import datetime
+import name_index
+import sql
+from conftest import TODAY
+
+
+def test_contact_index_follows_contact_writes_only(seeded):
+    index = name_index._contacts.get()
+    assert name_index.contact_matches("анн") == ["Анна"]
+
+    # Взаимодействия не трогают contact_names, индекс остается прежним
+    sql.Interaction.add_interaction("alice", "Борис", "Звонок", None, TODAY - datetime.timedelta(days=1))
+    assert name_index._contacts.get() is index
+
+    sql.Contacts.edit_contact("Борис", "Друзья", contact_name="Богдан")
+    assert name_index.contact_matches("бог") == ["Богдан"]
+    sql.Contacts.add_contact("Коллеги", contact_name="Глеб")
+    assert name_index.contact_matches("глеб") == ["Глеб"]
+    sql.Contacts.delete_contact("Глеб")
+    assert name_index.contact_matches("глеб") == []
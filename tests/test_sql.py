@@ -0,0 +1,407 @@
+import datetime
+import threading
+import pytest
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+import maintenance
+import migrations
+import sql
+from conftest import PASSWORD, TODAY
+
+
+def _last_interaction(name):
+    with sql.session_scope() as session:
+        return session.execute(select(sql.Contacts.last_interaction).where(sql.Contacts.contact_name == name)).scalar()
+
+
+def _latest_interaction_id():
+    return int(sql.Interaction.get_as_dataframe()["id"].max())
+
+
+def test_migrations_build_model_schema_and_roll_back(db):
+    inspector = inspect(db)
+    for table in sql.Base.metadata.sorted_tables:
+        assert {column["name"] for column in inspector.get_columns(table.name)} == {c.name for c in table.columns}
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        expected = {index.name for index in table.indexes
+                    if db.dialect.name == "mysql" or index.dialect_options["mysql"].get("prefix") != "FULLTEXT"}
+        assert expected <= indexes
+
+    migrations.downgrade(db, 0)
+    assert set(inspect(db).get_table_names()) <= {migrations.schema_migrations.name}
+    migrations.upgrade(db)
+    assert migrations.is_up_to_date(db)
+
+
+def test_cached_reads_are_evicted_only_by_writes_to_their_tables(seeded):
+    assert sql.Contacts.get_contacts_list() == ["Анна", "Борис", "Вера"]
+    hits = sql.query_cache.stats()["hits"]
+    sql.Circles.get_circles_list()
+    sql.Contacts.get_contacts_list()
+    assert sql.query_cache.stats()["hits"] == hits + 1
+
+    # Запись в другую таблицу не трогает запись кэша, а запись в contacts вытесняет ее
+    sql.Circles.add_circle(circle_name="Соседи", interaction_frequency=14)
+    sql.Contacts.get_contacts_list()
+    assert sql.query_cache.stats()["hits"] == hits + 2
+    sql.Contacts.add_contact("Соседи", contact_name="Глеб")
+    assert sql.Contacts.get_contacts_list() == ["Анна", "Борис", "Вера", "Глеб"]
+    assert sql.query_cache.stats()["hits"] == hits + 2
+
+
+def test_engine_is_created_lazily_and_checks_schema_once(tmp_path):
+    sql.configure(f"sqlite:///{tmp_path / 'lazy.db'}")
+    assert sql._engine is None and sql.get_pool_metrics() is None
+
+    with pytest.raises(sql.SchemaOutdatedError):
+        sql.get_engine()
+    migrations.upgrade(sql.get_engine(check_schema=False))
+    engine = sql.get_engine()
+    assert sql.get_engine() is engine
+    engine.dispose()
+
+
+def test_pool_metrics_count_checkouts_and_timeouts(tmp_path):
+    sql.configure(f"sqlite:///{tmp_path / 'pool.db'}", pool_size=1, max_overflow=0, pool_timeout=0.05)
+    engine = sql.get_engine(check_schema=False)
+    with engine.connect():
+        assert sql.get_pool_metrics()["checked_out"] == 1
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    pool_metrics = sql.get_pool_metrics()
+    assert pool_metrics["checked_out"] == 0 and pool_metrics["idle"] == 1
+    assert pool_metrics["timeouts"] == 1 and pool_metrics["wait_count"] == 2
+    assert pool_metrics["wait_max"] >= 0.05
+    engine.dispose()
+
+
+def test_sqlite_connections_get_pragmas(db):
+    if db.dialect.name != "sqlite":
+        pytest.skip("настройки встроенной базы")
+    with db.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == sql.SQLITE_PRAGMAS["busy_timeout"]
+
+
+def test_authenticate(seeded):
+    assert sql.User.authenticate("alice", PASSWORD) == sql.User.get_user_id_by_name("alice")
+    assert sql.User.authenticate("alice", "wrong") is None
+    assert sql.User.authenticate("nobody", PASSWORD) is None
+
+
+def test_authenticate_upgrades_plaintext_password(seeded):
+    with sql.session_scope() as session:
+        session.execute(update(sql.User).where(sql.User.user_name == "bob").values(password="legacy"))
+    sql.query_cache.invalidate("users")
+
+    assert sql.User.authenticate("bob", "legacy") == sql.User.get_user_id_by_name("bob")
+    with sql.session_scope() as session:
+        stored = session.execute(select(sql.User.password).where(sql.User.user_name == "bob")).scalar()
+    assert stored != "legacy"
+
+
+def test_login_throttle_locks_after_failures(seeded):
+    for _ in range(sql.login_throttle.max_failures):
+        assert sql.User.authenticate("alice", "wrong") is None
+    with pytest.raises(sql.LoginThrottledError):
+        sql.User.authenticate("alice", PASSWORD)
+
+
+def test_contacts_crud_and_synced_frame(seeded):
+    frame = sql.Contacts.get_contacts_as_dataframe()
+    assert frame["contact_name"].tolist() == ["Анна", "Борис", "Вера"]
+    assert list(frame.index) == [1, 2, 3]
+
+    sql.Contacts.add_contact("Коллеги", contact_name="Глеб")
+    sql.Contacts.edit_contact("Борис", "Коллеги", phone="+7 900")
+    sql.Contacts.delete_contact("Глеб")
+    patched = sql.Contacts.get_contacts_as_dataframe()
+
+    assert sql.synced_frames["contacts"].patches > 0
+    assert patched["contact_name"].tolist() == ["Анна", "Борис", "Вера"]
+    boris = sql.first_row(patched[patched["contact_name"] == "Борис"])
+    assert boris["phone"] == "+7 900" and boris["circle_name"] == "Коллеги"
+
+
+def test_fetch_changes_since_reports_changed_and_deleted_rows(seeded):
+    watermark = sql.utcnow() + sql.SYNC_OVERLAP
+    sql.Contacts.edit_contact("Вера", "Коллеги", email="vera@example.com")
+    anna_id = sql.Contacts.get_contact_by_name("Анна")
+    task_id = int(sql.Task.get_tasks_as_dataframe()["id"].iloc[-1])
+    sql.Task.delete_task(task_id)
+
+    contacts, deleted, _ = sql.fetch_changes_since("contacts", watermark)
+    assert contacts["contact_name"].tolist() == ["Вера"] and not deleted
+    _, deleted, _ = sql.fetch_changes_since("tasks", watermark)
+    assert deleted == {task_id}
+    assert anna_id not in deleted
+
+
+def test_synced_frame_reloads_after_tombstones_are_pruned(seeded, monkeypatch):
+    monkeypatch.setattr(sql, "CACHE_POLL_INTERVAL", 0)
+    sql.Contacts.add_contact("Коллеги", contact_name="Глеб")
+    assert "Глеб" in sql.Contacts.get_contacts_as_dataframe()["contact_name"].tolist()
+    full_loads = sql.synced_frames["contacts"].full_loads
+
+    # Удаление, надгробие которого уже вычищено: патчем его не увидеть
+    with seeded.begin() as conn:
+        conn.execute(sql.delete(sql.Contacts.__table__).where(sql.Contacts.contact_name == "Глеб"))
+    maintenance.prune_tombstones()
+    assert "Глеб" not in sql.Contacts.get_contacts_as_dataframe()["contact_name"].tolist()
+    assert sql.synced_frames["contacts"].full_loads == full_loads + 1
+
+
+def test_last_interaction_follows_latest_interaction(seeded):
+    assert _last_interaction("Анна") == TODAY - datetime.timedelta(days=3)
+
+    # Более старое взаимодействие не сдвигает дату назад
+    sql.Interaction.add_interaction("alice", "Анна", "Звонок", None, TODAY - datetime.timedelta(days=100))
+    older_id = _latest_interaction_id()
+    assert _last_interaction("Анна") == TODAY - datetime.timedelta(days=3)
+
+    # Перенос взаимодействия к другому контакту пересчитывает обоих
+    sql.Interaction.edit_interaction(older_id, "Борис")
+    assert _last_interaction("Борис") == TODAY - datetime.timedelta(days=100)
+    sql.Interaction.delete_interaction(older_id)
+    assert _last_interaction("Борис") is None
+
+
+def test_refresh_last_interaction_repairs_drift(seeded):
+    with sql.session_scope() as session:
+        session.execute(update(sql.Contacts).values(last_interaction=datetime.date(2000, 1, 1)))
+    sql.query_cache.invalidate("contacts")
+
+    assert sql.Contacts.refresh_last_interaction() == 2
+    assert _last_interaction("Анна") == TODAY - datetime.timedelta(days=3)
+    assert _last_interaction("Вера") == TODAY - datetime.timedelta(days=60)
+    # Без взаимодействий дата не трогается: ее могли ввести вручную
+    assert _last_interaction("Борис") == datetime.date(2000, 1, 1)
+    assert sql.Contacts.refresh_last_interaction() == 0
+
+
+def test_circle_stats_and_overdue_circles(seeded):
+    stats = sql.Circles.get_circle_stats()
+    assert set(stats["circle_name"]) == {"Друзья", "Коллеги"}
+    overdue = sql.Circles.get_overdue_circles(TODAY)
+    assert overdue["circle_name"].tolist() == ["Коллеги"]
+
+
+def test_overdue_circles_boundaries(seeded):
+    # Круг без контактов и круг без единого взаимодействия тоже требуют внимания
+    sql.Circles.add_circle(circle_name="Соседи", interaction_frequency=14)
+    sql.Circles.add_circle(circle_name="Спорт", interaction_frequency=14)
+    sql.Contacts.add_contact("Спорт", contact_name="Глеб")
+    assert sql.Circles.get_overdue_circles(TODAY)["circle_name"].tolist() == ["Коллеги", "Соседи", "Спорт"]
+
+    # Ровно interaction_frequency дней - еще не просрочено
+    assert "Друзья" not in sql.Circles.get_overdue_circles(TODAY + datetime.timedelta(days=4))["circle_name"].tolist()
+    assert "Друзья" in sql.Circles.get_overdue_circles(TODAY + datetime.timedelta(days=5))["circle_name"].tolist()
+
+
+def test_circle_stats_follow_writes_like_a_full_rebuild(seeded):
+    sql.Contacts.add_contact("Коллеги", contact_name="Глеб")
+    sql.Interaction.add_interaction("alice", "Глеб", "Звонок", None, TODAY)
+    sql.Contacts.edit_contact("Анна", "Коллеги")
+    sql.Interaction.delete_interaction(_latest_interaction_id())
+    sql.Contacts.delete_contact("Глеб")
+    incremental = sql.Circles.get_circle_stats()
+
+    sql.CircleStats.rebuild()
+    sql.query_cache.invalidate("circle_stats")
+    assert incremental.equals(sql.Circles.get_circle_stats())
+    assert incremental["interaction_count"].tolist() == [1, 2]
+    assert incremental["last_interaction_date"].tolist() == [None, TODAY - datetime.timedelta(days=3)]
+
+
+def test_tasks(seeded):
+    due = sql.Task.get_tasks_due_between(TODAY, TODAY + datetime.timedelta(days=7))
+    assert due["task_name"].tolist() == ["Купить подарок", "Отправить отчет"]
+
+    by_executor = sql.Task.get_incomplete_tasks_by_executor("bob")
+    assert by_executor["task_name"].tolist() == ["Купить подарок"]
+    with pytest.raises(ValueError):
+        sql.Task.get_incomplete_tasks_by_creator("nobody")
+
+    task_id = int(due["id"].iloc[0])
+    assert sql.Task.set_done_bulk({task_id: True}) == 1
+    assert sql.Task.get_tasks_due_between(TODAY, TODAY)["task_name"].tolist() == []
+
+
+def test_set_done_bulk_updates_mixed_flags_in_one_statement(seeded):
+    tasks = sql.Task.get_tasks_as_dataframe().set_index("task_name")["id"]
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(seeded, "before_cursor_execute", listener)
+    try:
+        updated = sql.Task.set_done_bulk({int(tasks["Отправить отчет"]): True, int(tasks["Позвонить"]): False})
+    finally:
+        event.remove(seeded, "before_cursor_execute", listener)
+
+    assert updated == 2
+    assert len(statements) == 1 and statements[0].lstrip().upper().startswith("UPDATE")
+    done = sql.Task.get_tasks_as_dataframe().set_index("task_name")["done"]
+    assert done.to_dict() == {"Купить подарок": False, "Отправить отчет": True, "Позвонить": False}
+
+
+def test_connections(seeded):
+    connections = sql.Connections.get_connections_for_contact("Анна")
+    assert sorted(connections["Контакт"]) == ["Борис", "Вера"]
+    assert sql.Connections.get_connections_for_contact("Нет такого") is None
+
+
+def test_interaction_pages_follow_keyset_and_filters(seeded):
+    first = sql.Interaction.page(None, 2)
+    assert first["notes"].tolist() == ["отчет по проекту", "подарок на день рождения"]
+    rest = sql.Interaction.page(int(first["id"].iloc[-1]), 2)
+    assert rest["notes"].tolist() == ["обсудили отпуск"]
+    assert sql.Interaction.page(int(rest["id"].iloc[-1]), 2).empty
+
+    assert sql.Interaction.page(None, 10, user="alice", contact="Анна")["notes"].tolist() == ["обсудили отпуск"]
+    in_range = sql.Interaction.page(None, 10, date_from=TODAY - datetime.timedelta(days=30), date_to=TODAY)
+    assert in_range["contact_name"].tolist() == ["Анна", "Анна"]
+
+
+def test_neighbours_for_many_contacts_in_one_query(seeded):
+    anna, boris, vera = (sql.Contacts.get_contact_by_name(name) for name in ("Анна", "Борис", "Вера"))
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(seeded, "before_cursor_execute", listener)
+    try:
+        neighbours = sql.Connections.get_neighbours([vera, boris, anna, boris])
+    finally:
+        event.remove(seeded, "before_cursor_execute", listener)
+
+    assert len(statements) == 1
+    assert list(zip(neighbours["contact_name"], neighbours["neighbour_name"], neighbours["description"])) == [
+        ("Анна", "Борис", "друзья"), ("Анна", "Вера", "коллеги"),
+        ("Борис", "Анна", "друзья"), ("Вера", "Анна", "коллеги"),
+    ]
+    assert sql.Connections.get_neighbours([]).empty
+
+
+def test_fetch_concurrently_runs_sections_on_pool_threads(seeded):
+    threads = []
+
+    def section(query):
+        def run():
+            threads.append(threading.current_thread().name)
+            return query()
+        return run
+
+    sections = sql.fetch_concurrently({
+        "overdue": section(lambda: sql.Circles.get_overdue_circles(TODAY)),
+        "tasks": section(lambda: sql.Task.get_tasks_due_between(TODAY, TODAY, include_done=True)),
+        "dates": section(lambda: sql.ImportantDates.get_upcoming(TODAY, days=7)),
+    })
+    assert all(name.startswith("sql-fetch") for name in threads) and len(threads) == 3
+    assert sections["overdue"].equals(sql.Circles.get_overdue_circles(TODAY))
+    assert sections["tasks"]["task_name"].tolist() == ["Купить подарок"]
+    assert sections["dates"]["contact_name"].tolist() == ["Борис", "Анна"]
+
+
+def test_upcoming_dates_wrap_year(seeded):
+    upcoming = sql.ImportantDates.get_upcoming(TODAY, days=7)
+    assert upcoming["contact_name"].tolist() == ["Борис", "Анна"]
+    assert upcoming["years"].tolist() == [9, 34]
+
+    around_new_year = sql.ImportantDates.get_upcoming(datetime.date(2024, 12, 30), days=7)
+    assert around_new_year["contact_name"].tolist() == ["Вера"]
+
+
+def test_search(seeded):
+    results = sql.search("шахматы")
+    assert set(zip(results["kind"], results["title"])) == {("contact", "Анна"), ("task", "Купить подарок")}
+    assert sql.search("   ").empty
+
+
+def test_profile_loads_in_fixed_number_of_statements(seeded):
+    contact_id = sql.Contacts.get_contact_by_name("Анна")
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(seeded, "before_cursor_execute", listener)
+    try:
+        profile = sql.Contacts.get_profile(contact_id)
+    finally:
+        event.remove(seeded, "before_cursor_execute", listener)
+
+    assert profile["circle_name"] == "Друзья"
+    assert profile["interaction_count"] == 2
+    assert profile["interactions"]["interaction_type"].tolist() == ["Звонок", "Встреча"]
+    assert profile["open_tasks"]["task_name"].tolist() == ["Купить подарок"]
+    assert sorted(profile["connections"]["contact_name"]) == ["Борис", "Вера"]
+    assert len(statements) <= 6
+    assert sql.Contacts.get_profile(10 ** 6) is None
+
+
+def test_profile_shows_only_latest_interactions(seeded, monkeypatch):
+    monkeypatch.setattr(sql.Contacts, "PROFILE_INTERACTIONS", 1)
+    profile = sql.Contacts.get_profile(sql.Contacts.get_contact_by_name("Анна"))
+    assert profile["interactions"]["interaction_date"].tolist() == [TODAY - datetime.timedelta(days=3)]
+    assert profile["interaction_count"] == 2
+
+
+def test_read_frame_types(seeded):
+    df = sql.Interaction.get_as_dataframe()
+    assert str(df["notes"].dtype) == "string"
+    assert str(df["interaction_type"].dtype) == "category"
+    assert sql.first_row(df.iloc[0:0]) is None
+
+
+def test_cache_picks_up_invalidation_published_by_another_process(seeded, monkeypatch):
+    monkeypatch.setattr(sql, "CACHE_POLL_INTERVAL", 0)
+    assert "Глеб" not in sql.Contacts.get_contacts_list()
+
+    # Другой процесс пишет в обход кэша этого процесса и публикует новую версию таблицы
+    with seeded.begin() as conn:
+        circle_id = conn.execute(select(sql.Circles.circle_id).where(sql.Circles.circle_name == "Друзья")).scalar()
+        conn.execute(sql.insert(sql.Contacts.__table__).values(contact_name="Глеб", circle_id=circle_id))
+        conn.execute(sql.insert(sql.CacheVersion.__table__).values(table_name="contacts", version=1))
+    assert "Глеб" in sql.Contacts.get_contacts_list()
+
+
+def test_add_contact_propagates_circle_stats_errors(seeded, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("stats")
+
+    monkeypatch.setattr(sql, "refresh_circle_stats", fail)
+    with pytest.raises(RuntimeError):
+        sql.Contacts.add_contact("Друзья", contact_name="Глеб")
+    assert "Глеб" not in sql.Contacts.get_contacts_list()
+
+
+def test_due_tasks_include_done_tasks_on_request(seeded):
+    # Главная страница, как и раньше, показывает и выполненные задачи на сегодня и позже
+    sql.Task.add_task("alice", "bob", "Вера", "Сдать отчет", None, TODAY, done=True)
+    assert sql.Task.get_tasks_due_between(TODAY, TODAY)["task_name"].tolist() == ["Купить подарок"]
+    assert sql.Task.get_tasks_due_between(TODAY, TODAY, include_done=True)["task_name"].tolist() == \
+        ["Купить подарок", "Сдать отчет"]
+
+
+def test_search_index_follows_writes(seeded):
+    if seeded.dialect.name == "mysql":
+        pytest.skip("FULLTEXT в MySQL обновляется самой СУБД")
+    sql.Contacts.add_contact("Коллеги", contact_name="Глеб", hobbies="Ёлочные игрушки")
+    assert sql.search("елочные")["title"].tolist() == ["Глеб"]
+    assert sql.search("ИГРУШКИ")["title"].tolist() == ["Глеб"]
+
+    sql.Contacts.edit_contact("Глеб", "Коллеги", hobbies="теннис")
+    assert sql.search("игрушки").empty
+    assert sql.search("теннис")["title"].tolist() == ["Глеб"]
+    sql.Contacts.delete_contact("Глеб")
+    assert sql.search("теннис").empty
+    # Кавычки в запросе не ломают синтаксис MATCH
+    assert sql.search('"шахматы').shape[0] == 2
+
+
+def test_cached_profile_is_not_changed_by_callers(seeded):
+    contact_id = sql.Contacts.get_contact_by_name("Анна")
+    profile = sql.Contacts.get_profile(contact_id)
+    profile["interactions"].rename(columns={"notes": "Заметки"}, inplace=True)
+    profile["open_tasks"].drop(profile["open_tasks"].index, inplace=True)
+
+    cached = sql.Contacts.get_profile(contact_id)
+    assert "notes" in cached["interactions"].columns
+    assert len(cached["open_tasks"]) == 1
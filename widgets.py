@@ -0,0 +1,23 @@
+import streamlit as st
+import name_index
+
+
+# Выбор из подсказок: в браузер уходят только лучшие совпадения по введенному тексту, а не весь список
+def _picker(label, key, matches, default=None, exclude=()):
+    query = st.text_input(label, key=f"{key}_query", placeholder="Начните вводить имя")
+    options = [name for name in matches(query) if name not in exclude] if query else []
+    if default is not None and default not in options and default not in exclude:
+        options.insert(0, default)
+    if not options:
+        if query:
+            st.caption("Совпадений не найдено")
+        return None
+    return st.selectbox(label, options, index=0, key=key, label_visibility="collapsed")
+
+
+def contact_picker(label, key, default=None, exclude=()):
+    return _picker(label, key, name_index.contact_matches, default, exclude)
+
+
+def user_picker(label, key, default=None, exclude=()):
+    return _picker(label, key, name_index.user_matches, default, exclude)